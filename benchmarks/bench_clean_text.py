@@ -0,0 +1,66 @@
+"""Micro-benchmark for TextProcessor.clean_text
+
+Usage (from the repository root):
+    python -m benchmarks.bench_clean_text --size-mb 20
+"""
+import argparse
+import random
+import time
+from src.text_processor import TextProcessor
+
+SAMPLE_LINES = [
+    "入札公告（建設工事）",
+    "次のとおり一般競争入札に付します。",
+    "１．　調達内容　　（１）件名　ウェブサイト再構築業務",
+    "支出負担行為担当官　　デジタル庁統括官　山田　太郎",
+    "\t仕様書のとおり。\r",
+    "The contractor shall provide a CMS (e.g. WordPress) for content updates.",
+    "",
+    "\x0c",
+]
+
+def legacy_clean_text(text):
+    """clean_text as it was before the single-pass rewrite, kept for comparison"""
+    text = ' '.join(text.split())
+    text = text.replace('\r\n', '\n')
+    text = ''.join(char for char in text if ord(char) >= 32 or char == '\n')
+    lines = text.split('\n')
+    truncated_lines = [line[:1000] if len(line) > 1000 else line for line in lines]
+    return '\n'.join(truncated_lines)
+
+def build_corpus(size_mb: float, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    parts = []
+    size = 0
+    while size < target:
+        line = rng.choice(SAMPLE_LINES) + '\r\n'
+        parts.append(line)
+        size += len(line.encode('utf-8'))
+    return ''.join(parts)
+
+def measure(func, text: str, repeat: int) -> float:
+    """Return the best throughput in MB/s over `repeat` runs"""
+    size_mb = len(text.encode('utf-8')) / (1024 * 1024)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return size_mb / best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark TextProcessor.clean_text")
+    parser.add_argument('--size-mb', type=float, default=20.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--legacy', action='store_true', help='also measure the previous implementation')
+    args = parser.parse_args()
+
+    text = build_corpus(args.size_mb)
+    print(f"corpus: {len(text.encode('utf-8')) / (1024 * 1024):.1f} MB, {len(text):,} chars")
+    print(f"clean_text:        {measure(TextProcessor.clean_text, text, args.repeat):8.1f} MB/s")
+    if args.legacy:
+        print(f"legacy clean_text: {measure(legacy_clean_text, text, args.repeat):8.1f} MB/s")
+
+if __name__ == "__main__":
+    main()
@@ -3,28 +3,66 @@ from src.config.env_manager import EnvManager
 from src.config.google_auth import get_google_auth
 from src.drive_handler import DriveHandler
 from src.sheets_handler import SheetsHandler
-from src.openai_analyzer import TenderAnalyzer
+from src.openai_analyzer import ANALYSIS_MODES, TenderAnalyzer
+from src.services.cache.blob_cache import BlobCache
+from src.services.cache.response_cache import ResponseCache
+from src.services.cache.sheet_snapshot_cache import SheetSnapshotCache
+from src.services.cache.text_cache import TextCache
+from src.services.sheets.sheet_writer import SheetWriter
+import argparse
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="入札案件分析システム")
+    parser.add_argument('--no-drive-cache', action='store_true',
+                        help='Driveファイルキャッシュを使用せずに全ファイルをダウンロードする')
+    parser.add_argument('--purge-drive-cache', action='store_true',
+                        help='実行前にDriveファイルキャッシュを削除する')
+    parser.add_argument('--no-text-cache', action='store_true',
+                        help='抽出済みテキストのキャッシュを使用せずに全ファイルを解析する')
+    parser.add_argument('--purge-text-cache', action='store_true',
+                        help='実行前に抽出済みテキストのキャッシュを削除する')
+    parser.add_argument('--no-llm-cache', action='store_true',
+                        help='LLM応答キャッシュを使用せずに全チャンクをAPIに送信する')
+    parser.add_argument('--purge-llm-cache', action='store_true',
+                        help='実行前にLLM応答キャッシュを削除する')
+    parser.add_argument('--no-sheet-snapshots', action='store_true',
+                        help='前回書き込んだ値との差分を取らずにシート全体を書き込む')
+    parser.add_argument('--mode', choices=ANALYSIS_MODES,
+                        help='分析モード（full: 全チャンクを抽出と並行して分析、routed: 項目ごとに関連するチャンクのみ、'
+                             'incremental: 優先度順に全項目が埋まるまで、batch: Batch API で一括実行）。'
+                             'routed / incremental / batch はトークンが減るが、全チャンクが揃うまで送信を始めない。'
+                             '省略時は ANALYSIS_MODE（未設定なら full）')
+    parser.add_argument('--routing-report', action='store_true',
+                        help='routed モードで全件分析も行い、チャンクの振り分けの再現率を出力する')
+    parser.add_argument('--batch-id',
+                        help='batch モードで、中断したバッチを指定したIDから再開する')
+    parser.add_argument('--folder-id', action='append', dest='folder_ids',
+                        help='分析する案件のDriveフォルダID（複数指定可。省略時は DRIVE_FOLDER_ID をカンマ区切りで読む）。'
+                             '複数の案件の書き込みはまとめてシートに反映される')
+    return parser.parse_args()
+
+def parse_folder_ids(value):
+    """Split a comma-separated list of Drive folder ids (duplicates are dropped)"""
+    folder_ids = [folder_id.strip() for folder_id in value.split(',')]
+    return list(dict.fromkeys(folder_id for folder_id in folder_ids if folder_id))
+
 def process_files(drive_handler, folder_id):
-    """Process files from Google Drive and extract text"""
-    files = drive_handler.get_folder_contents(folder_id)
-    all_text = ""
-    for file in files:
-        text = drive_handler.extract_text(file['id'], file['mimeType'])
-        all_text += text + "\n\n"
-    return all_text
+    """Stream page-level text records from the files in a Google Drive folder"""
+    files = drive_handler.iter_folder_contents(folder_id)
+    return drive_handler.iter_records(files)
 
-def update_spreadsheet(sheets_handler, spreadsheet_id, tender_info, folder_name):
-    """Update spreadsheet with tender information"""
+def update_spreadsheet(sheet_writer, spreadsheet_id, tender_info, folder_name, folder_id=None):
+    """Queue the spreadsheet update with tender information (written in the background)"""
     try:
-        sheets_handler.create_or_append_sheet(
+        sheet_writer.enqueue(
             spreadsheet_id, 
             tender_info,
-            folder_name
+            folder_name,
+            source_id=folder_id
         )
         
         # Get project name from tender info
@@ -43,13 +81,18 @@ def update_spreadsheet(sheets_handler, spreadsheet_id, tender_info, folder_name)
         logger.error(f"スプレッドシートの更新中にエラー: {str(e)}")
 
 def main():
+    args = parse_args()
+    sheet_writer = None
+    drive_handler = None
     try:
         # 環境変数マネージャーの初期化と読み込み
         env_manager = EnvManager()
         env_manager.reload_env()
         
         # 設定値の取得
-        target_folder_id = env_manager.get_env('DRIVE_FOLDER_ID')
+        target_folder_ids = args.folder_ids or parse_folder_ids(env_manager.get_env('DRIVE_FOLDER_ID'))
+        if args.batch_id and len(target_folder_ids) > 1:
+            raise ValueError("--batch-id は案件を1つだけ指定した場合に使用できます")
         output_spreadsheet_id = env_manager.get_env('SPREADSHEET_ID')
         folder_name = env_manager.get_env('FOLDER_NAME', 'デフォルト案件名')
         openai_api_key = env_manager.get_env('OPENAI_API_KEY')
@@ -58,26 +101,59 @@ def main():
         credentials = get_google_auth()
         
         # 各ハンドラーの初期化
-        drive_handler = DriveHandler(credentials)
-        sheets_handler = SheetsHandler(credentials)
-        tender_analyzer = TenderAnalyzer(openai_api_key)
-        
-        # ファイル処理
-        all_text = process_files(drive_handler, target_folder_id)
-        if not all_text.strip():
-            logger.error("処理対象のテキストが見つかりませんでした")
-            return
+        blob_cache = BlobCache(enabled=False if args.no_drive_cache else None)
+        if args.purge_drive_cache:
+            blob_cache.purge()
+        text_cache = TextCache(enabled=False if args.no_text_cache else None)
+        if args.purge_text_cache:
+            text_cache.purge()
+        drive_handler = DriveHandler(credentials, blob_cache=blob_cache, text_cache=text_cache)
+        snapshot_cache = SheetSnapshotCache(enabled=False if args.no_sheet_snapshots else None)
+        sheets_handler = SheetsHandler(credentials, snapshot_cache=snapshot_cache)
+        sheet_writer = SheetWriter(sheets_handler)
+        response_cache = ResponseCache(enabled=False if args.no_llm_cache else None)
+        if args.purge_llm_cache:
+            response_cache.purge()
+        tender_analyzer = TenderAnalyzer(
+            openai_api_key,
+            response_cache=response_cache,
+            mode=args.mode,
+            evaluate_routing=args.routing_report,
+            batch_id=args.batch_id
+        )
         
-        # OpenAIによる分析
-        tender_info = tender_analyzer.analyze_tender(all_text)
+        # 案件ごとにファイル処理とOpenAIによる分析を行い（抽出しながら順次分析する）、
+        # 書き込みはキューに積んで複数の案件をまとめてシートに反映する
+        for target_folder_id in target_folder_ids:
+            # 案件名が取れなかった場合のシート名が案件間で重ならないようにする
+            default_sheet_name = folder_name if len(target_folder_ids) == 1 else f"{folder_name}_{target_folder_id}"
+            try:
+                records = process_files(drive_handler, target_folder_id)
+                tender_info = tender_analyzer.analyze_records(records)
+            except Exception as e:
+                logger.error(f"フォルダ {target_folder_id} の分析中にエラーが発生しました: {str(e)}")
+                continue
+            
+            if tender_info:
+                update_spreadsheet(sheet_writer, output_spreadsheet_id, tender_info, default_sheet_name, target_folder_id)
+            else:
+                logger.error(f"フォルダ {target_folder_id} の案件の分析に失敗しました")
         
-        if tender_info:
-            update_spreadsheet(sheets_handler, output_spreadsheet_id, tender_info, folder_name)
-        else:
-            logger.error("案件の分析に失敗しました")
+        if blob_cache.enabled:
+            logger.info(f"Driveファイルキャッシュ: {blob_cache.report()}")
+        if text_cache.enabled:
+            logger.info(f"抽出テキストキャッシュ: {text_cache.report()}")
+        if response_cache.enabled:
+            logger.info(f"LLM応答キャッシュ: {response_cache.report()}")
             
     except Exception as e:
         logger.error(f"エラーが発生しました: {str(e)}")
+    finally:
+        # キューに残っている書き込みを反映してから終了する
+        if sheet_writer:
+            sheet_writer.close()
+        if drive_handler:
+            drive_handler.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -43,7 +43,64 @@ class EnvManager:
             'FOLDER_NAME',
             'SPREADSHEET_ID',
             'OPENAI_API_KEY',
-            'GPT_MODEL'
+            'GPT_MODEL',
+            'DRIVE_MAX_WORKERS',
+            'DRIVE_MAX_DOWNLOADS',
+            'DRIVE_CACHE_DIR',
+            'DRIVE_CACHE_MAX_MB',
+            'DRIVE_CACHE_ENABLED',
+            'TEXT_CACHE_PATH',
+            'TEXT_CACHE_MAX_MB',
+            'TEXT_CACHE_MAX_AGE_DAYS',
+            'TEXT_CACHE_ENABLED',
+            'LLM_CACHE_PATH',
+            'LLM_CACHE_MAX_MB',
+            'LLM_CACHE_TTL_DAYS',
+            'LLM_CACHE_ENABLED',
+            'PDF_WORKERS',
+            'PDF_PAGE_TIMEOUT',
+            'PDF_PARALLEL_MIN_PAGES',
+            'CHUNK_MAX_TOKENS',
+            'CHUNK_OVERLAP_TOKENS',
+            'ANALYSIS_MODE',
+            'ROUTING_TOP_K',
+            'INCREMENTAL_NOTICE_PATTERN',
+            'INCREMENTAL_REQUIRED_AGREEMENTS',
+            'INCREMENTAL_SUMMARY_CHUNKS',
+            'INCREMENTAL_SUMMARY_BUDGET',
+            'RULE_EXTRACTION_ENABLED',
+            'RULE_MIN_MATCHES',
+            'BATCH_STATE_DIR',
+            'BATCH_POLL_INTERVAL',
+            'SHEETS_REQUESTS_PER_MINUTE',
+            'SHEETS_BATCH_MAX_WRITES',
+            'SHEETS_FLUSH_INTERVAL',
+            'SHEETS_LAYOUT',
+            'SUMMARY_SHEET_NAME',
+            'SHEET_SNAPSHOT_PATH',
+            'SHEET_SNAPSHOT_MAX_MB',
+            'SHEET_SNAPSHOT_MAX_AGE_DAYS',
+            'SHEET_SNAPSHOT_ENABLED',
+            'OPENAI_BASE_URL',
+            'EXTRACTION_MODEL',
+            'ESCALATION_MODEL',
+            'CONSOLIDATION_MODEL',
+            'EXTRACTION_MAX_TOKENS',
+            'CONSOLIDATION_MAX_TOKENS',
+            'ESCALATION_MAX_TOKENS',
+            'ESCALATION_MAX_TOKENS_MULTIPLIER',
+            'OPENAI_MAX_CONCURRENCY',
+            'CONSOLIDATION_FAN_IN',
+            'OPENAI_RPM_LIMIT',
+            'OPENAI_TPM_LIMIT',
+            'OPENAI_REQUEST_TIMEOUT',
+            'OPENAI_STREAMING',
+            'STREAM_MAX_WHITESPACE',
+            'OPENAI_MAX_RETRIES',
+            'OPENAI_RETRY_BASE_DELAY',
+            'OPENAI_RETRY_MAX_DELAY',
+            'OPENAI_CIRCUIT_FAILURE_THRESHOLD',
+            'OPENAI_CIRCUIT_COOLDOWN'
         ]
         for var in vars_to_clear:
             if var in os.environ:
@@ -0,0 +1,53 @@
+"""Model limits used to size requests"""
+from typing import Dict, Tuple
+
+# コンテキスト長（入力 + 出力トークン）。前方一致で判定するため、より具体的な名前を先に書く
+MODEL_CONTEXT_WINDOWS: Dict[str, int] = {
+    "gpt-4o-mini": 128000,
+    "gpt-4o": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4-1106": 128000,
+    "gpt-4-0125": 128000,
+    "gpt-4-32k": 32768,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo-instruct": 4096,
+    "gpt-3.5-turbo": 16385,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+def get_context_window(model: str) -> int:
+    """モデル名からコンテキスト長を取得（不明なモデルは保守的な既定値）"""
+    for prefix, window in MODEL_CONTEXT_WINDOWS.items():
+        if model.startswith(prefix):
+            return window
+    return DEFAULT_CONTEXT_WINDOW
+
+# 100万トークンあたりの料金（USD、入力・出力）。コストの見積もりにのみ使用するため、改定時は更新すること
+MODEL_PRICES_PER_MILLION: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4-1106": (10.00, 30.00),
+    "gpt-4-0125": (10.00, 30.00),
+    "gpt-4-32k": (60.00, 120.00),
+    "gpt-4": (30.00, 60.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+
+# Batch API の料金（通常料金に対する割合）
+BATCH_PRICE_RATIO = 0.5
+
+# プロンプトキャッシュが効いた入力トークンの料金（通常の入力料金に対する割合）
+CACHED_INPUT_PRICE_RATIO = 0.5
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_prompt_tokens: int = 0) -> float:
+    """
+    トークン数から料金（USD）を見積もる（料金が不明なモデルは 0）
+
+    cached_prompt_tokens は prompt_tokens のうちプロンプトキャッシュが効いたトークン数。
+    """
+    for prefix, (input_price, output_price) in MODEL_PRICES_PER_MILLION.items():
+        if model.startswith(prefix):
+            input_tokens = prompt_tokens - cached_prompt_tokens + cached_prompt_tokens * CACHED_INPUT_PRICE_RATIO
+            return (input_tokens * input_price + completion_tokens * output_price) / 1_000_000
+    return 0.0
@@ -1,79 +1,300 @@
 from googleapiclient.discovery import build
 import io
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from googleapiclient.http import MediaIoBaseDownload
 import logging
+from typing import Iterable, Iterator, List, Optional
+from src.models.extracted_file import ExtractedFile
+from src.models.text_record import TextRecord
+from src.services.cache.blob_cache import BlobCache
+from src.services.cache.text_cache import TextCache
 from src.utils.pdf_extractor import PDFExtractor
 from src.utils.document_extractor import DocumentExtractor
 
 logger = logging.getLogger(__name__)
 
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+LIST_PAGE_SIZE = 1000
+LIST_FIELDS = "nextPageToken, files(id, name, mimeType, size, md5Checksum, modifiedTime)"
+PAGE_SEPARATOR = "\f"  # テキストキャッシュ内でページを区切る文字
+
 class DriveHandler:
-    def __init__(self, credentials):
-        self.service = build('drive', 'v3', credentials=credentials)
+    def __init__(self, credentials, max_workers: Optional[int] = None, max_downloads: Optional[int] = None,
+                 blob_cache: Optional[BlobCache] = None, text_cache: Optional[TextCache] = None):
+        self.credentials = credentials
+        # googleapiclient/httplib2 はスレッドセーフではないため、サービスはスレッドごとに生成する
+        self._local = threading.local()
+        self._local.service = build('drive', 'v3', credentials=credentials)
+        self.max_workers = max_workers or int(os.getenv('DRIVE_MAX_WORKERS', '4'))
+        self.max_downloads = max_downloads or int(os.getenv('DRIVE_MAX_DOWNLOADS', str(self.max_workers)))
+        self._download_slots = threading.BoundedSemaphore(self.max_downloads)
+        self.blob_cache = blob_cache or BlobCache()
+        self.text_cache = text_cache or TextCache()
         self.pdf_extractor = PDFExtractor()
         self.document_extractor = DocumentExtractor()
+        for extractor in (self.pdf_extractor, self.document_extractor):
+            self.text_cache.purge_stale_versions(extractor.NAME, extractor.VERSION)
+
+    def close(self) -> None:
+        """抽出用のワーカープロセスを終了"""
+        self.pdf_extractor.close()
+
+    @property
+    def service(self):
+        """現在のスレッド専用のDriveサービスを取得"""
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = build('drive', 'v3', credentials=self.credentials, cache_discovery=False)
+            self._local.service = service
+        return service
     
-    def get_folder_contents(self, folder_id):
-        try:
-            results = self.service.files().list(
-                q=f"'{folder_id}' in parents",
-                fields="files(id, name, mimeType)"
-            ).execute()
-            return results.get('files', [])
-        except Exception as e:
-            logger.error(f"フォルダ内容の取得中にエラー: {str(e)}")
-            return []
+    def get_folder_contents(self, folder_id, recursive: bool = True):
+        """フォルダ配下のファイル一覧をリストで取得"""
+        return list(self.iter_folder_contents(folder_id, recursive))
+
+    def iter_folder_contents(self, folder_id, recursive: bool = True) -> Iterator[dict]:
+        """
+        フォルダ配下のファイルをページ単位で逐次列挙
+
+        後続のダウンロード処理が最初のページから開始できるよう、ページを取得するたびに
+        ファイル情報を返す。サブフォルダは幅優先で再帰的に辿る。
+
+        Args:
+            folder_id: 対象のフォルダID
+            recursive: サブフォルダを辿るかどうか
+
+        Yields:
+            dict: id, name, mimeType, size, md5Checksum, modifiedTime, path を含むファイル情報
+        """
+        folders = deque([(folder_id, '')])
+        visited = {folder_id}
+        while folders:
+            current_id, prefix = folders.popleft()
+            page_token = None
+            while True:
+                try:
+                    results = self.service.files().list(
+                        q=f"'{current_id}' in parents and trashed = false",
+                        fields=LIST_FIELDS,
+                        pageSize=LIST_PAGE_SIZE,
+                        pageToken=page_token,
+                        supportsAllDrives=True,
+                        includeItemsFromAllDrives=True
+                    ).execute()
+                except Exception as e:
+                    logger.error(f"フォルダ内容の取得中にエラー: {str(e)}")
+                    break
+
+                for file in results.get('files', []):
+                    path = f"{prefix}{file.get('name', '')}"
+                    if file['mimeType'] == FOLDER_MIME_TYPE:
+                        if recursive and file['id'] not in visited:
+                            visited.add(file['id'])
+                            folders.append((file['id'], f"{path}/"))
+                        continue
+                    file['path'] = path
+                    yield file
+
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
+
+    def extract_files(self, files: Iterable[dict], max_workers: Optional[int] = None) -> List[ExtractedFile]:
+        """複数ファイルを並列に抽出し、入力順の結果リストを返す"""
+        return list(self.iter_extracted_files(files, max_workers))
+
+    def iter_extracted_files(self, files: Iterable[dict], max_workers: Optional[int] = None) -> Iterator[ExtractedFile]:
+        """
+        複数ファイルを並列に抽出し、入力順に結果を返す
+
+        Args:
+            files: iter_folder_contents が返すファイル情報（ジェネレータも可）
+            max_workers: 並列ワーカー数（省略時は DRIVE_MAX_WORKERS）
+
+        Yields:
+            ExtractedFile: ファイルごとの抽出結果
+        """
+        workers = max_workers or self.max_workers
+        if workers <= 1:
+            for file in files:
+                yield self._extract_file(file)
+            return
+
+        # 先読みするファイル数を制限し、未消費の結果がメモリに溜まり過ぎないようにする
+        window = workers * 2
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='drive-extract') as executor:
+            for file in files:
+                pending.append(executor.submit(self._extract_file, file))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def iter_records(self, files: Iterable[dict], max_workers: Optional[int] = None) -> Iterator[TextRecord]:
+        """
+        ファイルを並列に抽出し、ページ単位のレコードとして入力順に返す
+
+        後続の処理は最初のファイルのレコードから開始でき、その間も後続ファイルの
+        ダウンロードと抽出はバックグラウンドで進む。
+
+        Yields:
+            TextRecord: 出典ファイル・ページ番号・ファイル内オフセット付きのテキスト
+        """
+        for extracted in self.iter_extracted_files(files, max_workers):
+            if not any(page.strip() for page in extracted.pages):
+                logger.warning(f"テキストを抽出できませんでした: {extracted.path}")
+                continue
+
+            offset = 0
+            for page_num, page in enumerate(extracted.pages, start=1):
+                if page:
+                    yield TextRecord(source_file=extracted.path, page=page_num, offset=offset, text=page)
+                    offset += len(page) + 2
+
+    def _extract_file(self, file: dict) -> ExtractedFile:
+        """単一ファイルを抽出して結果オブジェクトに格納"""
+        pages = self.extract_pages(file['id'], file['mimeType'], file)
+        return ExtractedFile(
+            file_id=file['id'],
+            name=file.get('name', ''),
+            mime_type=file['mimeType'],
+            path=file.get('path', file.get('name', '')),
+            pages=pages
+        )
     
-    def extract_text(self, file_id, mime_type):
+    def extract_text(self, file_id, mime_type, file_info: Optional[dict] = None):
         """ファイルからテキストを抽出"""
+        return "\n\n".join(page for page in self.extract_pages(file_id, mime_type, file_info) if page)
+
+    def extract_pages(self, file_id, mime_type, file_info: Optional[dict] = None) -> List[str]:
+        """
+        ファイルからページ（ページのない形式では段落ブロック）単位のテキストを抽出
+
+        Args:
+            file_id: ファイルID
+            mime_type: MIMEタイプ
+            file_info: iter_folder_contents が返すファイル情報（キャッシュ判定に使用）
+        """
         try:
             if mime_type.startswith('application/vnd.google-apps.'):
-                return self._extract_google_workspace_file(file_id, mime_type)
+                return self._extract_google_workspace_file(file_id, mime_type, file_info)
             else:
-                return self._extract_binary_file(file_id, mime_type)
+                return self._extract_binary_file(file_id, mime_type, file_info)
         except Exception as e:
             logger.error(f"テキスト抽出中にエラー: {str(e)}")
-            return ""
+            return []
 
-    def _extract_google_workspace_file(self, file_id, mime_type):
+    def _extract_google_workspace_file(self, file_id, mime_type, file_info=None):
         """Google Workspaceファイルを処理"""
         try:
             export_mime_type = self._get_export_mime_type(mime_type)
             if not export_mime_type:
                 logger.warning(f"未対応のGoogle Workspaceファイル: {mime_type}")
-                return ""
+                return []
 
-            content = self.service.files().export(
-                fileId=file_id,
-                mimeType=export_mime_type
-            ).execute()
+            cache_key = self._cache_key(file_id, file_info, export_mime_type)
+            content = self.blob_cache.get(cache_key) if cache_key else None
+            if content is None:
+                with self._download_slots:
+                    content = self.service.files().export(
+                        fileId=file_id,
+                        mimeType=export_mime_type
+                    ).execute()
+                if cache_key:
+                    self.blob_cache.put(cache_key, content if isinstance(content, bytes) else content.encode('utf-8'))
             
-            return self.document_extractor.extract_text(content, mime_type)
+            data = content if isinstance(content, bytes) else content.encode('utf-8')
+            return self._extract_with_text_cache(
+                data, mime_type, self.document_extractor,
+                lambda: list(self.document_extractor.iter_pages(content, mime_type))
+            )
         except Exception as e:
             logger.error(f"Google Workspaceファイルの処理中にエラー: {str(e)}")
-            return ""
+            return []
 
-    def _extract_binary_file(self, file_id, mime_type):
+    def _extract_binary_file(self, file_id, mime_type, file_info=None):
         """バイナリファイルを処理"""
         try:
-            request = self.service.files().get_media(fileId=file_id)
-            fh = io.BytesIO()
-            downloader = MediaIoBaseDownload(fh, request)
-            
-            done = False
-            while not done:
-                _, done = downloader.next_chunk()
-            
-            fh.seek(0)
+            cache_key = self._cache_key(file_id, file_info)
+            data = self.blob_cache.get(cache_key) if cache_key else None
+            if data is not None:
+                fh = io.BytesIO(data)
+            else:
+                fh = self._download_file(file_id)
+                if cache_key:
+                    self.blob_cache.put(cache_key, fh.getvalue())
             
             if mime_type == 'application/pdf':
-                return self.pdf_extractor.extract_text(fh)
+                return self._extract_with_text_cache(
+                    fh.getvalue(), mime_type, self.pdf_extractor,
+                    lambda: list(self.pdf_extractor.iter_pages(fh))
+                )
             else:
-                return self.document_extractor.extract_text(fh, mime_type)
+                return self._extract_with_text_cache(
+                    fh.getvalue(), mime_type, self.document_extractor,
+                    lambda: list(self.document_extractor.iter_pages(fh, mime_type))
+                )
                 
         except Exception as e:
             logger.error(f"バイナリファイルの処理中にエラー: {str(e)}")
-            return ""
+            return []
+
+    def _extract_with_text_cache(self, data: bytes, mime_type, extractor, extract) -> List[str]:
+        """内容ハッシュと抽出器バージョンで抽出済みテキストを再利用し、なければ抽出する"""
+        if not self.text_cache.enabled:
+            return extract()
+
+        content_hash = self.text_cache.content_hash(data)
+        text = self.text_cache.get_text(content_hash, extractor.NAME, extractor.VERSION, mime_type)
+        if text is not None:
+            return text.split(PAGE_SEPARATOR)
+
+        pages = [page.replace(PAGE_SEPARATOR, '\n') for page in extract()]
+        if any(pages):
+            text = PAGE_SEPARATOR.join(pages)
+            self.text_cache.put_text(content_hash, extractor.NAME, extractor.VERSION, text, mime_type)
+        return pages
+
+    def _download_file(self, file_id) -> io.BytesIO:
+        """ファイルをダウンロード（同時ダウンロード数は max_downloads で制限）"""
+        with self._download_slots:
+            request = self.service.files().get_media(fileId=file_id)
+            fh = io.BytesIO()
+            downloader = MediaIoBaseDownload(fh, request)
+
+            done = False
+            while not done:
+                _, done = downloader.next_chunk()
+
+        fh.seek(0)
+        return fh
+
+    def _cache_key(self, file_id, file_info=None, export_mime_type=None) -> Optional[str]:
+        """md5Checksum（なければ modifiedTime）からキャッシュキーを生成"""
+        if not self.blob_cache.enabled:
+            return None
+
+        if not file_info or not (file_info.get('md5Checksum') or file_info.get('modifiedTime')):
+            try:
+                file_info = self.service.files().get(
+                    fileId=file_id,
+                    fields="md5Checksum, modifiedTime",
+                    supportsAllDrives=True
+                ).execute()
+            except Exception as e:
+                logger.warning(f"ファイルのメタデータを取得できませんでした: {str(e)}")
+                return None
+
+        version = file_info.get('md5Checksum') or file_info.get('modifiedTime')
+        if not version:
+            return None
+        if export_mime_type:
+            version = f"{version}:{export_mime_type}"
+        return self.blob_cache.make_key(file_id, version)
 
     def _get_export_mime_type(self, mime_type):
         """エクスポート用のMIMEタイプを取得"""
@@ -0,0 +1,15 @@
+"""Data model for per-file extraction results"""
+from dataclasses import dataclass, field
+from typing import List
+
+@dataclass
+class ExtractedFile:
+    file_id: str
+    name: str
+    mime_type: str
+    path: str = ""
+    pages: List[str] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return "\n\n".join(page for page in self.pages if page)
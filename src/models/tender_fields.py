@@ -1,32 +1,72 @@
 """Tender analysis field definitions and extraction rules"""
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+# 抽出ルールの正規表現で使う部品
+_LABEL_SEPARATOR = r"[ 　]*[：:][ 　]*"
+_LINE_VALUE = r"(?P<value>[^\n]{2,100}?)[ 　]*$"
+_CMS_TERMS = r"(?:CMS|ＣＭＳ|コンテンツ管理システム|コンテンツマネジメントシステム|WordPress|ワードプレス)"
+# 「CMSの導入の有無は提案による」など、導入するかどうかが決まっていない書き方
+_UNDECIDED_TERMS = r"(?:有無|要否|可否|是非|かどうか|か否か|提案による|提案に委ねる|任意|検討)"
 
 class TenderField:
-    def __init__(self, name: str, keywords: list[str], extraction_rules: str):
+    def __init__(self, name: str, keywords: list[str], extraction_rules: str, free_text: bool = False,
+                 patterns: Optional[list[tuple[str, Optional[str]]]] = None):
+        """
+        Args:
+            name: 項目名
+            keywords: 文書中で項目を探すためのキーワード
+            extraction_rules: 抽出ルール
+            free_text: 要約など自由記述の項目か（統合時に多数決ではなくLLMでまとめる）
+            patterns: LLMを使わずに抽出するための（正規表現, 一致したときの値）の組。
+                値が None の場合は正規表現の value グループを値とし、空文字の場合は
+                一致した箇所を後続のパターンに使わせない（値としては数えない）
+        """
         self.name = name
         self.keywords = keywords
         self.extraction_rules = extraction_rules
+        self.free_text = free_text
+        self.patterns = patterns or []
 
 TENDER_FIELDS: Dict[str, TenderField] = {
     "案件名": TenderField(
         "案件名",
         ["案件名", "件名", "調達案件名", "業務名", "事業名"],
-        "プロジェクト名や業務内容を端的に表現している部分を抽出してください"
+        "プロジェクト名や業務内容を端的に表現している部分を抽出してください",
+        patterns=[
+            (r"(?m)^[ 　]*(?:調達案件名|案件名|調達件名|件名|業務名|事業名)" + _LABEL_SEPARATOR + _LINE_VALUE, None)
+        ]
     ),
     "発注機関": TenderField(
         "発注機関",
         ["発注機関", "契約担当官", "支出負担行為担当官", "調達機関"],
-        "省庁名、部署名、組織名などを含む正式名称を抽出してください"
+        "省庁名、部署名、組織名などを含む正式名称を抽出してください",
+        patterns=[
+            (r"(?m)^[ 　]*(?:発注機関|調達機関)" + _LABEL_SEPARATOR + _LINE_VALUE, None),
+            # 「支出負担行為担当官 〇〇省大臣官房会計課長 …」の行。本文中の「契約担当官等が…」を拾わないよう、
+            # ひらがなを含まない語のみを値とする
+            (r"(?:分任)?(?:支出負担行為担当官|契約担当官)等?[ 　：:\n]+(?P<value>[^\sぁ-ん、。]{2,60})", None)
+        ]
     ),
     "入札の種類": TenderField(
         "入札の種類",
         ["入札方式", "入札区分", "調達方式", "契約方式"],
-        "一般競争入札、指名競争入札、総合評価落札方式などの入札方式を特定してください"
+        "一般競争入札、指名競争入札、総合評価落札方式などの入札方式を特定してください",
+        patterns=[
+            (r"(?:入札方式|入札区分|調達方式|契約方式)[ 　：:]*"
+             r"(?P<value>(?:一般|指名)競争入札(?:[（(][^）)\n]{1,20}[）)])?|総合評価落札方式|企画競争|随意契約)", None),
+            (r"(?P<value>(?:一般|指名)競争入札(?:[（(]総合評価落札方式[）)])?)に付します", None)
+        ]
     ),
     "CMSの有無": TenderField(
         "CMSの有無",
         ["CMS", "コンテンツ管理システム", "WordPress", "コンテンツマネジメントシステム"],
-        "システム要件からCMSの必要性を判断し、「有」「無」で回答してください"
+        "システム要件からCMSの必要性を判断し、「有」「無」で回答してください",
+        patterns=[
+            # 値が空文字のルールは、一致した箇所を「有」「無」のどちらにも数えない
+            (_CMS_TERMS + r"[^\n。]{0,20}?" + _UNDECIDED_TERMS, ""),
+            (_CMS_TERMS + r"[^\n。]{0,15}?(?:不要|導入しない|使用しない|利用しない|用いない)", "無"),
+            (_CMS_TERMS + r"[^\n。]{0,15}?(?:導入|構築|利用|使用|採用|更新)", "有")
+        ]
     ),
     "要件概要": TenderField(
         "要件概要",
@@ -35,6 +75,7 @@ TENDER_FIELDS: Dict[str, TenderField] = {
         1. プロジェクトの目的
         2. 主要な開発・導入項目
         3. 特記すべき技術要件
-        4. 保守・運用に関する要件"""
+        4. 保守・運用に関する要件""",
+        free_text=True
     )
 }
\ No newline at end of file
@@ -0,0 +1,41 @@
+"""Data models for streamed text records and chunks"""
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+@dataclass
+class TextRecord:
+    """ページ（ページのない形式では段落ブロック）単位のテキスト"""
+    source_file: str
+    page: Optional[int]
+    offset: int
+    text: str
+
+@dataclass
+class TextChunk:
+    """OpenAIに送る単位のテキストと、その出典"""
+    index: int
+    text: str
+    sources: List[Tuple[str, Optional[int]]] = field(default_factory=list)
+    token_count: int = 0
+
+    def add_source(self, source_file: str, page: Optional[int]) -> None:
+        if not self.sources or self.sources[-1] != (source_file, page):
+            self.sources.append((source_file, page))
+
+    def describe_sources(self) -> str:
+        """出典を「ファイル名 p.1-3」の形式で要約"""
+        pages_by_file = {}
+        for source_file, page in self.sources:
+            pages_by_file.setdefault(source_file, [])
+            if page is not None:
+                pages_by_file[source_file].append(page)
+
+        parts = []
+        for source_file, pages in pages_by_file.items():
+            if not pages:
+                parts.append(source_file)
+            elif min(pages) == max(pages):
+                parts.append(f"{source_file} p.{pages[0]}")
+            else:
+                parts.append(f"{source_file} p.{min(pages)}-{max(pages)}")
+        return ", ".join(parts)
@@ -1,23 +1,343 @@
 from src.services.openai_service import OpenAIService
+from src.services.batch_runner import BatchRunner
 from src.text_processor import TextProcessor
-import time
+from src.services.chunk_router import ChunkRouter
+from src.services.incremental_analysis import CompletenessTracker, prioritize_chunks
+from src.services.result_merger import normalize_value
+from src.services.rule_extractor import RuleExtractor
+from src.services.token_chunker import TokenChunker
+from src.models.tender_fields import TENDER_FIELDS
+from src.models.tender_response import TenderResponse, TenderFieldContent
+from src.models.text_record import TextChunk, TextRecord
+import asyncio
+import functools
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_MODES = ("full", "routed", "incremental", "batch")
 
 class TenderAnalyzer:
-    def __init__(self, api_key):
-        self.openai_service = OpenAIService(api_key)
+    def __init__(self, api_key, response_cache=None, mode=None, evaluate_routing=False, batch_id=None):
+        """
+        Args:
+            api_key: OpenAI APIキー
+            response_cache: LLM応答キャッシュ
+            mode: 分析モード（省略時は ANALYSIS_MODE、未設定なら full）
+                full: 全チャンクを全項目について分析する。ファイルの抽出と並行して、
+                    生成されたチャンクから順に送信する
+                routed: 項目ごとに関連するチャンクだけを分析する
+                incremental: 優先度の高いチャンクから順に分析し、全項目が埋まった時点で打ち切る
+                batch: routed と同じリクエストを Batch API でまとめて実行する（結果は24時間以内）
+                routed / incremental / batch は全チャンクが揃ってから送信を始めるため、
+                送信するトークンは減るが、ダウンロード・抽出と分析は重ならない
+            evaluate_routing: routed モードで全件分析も行い、振り分けの再現率を出力するか
+            batch_id: batch モードで再開する既存のバッチID
+        """
+        self.openai_service = OpenAIService(api_key, response_cache=response_cache)
         self.text_processor = TextProcessor()
+        mode = mode or os.getenv('ANALYSIS_MODE', 'full')
+        if mode not in ANALYSIS_MODES:
+            raise ValueError(f"不明な分析モードです: {mode}（{', '.join(ANALYSIS_MODES)} のいずれかを指定してください）")
+        self.mode = mode
+        self.evaluate_routing = evaluate_routing
+        self.router = ChunkRouter()
+        self.batch_id = batch_id
+        self.batch_runner = BatchRunner(self.openai_service)
+    
+    def _create_chunker(self) -> TokenChunker:
+        """システムプロンプトと応答枠を差し引いたトークン予算でチャンカーを生成"""
+        service = self.openai_service
+        return TokenChunker.for_model(
+            service.model,
+            service.token_counter.count(service.prompt_builder.build_system_prompt()),
+            service.max_output_tokens("extraction"),
+            service.token_counter
+        )
     
     def analyze_tender(self, text):
-        cleaned_text = self.text_processor.clean_text(text)
-        text_chunks = self.text_processor.chunk_text(cleaned_text)
-        
-        all_info = []
-        for chunk in text_chunks:
-            chunk_info = self.openai_service.analyze_chunk(chunk)
-            if chunk_info:
-                all_info.append(chunk_info)
-            time.sleep(1)
-        
+        return self.analyze_records([TextRecord(source_file="", page=None, offset=0, text=text)])
+
+    def analyze_records(self, records):
+        """analyze_records_async の同期呼び出し用ラッパー"""
+        return asyncio.run(self.analyze_records_async(records))
+
+    async def analyze_records_async(self, records):
+        """
+        ページ単位のレコードをクリーニング → チャンク化 → 分析のパイプラインで処理する
+
+        routed / incremental / batch モードではレコードを流しながら抽出ルールを適用し、
+        ルールで決まらなかった項目だけを、その項目に絞ったプロンプトで分析する。
+        batch モードではチャンクの分析と統合をそれぞれ1つのバッチとして Batch API で実行する。
+        full モードではチャンクを生成された順に全項目について分析する。いずれも
+        OPENAI_MAX_CONCURRENCY 件まで並行して送信し、送信ペースはレートリミッター（RPM/TPM）で制御する。
+        """
+        chunker = self._create_chunker()
+        cleaned_records = self.text_processor.clean_records(records)
+
+        if self.mode == "full":
+            text_chunks = chunker.chunk_records(cleaned_records)
+            results, rule_values = await self._analyze_full_scan(text_chunks), {}
+        else:
+            rule_extractor = RuleExtractor()
+            text_chunks = chunker.chunk_records(rule_extractor.scan(cleaned_records))
+            analyze = {
+                "routed": self._analyze_routed,
+                "incremental": self._analyze_incremental,
+                "batch": self._analyze_batch
+            }[self.mode]
+            results, rule_values = await analyze(text_chunks, rule_extractor, chunker.max_tokens)
+        all_info = [chunk_info for chunk_info in results if chunk_info]
+
+        if not chunker.stats.chunks:
+            logger.error("処理対象のテキストが見つかりませんでした")
+        else:
+            logger.info(f"チャンク統計: {chunker.stats.to_dict()}")
+        consolidated = None
         if all_info:
-            return self.openai_service.consolidate_results(all_info)
-        return None
\ No newline at end of file
+            if self.mode == "batch":
+                loop = asyncio.get_running_loop()
+                consolidated = await loop.run_in_executor(None, self.batch_runner.consolidate, all_info)
+            else:
+                consolidated = await self.openai_service.consolidate_results_async(all_info)
+            logger.info(f"統合統計（項目ごとのローカル/LLM統合回数）: {self.openai_service.merger.stats.to_dict()}")
+        if chunker.stats.chunks:
+            # 所要時間はモデルの応答時間。レート制限・再試行の待ち時間は APIリクエスト統計に分けて出す
+            logger.info(f"段階ごとの所要時間・料金: {self.openai_service.usage.report()}")
+            logger.info(f"APIリクエスト統計: {self.openai_service.report()}")
+        return self._apply_rule_values(consolidated, rule_values)
+
+    async def _analyze_full_scan(self, text_chunks):
+        """
+        全チャンクを全項目について分析
+
+        records がジェネレータであれば、最初のチャンクの分析は後続ファイルの抽出完了を待たずに開始される。
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.openai_service.max_concurrency)
+        tasks = []
+        while True:
+            # 空きができてから次のチャンクを取り出し、未送信のチャンクが溜まらないようにする
+            await semaphore.acquire()
+            # チャンクの生成はファイルのダウンロード・抽出を伴うため、イベントループの外で行う
+            chunk = await loop.run_in_executor(None, next, text_chunks, None)
+            if chunk is None:
+                semaphore.release()
+                break
+            logger.info(
+                f"チャンク {chunk.index + 1} を分析中（{chunk.token_count}トークン）: {chunk.describe_sources()}"
+            )
+            tasks.append(asyncio.create_task(self._analyze_chunk(chunk, semaphore)))
+        
+        return await asyncio.gather(*tasks)
+
+    async def _analyze_routed(self, text_chunks, rule_extractor, max_tokens):
+        """
+        項目ごとに関連度の高いチャンクだけを分析
+
+        関連度の計算には全チャンクが必要なため、抽出とチャンク化が終わってから送信を始める。
+        ルールで確度の高い値が得られた項目はLLMに問い合わせない。
+
+        Returns:
+            (チャンクごとの分析結果, ルールで抽出した項目の値)
+        """
+        chunks, rule_values, remaining = await self._collect_chunks(text_chunks, rule_extractor)
+        routes = self.router.route(chunks, remaining) if remaining else {}
+        requests = self._plan_requests(chunks, routes, max_tokens)
+        logger.info(f"チャンクの振り分け: {len(chunks)}件中{len(routes)}件を{len(requests)}回のリクエストで分析します")
+
+        semaphore = asyncio.Semaphore(self.openai_service.max_concurrency)
+        tasks = []
+        for chunk, field_names in requests:
+            await semaphore.acquire()
+            logger.info(
+                f"チャンク {chunk.index + 1} を分析中（{chunk.token_count}トークン、項目: {', '.join(field_names)}）: "
+                f"{chunk.describe_sources()}"
+            )
+            tasks.append(asyncio.create_task(self._analyze_chunk(chunk, semaphore, field_names)))
+        results = await asyncio.gather(*tasks)
+
+        if self.evaluate_routing:
+            # 比較用に全チャンクを全項目について分析する（LLM応答キャッシュが効くため2回目以降は安価）
+            full_results = await self._analyze_full_scan(iter(chunks))
+            report = self.router.recall_report(
+                routes, {chunk.index: result for chunk, result in zip(chunks, full_results)}, remaining
+            )
+            logger.info(f"振り分けの再現率（全件分析との比較）: {report}")
+        return results, rule_values
+
+    async def _analyze_incremental(self, text_chunks, rule_extractor, max_tokens):
+        """
+        優先度の高いチャンクから順に分析し、全項目が埋まった時点で以降のリクエストを打ち切る
+
+        OPENAI_MAX_CONCURRENCY 件ずつ並行して分析し、その都度まだ埋まっていない項目だけを問い合わせる。
+        構造化された項目が埋まった後、要件概要のためだけに分析するチャンク数は INCREMENTAL_SUMMARY_BUDGET までとする。
+        ストリーミング時は、受信中の項目で全項目が埋まった時点で同じ回の残りのリクエストも打ち切る。
+
+        Returns:
+            (チャンクごとの分析結果, ルールで抽出した項目の値)
+        """
+        chunks, rule_values, remaining = await self._collect_chunks(text_chunks, rule_extractor)
+        queue = prioritize_chunks(chunks)
+        tracker = CompletenessTracker(remaining)
+        wave_size = self.openai_service.max_concurrency
+        results = []
+        stop_reason = "all_fields_complete"
+
+        while not tracker.is_complete():
+            if not queue:
+                stop_reason = "chunks_exhausted"
+                break
+            if tracker.is_summary_budget_exhausted():
+                stop_reason = "summary_budget_exhausted"
+                break
+            wave, queue = queue[:wave_size], queue[wave_size:]
+            field_names = tracker.incomplete_fields()
+            for chunk in wave:
+                logger.info(
+                    f"チャンク {chunk.index + 1} を分析中（{chunk.token_count}トークン、項目: {', '.join(field_names)}）: "
+                    f"{chunk.describe_sources()}"
+                )
+            wave_results = await self._analyze_wave(wave, field_names, tracker)
+            for chunk, result in zip(wave, wave_results):
+                tracker.record(result, field_names, chunk.index)
+            results.extend(wave_results)
+
+        logger.info(f"段階的分析: {self._incremental_report(stop_reason, chunks, queue, tracker)}")
+        return results, rule_values
+
+    async def _analyze_batch(self, text_chunks, rule_extractor, max_tokens):
+        """
+        routed モードと同じリクエストを1つのバッチとして登録し、完了を待つ
+
+        Returns:
+            (チャンクごとの分析結果, ルールで抽出した項目の値)
+        """
+        chunks, rule_values, remaining = await self._collect_chunks(text_chunks, rule_extractor)
+        routes = self.router.route(chunks, remaining) if remaining else {}
+        requests = self._plan_requests(chunks, routes, max_tokens)
+        logger.info(f"チャンクの振り分け: {len(chunks)}件中{len(routes)}件を{len(requests)}件のバッチリクエストで分析します")
+        if not requests:
+            return [], rule_values
+
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(None, self.batch_runner.analyze_chunks, requests, self.batch_id)
+        return results, rule_values
+
+    async def _analyze_wave(self, wave, field_names, tracker):
+        """
+        チャンクを並行して分析し、ストリーミングで届いた項目で全項目が埋まった時点で残りを打ち切る
+
+        打ち切ったチャンクは、それまでに届いた項目だけの結果とする。
+        """
+        complete = asyncio.Event()
+        partial = {chunk.index: {} for chunk in wave}
+
+        def on_field(chunk_index, name, value):
+            partial[chunk_index][name] = TenderFieldContent(見出し=name, 内容=value)
+            tracker.record_field(chunk_index, name, value)
+            if tracker.is_complete():
+                complete.set()
+
+        tasks = [
+            asyncio.create_task(self.openai_service.analyze_chunk_async(
+                chunk.text, field_names, on_field=functools.partial(on_field, chunk.index)
+            ))
+            for chunk in wave
+        ]
+        waiter = asyncio.create_task(complete.wait())
+        pending = set(tasks)
+        while pending and not complete.is_set():
+            _, pending = await asyncio.wait(pending | {waiter}, return_when=asyncio.FIRST_COMPLETED)
+            pending.discard(waiter)
+        waiter.cancel()
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if pending:
+            logger.info(f"全項目が埋まったため、受信中の{len(pending)}件のリクエストを打ち切りました")
+
+        results = []
+        for chunk, task in zip(wave, tasks):
+            if not task.cancelled():
+                results.append(task.result())
+            else:
+                results.append(TenderResponse(項目=partial[chunk.index]) if partial[chunk.index] else None)
+        return results
+
+    @staticmethod
+    def _incremental_report(stop_reason, chunks, skipped, tracker):
+        return {
+            "stop_reason": stop_reason,
+            "chunks": len(chunks),
+            "analyzed_chunks": len(chunks) - len(skipped),
+            "skipped_chunks": len(skipped),
+            "skipped": ", ".join(f"{chunk.index + 1}({chunk.describe_sources()})" for chunk in skipped),
+            "fields": tracker.status()
+        }
+
+    async def _collect_chunks(self, text_chunks, rule_extractor):
+        """
+        全チャンクを生成し、ルールで確度の高い値が得られた項目を除いた残りの項目を求める
+
+        一致が少なく確度の低いルールの値は候補として返し、その項目はLLMでも抽出する。
+
+        Returns:
+            (チャンク, ルールで抽出した項目の値（候補を含む）, LLMで抽出する項目)
+        """
+        loop = asyncio.get_running_loop()
+        chunks = await loop.run_in_executor(None, list, text_chunks)
+        confident = rule_extractor.confident_values()
+        rule_values = {**rule_extractor.hint_values(), **confident}
+        if rule_extractor.enabled:
+            logger.info(f"ルールによる抽出: {rule_extractor.report()}")
+        remaining = [name for name in TENDER_FIELDS if name not in confident]
+        return chunks, rule_values, remaining
+
+    @staticmethod
+    def _plan_requests(chunks, routes, max_tokens):
+        """
+        振り分け結果からリクエストを組み立てる
+
+        残りが要件概要などの自由記述の項目だけで、選ばれたチャンクが1リクエストに収まる場合は
+        まとめて1回で要約させる。
+        """
+        selected = [(chunk, routes[chunk.index]) for chunk in chunks if chunk.index in routes]
+        field_names = sorted({name for _, names in selected for name in names}, key=list(TENDER_FIELDS).index)
+        all_free_text = all(TENDER_FIELDS[name].free_text for name in field_names)
+        if len(selected) <= 1 or not all_free_text or sum(chunk.token_count for chunk, _ in selected) > max_tokens:
+            return selected
+
+        merged = TextChunk(
+            index=selected[0][0].index,
+            text="\n\n".join(chunk.text for chunk, _ in selected),
+            token_count=sum(chunk.token_count for chunk, _ in selected)
+        )
+        for chunk, _ in selected:
+            for source_file, page in chunk.sources:
+                merged.add_source(source_file, page)
+        return [(merged, field_names)]
+
+    @staticmethod
+    def _apply_rule_values(response, rule_values):
+        """
+        ルールで抽出した値で、LLMの結果が空欄の項目を埋める（LLMの結果が無い場合は空の結果に書き込む）
+
+        ルールの値は候補であり、LLMが値を返した項目は上書きしない。
+        """
+        if response is None:
+            if not rule_values:
+                return None
+            response = TenderResponse.create_empty(list(TENDER_FIELDS))
+        for name, value in rule_values.items():
+            field = response.項目.get(name)
+            if field is None or not normalize_value(field.内容):
+                response.項目[name] = TenderFieldContent(見出し=name, 内容=value)
+        return response
+
+    async def _analyze_chunk(self, chunk, semaphore, field_names=None):
+        try:
+            return await self.openai_service.analyze_chunk_async(chunk.text, field_names)
+        finally:
+            semaphore.release()
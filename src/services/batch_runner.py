@@ -0,0 +1,248 @@
+"""Run chunk analysis and consolidation through the OpenAI Batch API"""
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+from src.config.model_config import BATCH_PRICE_RATIO
+from src.models.tender_response import TenderResponse
+from src.models.text_record import TextChunk
+from src.services.resilience import get_retry_after, is_retryable
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+class BatchRunner:
+    """
+    OpenAIService のリクエストを Batch API で実行する
+
+    リクエストを JSONL に書き出して登録し、完了までポーリングして結果を対応付ける。
+    登録したバッチIDは BATCH_STATE_DIR に保存し、同じ内容のリクエストを再実行した場合は
+    新たに登録せず既存のバッチの完了を待つ（中断後の再開）。
+    LLM応答キャッシュにある応答はバッチに含めず、バッチで失敗したリクエストは通常のAPIで実行し直す。
+    """
+    def __init__(self, service, state_dir: Optional[str] = None, poll_interval: Optional[float] = None,
+                 completion_window: str = "24h"):
+        self.service = service
+        self.state_dir = state_dir or os.getenv('BATCH_STATE_DIR', os.path.join('.cache', 'batches'))
+        self.poll_interval = poll_interval or float(os.getenv('BATCH_POLL_INTERVAL', '60'))
+        self.completion_window = completion_window
+
+    def analyze_chunks(self, requests: List[Tuple[TextChunk, List[str]]],
+                       batch_id: Optional[str] = None) -> List[Optional[TenderResponse]]:
+        """
+        チャンクと抽出する項目の組をまとめて分析
+
+        Args:
+            requests: (チャンク, 抽出する項目) のリスト
+            batch_id: 再開する既存のバッチID（省略時は保存済みの状態から探す）
+        """
+        bodies = {
+            f"chunk-{chunk.index}": self.service.build_chunk_request(chunk.text, field_names)
+            for chunk, field_names in requests
+        }
+        contents = self._run("extraction", bodies, batch_id)
+
+        results = []
+        for chunk, field_names in requests:
+            content, finish_reason = contents.get(f"chunk-{chunk.index}", (None, None))
+            if content is None:
+                logger.warning(f"チャンク {chunk.index + 1} のバッチ結果がないため、通常のAPIで分析します")
+                results.append(self.service.analyze_chunk(chunk.text, field_names))
+            elif self.service.escalation_reason(content, field_names, finish_reason):
+                # escalation 段階は上限も広げて再分析する（max_output_tokens を参照）
+                logger.warning(f"チャンク {chunk.index + 1} の応答が不完全なため、上位モデルで再分析します")
+                results.append(self.service.analyze_chunk(chunk.text, field_names, stage="escalation"))
+            else:
+                try:
+                    results.append(self.service.parse_chunk_response(content, field_names))
+                except Exception as e:
+                    logger.error(f"Error analyzing chunk: {str(e)}")
+                    results.append(None)
+        return results
+
+    def consolidate(self, results: List[TenderResponse]) -> Optional[TenderResponse]:
+        """
+        分析結果を段階的に統合（各段のうちローカルで決まらないグループを1つのバッチで統合する）
+        """
+        if not results:
+            logger.warning("No results to consolidate")
+            return None
+
+        service = self.service
+        level = 1
+        while True:
+            groups = service.split_groups(results)
+            logger.info(f"統合 第{level}段: {len(results)}件 → {len(groups)}件")
+            merged = []
+            bodies = {}
+            for i, group in enumerate(groups):
+                if not service.needs_request(group, groups):
+                    merged.append((group[0], []))
+                    continue
+                outcome = service.merger.merge(group)
+                service.merger.record(outcome.unresolved)
+                if outcome.unresolved:
+                    bodies[f"level{level}-group{i}"] = service.build_consolidation_request(group, outcome.unresolved)
+                merged.append((outcome.response, outcome.unresolved))
+
+            contents = self._run("consolidation", bodies) if bodies else {}
+            results = []
+            for i, (response, unresolved) in enumerate(merged):
+                content, _ = contents.get(f"level{level}-group{i}", (None, None))
+                if unresolved and content is None:
+                    logger.warning("統合に失敗したため、各項目で最も長い内容を採用します")
+                elif unresolved:
+                    try:
+                        resolved = service.validator.validate_and_clean(json.loads(content), unresolved)
+                        response = service.apply_resolved(response, resolved)
+                    except ValueError as e:
+                        logger.error(f"Error consolidating results: {str(e)}")
+                results.append(response)
+
+            if len(results) == 1:
+                return results[0]
+            level += 1
+
+    def _run(self, stage: str, bodies: Dict[str, dict],
+             batch_id: Optional[str] = None) -> Dict[str, Tuple[str, Optional[str]]]:
+        """
+        リクエストをバッチで実行し、custom_id → (応答本文, finish_reason) を返す
+        （失敗したリクエストは含まない。キャッシュから応答した場合の finish_reason は None）
+        """
+        service = self.service
+        contents = {}
+        pending = {}
+        for custom_id, request in bodies.items():
+            cached = service.get_cached_response(request)
+            if cached is not None:
+                service.usage.record_cached(stage)
+                contents[custom_id] = (cached, None)
+            else:
+                pending[custom_id] = request
+        if not pending:
+            return contents
+
+        lines = [
+            json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": service.request_body(request)
+            }, ensure_ascii=False)
+            for custom_id, request in pending.items()
+        ]
+        payload = ("\n".join(lines) + "\n").encode('utf-8')
+        job_key = hashlib.sha256(payload).hexdigest()[:16]
+
+        batch = self._resume(batch_id or self._load_state(job_key).get("batch_id"))
+        if batch is None:
+            batch = self._submit(stage, job_key, payload, len(pending))
+
+        started = time.monotonic()
+        batch = self._wait(batch)
+        logger.info(f"バッチ {batch.id} が終了しました（{batch.status}、{time.monotonic() - started:.0f}秒）")
+        if batch.status != "completed" or not batch.output_file_id:
+            logger.error(f"バッチ {batch.id} が完了しませんでした: {batch.status}")
+            self._remove_state(job_key)
+            return contents
+
+        output = service.client.files.content(batch.output_file_id).text
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            request = pending.get(item.get("custom_id"))
+            response = item.get("response") or {}
+            if request is None:
+                continue
+            if response.get("status_code") != 200:
+                logger.warning(f"バッチ内のリクエスト {item.get('custom_id')} が失敗しました: {item.get('error') or response}")
+                continue
+            body = response.get("body") or {}
+            choice = body["choices"][0]
+            content = choice["message"]["content"].strip()
+            service.store_response(request, content)
+            service.usage.record(stage, request["model"], 0.0, body.get("usage"), price_ratio=BATCH_PRICE_RATIO)
+            contents[item["custom_id"]] = (content, choice.get("finish_reason"))
+
+        self._remove_state(job_key)
+        return contents
+
+    def _resume(self, batch_id: Optional[str]):
+        """既存のバッチを取得（失敗・期限切れ・取り消し済みの場合は None）"""
+        if not batch_id:
+            return None
+        batch = self.service.resilience.call(lambda: self.service.client.batches.retrieve(batch_id))
+        if batch.status in BATCH_TERMINAL_STATUSES - {"completed"}:
+            logger.warning(f"バッチ {batch_id} は {batch.status} のため、新たに登録します")
+            return None
+        logger.info(f"既存のバッチ {batch_id} を再開します（{batch.status}）")
+        return batch
+
+    def _submit(self, stage: str, job_key: str, payload: bytes, count: int):
+        """JSONL をアップロードしてバッチを登録"""
+        os.makedirs(self.state_dir, exist_ok=True)
+        path = os.path.join(self.state_dir, f"{job_key}.jsonl")
+        with open(path, 'wb') as f:
+            f.write(payload)
+
+        client = self.service.client
+        with open(path, 'rb') as f:
+            input_file = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=self.completion_window,
+            metadata={"stage": stage}
+        )
+        self._save_state(job_key, {"batch_id": batch.id, "stage": stage, "requests": count})
+        logger.info(f"バッチを登録しました: {batch.id}（{stage}、{count}件）")
+        return batch
+
+    def _wait(self, batch):
+        """
+        バッチが終了するまでポーリング
+
+        ポーリングは数時間に及ぶため、一時的なエラー（レート制限・接続断・5xx）はログに残して
+        次の間隔で取得し直す（Retry-After があればそれ以上待つ）。それ以外のエラーは送出する。
+        """
+        delay = self.poll_interval
+        while batch.status not in BATCH_TERMINAL_STATUSES:
+            counts = getattr(batch, 'request_counts', None)
+            if counts:
+                logger.info(f"バッチ {batch.id}: {batch.status}（{counts.completed}/{counts.total}件完了）")
+            time.sleep(delay)
+            delay = self.poll_interval
+            try:
+                batch = self.service.client.batches.retrieve(batch.id)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                delay = max(self.poll_interval, get_retry_after(e) or 0.0)
+                logger.warning(f"バッチ {batch.id} の状態を取得できませんでした。{delay:.0f}秒後に再取得します: {str(e)}")
+        return batch
+
+    def _state_path(self, job_key: str) -> str:
+        return os.path.join(self.state_dir, f"{job_key}.json")
+
+    def _load_state(self, job_key: str) -> dict:
+        try:
+            with open(self._state_path(job_key), encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_state(self, job_key: str, state: dict) -> None:
+        with open(self._state_path(job_key), 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+
+    def _remove_state(self, job_key: str) -> None:
+        for path in (self._state_path(job_key), os.path.join(self.state_dir, f"{job_key}.jsonl")):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
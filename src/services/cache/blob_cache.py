@@ -0,0 +1,146 @@
+"""On-disk LRU cache for files downloaded from Google Drive"""
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+from src.services.cache.cache_stats import CacheStats
+
+logger = logging.getLogger(__name__)
+
+class BlobCache:
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None,
+                 enabled: Optional[bool] = None):
+        """
+        Args:
+            cache_dir: キャッシュディレクトリ（省略時は DRIVE_CACHE_DIR）
+            max_bytes: キャッシュ容量の上限（省略時は DRIVE_CACHE_MAX_MB）
+            enabled: False の場合はキャッシュを読み書きしない（バイパス）
+        """
+        self.cache_dir = cache_dir or os.getenv('DRIVE_CACHE_DIR', os.path.join('.cache', 'drive'))
+        self.max_bytes = max_bytes or int(float(os.getenv('DRIVE_CACHE_MAX_MB', '1024')) * 1024 * 1024)
+        if enabled is None:
+            enabled = os.getenv('DRIVE_CACHE_ENABLED', 'true').lower() == 'true'
+        self.enabled = enabled
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        if self.enabled:
+            self._load_index()
+
+    @staticmethod
+    def make_key(file_id: str, version: str) -> str:
+        """ファイルIDとバージョン（md5Checksum または modifiedTime）からキーを生成"""
+        return hashlib.sha256(f"{file_id}:{version}".encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """キャッシュからデータを取得（存在しない場合は None）"""
+        if not self.enabled:
+            return None
+
+        path = self._path_for(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self._forget(key)
+            self.stats.record_miss()
+            return None
+        except Exception as e:
+            logger.error(f"キャッシュの読み込み中にエラー: {str(e)}")
+            self.stats.record_miss()
+            return None
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.stats.record_hit(len(data))
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """データをキャッシュに保存し、上限を超えた分を古い順に削除"""
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+
+        path = self._path_for(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 他のスレッドが読み途中のファイルを壊さないよう、一時ファイル経由で置き換える
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"キャッシュの書き込み中にエラー: {str(e)}")
+            return
+
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self.stats.record_write()
+            self._evict()
+
+    def purge(self) -> None:
+        """キャッシュを全て削除"""
+        with self._lock:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            self._entries.clear()
+            self._total_bytes = 0
+        logger.info(f"Driveファイルキャッシュを削除しました: {self.cache_dir}")
+
+    def report(self) -> Dict[str, float]:
+        """キャッシュの利用状況を取得"""
+        report = self.stats.to_dict()
+        report["entries"] = len(self._entries)
+        report["total_bytes"] = self._total_bytes
+        return report
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def _forget(self, key: str) -> None:
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self) -> None:
+        """容量上限を超えている間、最も古く使われたエントリを削除"""
+        evicted = 0
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path_for(key))
+            except OSError:
+                pass
+            evicted += 1
+        if evicted:
+            self.stats.record_eviction(evicted)
+
+    def _load_index(self) -> None:
+        """既存のキャッシュファイルを最終利用時刻順に読み込む"""
+        entries = []
+        if os.path.isdir(self.cache_dir):
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    if name.startswith('.tmp-'):
+                        os.remove(path)
+                        continue
+                    stat = os.stat(path)
+                    entries.append((stat.st_mtime, name, stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict()
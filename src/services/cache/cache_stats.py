@@ -0,0 +1,45 @@
+"""Hit/miss counters shared by the local caches"""
+import threading
+from dataclasses import dataclass, field
+from typing import Dict
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+    bytes_saved: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record_hit(self, size: int) -> None:
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += size
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def record_write(self) -> None:
+        with self._lock:
+            self.writes += 1
+
+    def record_eviction(self, count: int = 1) -> None:
+        with self._lock:
+            self.evictions += count
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "bytes_saved": self.bytes_saved,
+            "hit_rate": round(self.hit_rate, 3)
+        }
@@ -0,0 +1,55 @@
+"""Persistent cache of OpenAI chat completion responses"""
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional
+from src.services.cache.sqlite_cache import SQLiteCache
+
+class ResponseCache(SQLiteCache):
+    """
+    LLM応答のキャッシュ
+
+    キーはモデル・温度・プロンプトテンプレートのバージョン・メッセージ等のリクエスト内容のハッシュ、
+    namespace はプロンプトテンプレートのバージョン。有効期限は作成時刻から数える。
+    """
+    EXPIRE_BY = "created_at"
+
+    def __init__(self, db_path: Optional[str] = None, max_bytes: Optional[int] = None,
+                 max_age_seconds: Optional[float] = None, enabled: Optional[bool] = None):
+        if enabled is None:
+            enabled = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+        super().__init__(
+            db_path=db_path or os.getenv('LLM_CACHE_PATH', os.path.join('.cache', 'llm_cache.sqlite3')),
+            max_bytes=max_bytes or int(float(os.getenv('LLM_CACHE_MAX_MB', '256')) * 1024 * 1024),
+            max_age_seconds=max_age_seconds or float(os.getenv('LLM_CACHE_TTL_DAYS', '30')) * 86400,
+            enabled=enabled
+        )
+
+    @staticmethod
+    def namespace(prompt_version: str) -> str:
+        return f"llm:{prompt_version}"
+
+    @staticmethod
+    def make_key(request: Dict[str, Any], prompt_version: str) -> str:
+        """
+        リクエスト内容からキーを生成
+
+        応答内容に影響しないパラメータ（timeout など）は呼び出し元で除いておくこと。
+        """
+        payload = json.dumps(
+            {"prompt_version": prompt_version, "request": request},
+            ensure_ascii=False, sort_keys=True, separators=(',', ':')
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get_response(self, request: Dict[str, Any], prompt_version: str) -> Optional[str]:
+        """キャッシュ済みの応答本文を取得（存在しない場合は None）"""
+        return self.get(self.make_key(request, prompt_version), self.namespace(prompt_version))
+
+    def put_response(self, request: Dict[str, Any], prompt_version: str, content: str) -> None:
+        """応答本文を保存"""
+        self.put(self.make_key(request, prompt_version), self.namespace(prompt_version), content)
+
+    def purge_stale_versions(self, prompt_version: str) -> int:
+        """旧バージョンのプロンプトで得た応答を削除"""
+        return self.delete_namespace("llm:", keep=self.namespace(prompt_version))
@@ -0,0 +1,40 @@
+"""Persistent record of the values last written to each sheet"""
+import json
+import os
+from typing import List, Optional
+from src.services.cache.sqlite_cache import SQLiteCache
+
+class SheetSnapshotCache(SQLiteCache):
+    """
+    シートに最後に書き込んだ値の記録
+
+    namespace はスプレッドシートID、キーはシート（と行）を表す文字列。
+    次回の書き込みをこの記録と比べ、変わったセルだけを送る（同じなら書き込まない）。
+    シート側を手で編集した場合は記録と食い違うため、有効期限は作成時刻から数え、
+    期限が切れたシートは次回に全体を書き直す。
+    """
+    EXPIRE_BY = "created_at"
+
+    def __init__(self, db_path: Optional[str] = None, max_bytes: Optional[int] = None,
+                 max_age_seconds: Optional[float] = None, enabled: Optional[bool] = None):
+        if enabled is None:
+            enabled = os.getenv('SHEET_SNAPSHOT_ENABLED', 'true').lower() == 'true'
+        super().__init__(
+            db_path=db_path or os.getenv('SHEET_SNAPSHOT_PATH', os.path.join('.cache', 'sheet_snapshots.sqlite3')),
+            max_bytes=max_bytes or int(float(os.getenv('SHEET_SNAPSHOT_MAX_MB', '64')) * 1024 * 1024),
+            max_age_seconds=max_age_seconds or float(os.getenv('SHEET_SNAPSHOT_MAX_AGE_DAYS', '7')) * 86400,
+            enabled=enabled
+        )
+
+    @staticmethod
+    def namespace(spreadsheet_id: str) -> str:
+        return f"sheet:{spreadsheet_id}"
+
+    def get_rows(self, spreadsheet_id: str, key: str) -> Optional[List[List[str]]]:
+        """最後に書き込んだ行を取得（記録がない場合は None）"""
+        value = self.get(key, self.namespace(spreadsheet_id))
+        return json.loads(value) if value is not None else None
+
+    def put_rows(self, spreadsheet_id: str, key: str, rows: List[List[str]]) -> None:
+        """書き込んだ行を記録"""
+        self.put(key, self.namespace(spreadsheet_id), json.dumps(rows, ensure_ascii=False))
@@ -0,0 +1,200 @@
+"""Single-file SQLite key/value store shared by the persistent caches"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from src.services.cache.cache_stats import CacheStats
+
+logger = logging.getLogger(__name__)
+
+class SQLiteCache:
+    """
+    スレッド・プロセス間で共有できるSQLiteベースのキャッシュ
+
+    WALモードで開くため、書き込み中でも他の読み取りはブロックされない。
+    接続はスレッドごとに保持する。
+    """
+    EVICT_EVERY_WRITES = 100
+    # max_age_seconds の基準となる列（accessed_at: 最終利用から、created_at: 作成から）
+    EXPIRE_BY = "accessed_at"
+
+    def __init__(self, db_path: str, max_bytes: int, max_age_seconds: Optional[float] = None,
+                 enabled: bool = True):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.enabled = enabled
+        self.stats = CacheStats()
+        self._local = threading.local()
+        self._writes_since_evict = 0
+        self._lock = threading.Lock()
+        if self.enabled:
+            try:
+                self._initialize()
+                self.evict()
+            except Exception as e:
+                logger.error(f"キャッシュDBの初期化中にエラー: {str(e)}")
+                self.enabled = False
+
+    def get(self, key: str, namespace: str) -> Optional[str]:
+        """キーに対応する値を取得（存在しない場合は None）"""
+        if not self.enabled:
+            return None
+
+        try:
+            conn = self._connection()
+            min_time = time.time() - self.max_age_seconds if self.max_age_seconds else 0
+            row = conn.execute(
+                f"SELECT value FROM entries WHERE key = ? AND namespace = ? AND {self.EXPIRE_BY} >= ?",
+                (key, namespace, min_time)
+            ).fetchone()
+            if row is None:
+                self.stats.record_miss()
+                return None
+
+            conn.execute(
+                "UPDATE entries SET accessed_at = ? WHERE key = ? AND namespace = ?",
+                (time.time(), key, namespace)
+            )
+            conn.commit()
+            self.stats.record_hit(len(row[0].encode('utf-8')))
+            return row[0]
+        except Exception as e:
+            logger.error(f"キャッシュの読み込み中にエラー: {str(e)}")
+            self.stats.record_miss()
+            return None
+
+    def put(self, key: str, namespace: str, value: str) -> None:
+        """値を保存（既存のエントリは置き換える）"""
+        if not self.enabled:
+            return
+
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, namespace, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, namespace, value, len(value.encode('utf-8')), now, now)
+            )
+            conn.commit()
+            self.stats.record_write()
+        except Exception as e:
+            logger.error(f"キャッシュの書き込み中にエラー: {str(e)}")
+            return
+
+        with self._lock:
+            self._writes_since_evict += 1
+            should_evict = self._writes_since_evict >= self.EVICT_EVERY_WRITES
+            if should_evict:
+                self._writes_since_evict = 0
+        if should_evict:
+            self.evict()
+
+    def evict(self) -> None:
+        """期限切れのエントリと、容量上限を超えた分の古いエントリを削除"""
+        if not self.enabled:
+            return
+
+        try:
+            conn = self._connection()
+            evicted = 0
+            if self.max_age_seconds:
+                cursor = conn.execute(
+                    f"DELETE FROM entries WHERE {self.EXPIRE_BY} < ?",
+                    (time.time() - self.max_age_seconds,)
+                )
+                evicted += cursor.rowcount
+
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                rows = conn.execute(
+                    "SELECT key, namespace, size FROM entries ORDER BY accessed_at"
+                ).fetchall()
+                doomed = []
+                for key, namespace, size in rows:
+                    if excess <= 0:
+                        break
+                    doomed.append((key, namespace))
+                    excess -= size
+                conn.executemany("DELETE FROM entries WHERE key = ? AND namespace = ?", doomed)
+                evicted += len(doomed)
+
+            conn.commit()
+            if evicted:
+                self.stats.record_eviction(evicted)
+        except Exception as e:
+            logger.error(f"キャッシュの削除処理中にエラー: {str(e)}")
+
+    def delete_namespace(self, namespace_prefix: str, keep: Optional[str] = None) -> int:
+        """指定プレフィックスのnamespaceのエントリを削除（keep は残す）"""
+        if not self.enabled:
+            return 0
+
+        try:
+            conn = self._connection()
+            cursor = conn.execute(
+                "DELETE FROM entries WHERE namespace LIKE ? AND namespace != ?",
+                (f"{namespace_prefix}%", keep or "")
+            )
+            conn.commit()
+            return cursor.rowcount
+        except Exception as e:
+            logger.error(f"キャッシュの削除処理中にエラー: {str(e)}")
+            return 0
+
+    def purge(self) -> None:
+        """キャッシュを全て削除"""
+        if not self.enabled:
+            return
+
+        conn = self._connection()
+        conn.execute("DELETE FROM entries")
+        conn.commit()
+        conn.execute("VACUUM")
+        logger.info(f"キャッシュを削除しました: {self.db_path}")
+
+    def report(self) -> Dict[str, float]:
+        """キャッシュの利用状況を取得"""
+        report = self.stats.to_dict()
+        if self.enabled:
+            try:
+                count, total = self._connection().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+                ).fetchone()
+                report["entries"] = count
+                report["total_bytes"] = total
+            except Exception as e:
+                logger.error(f"キャッシュの集計中にエラー: {str(e)}")
+        return report
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _initialize(self) -> None:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT NOT NULL, "
+            "namespace TEXT NOT NULL, "
+            "value TEXT NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, "
+            "accessed_at REAL NOT NULL, "
+            "PRIMARY KEY (key, namespace))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed_at ON entries (accessed_at)")
+        conn.commit()
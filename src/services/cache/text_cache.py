@@ -0,0 +1,52 @@
+"""Persistent cache of extracted document text"""
+import hashlib
+import os
+from typing import Optional
+from src.services.cache.sqlite_cache import SQLiteCache
+
+class TextCache(SQLiteCache):
+    """
+    抽出済みテキストのキャッシュ
+
+    キーはファイル内容のハッシュ、namespace は「抽出器名:バージョン」。
+    抽出器の VERSION を上げると、その抽出器のエントリだけが無効になる。
+    """
+    def __init__(self, db_path: Optional[str] = None, max_bytes: Optional[int] = None,
+                 max_age_seconds: Optional[float] = None, enabled: Optional[bool] = None):
+        if enabled is None:
+            enabled = os.getenv('TEXT_CACHE_ENABLED', 'true').lower() == 'true'
+        super().__init__(
+            db_path=db_path or os.getenv('TEXT_CACHE_PATH', os.path.join('.cache', 'text_cache.sqlite3')),
+            max_bytes=max_bytes or int(float(os.getenv('TEXT_CACHE_MAX_MB', '512')) * 1024 * 1024),
+            max_age_seconds=max_age_seconds or float(os.getenv('TEXT_CACHE_MAX_AGE_DAYS', '90')) * 86400,
+            enabled=enabled
+        )
+
+    @staticmethod
+    def content_hash(data: bytes) -> str:
+        """ファイル内容のハッシュを計算"""
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def namespace(extractor: str, version: str) -> str:
+        return f"{extractor}:{version}"
+
+    def get_text(self, content_hash: str, extractor: str, version: str, variant: str = "") -> Optional[str]:
+        """
+        抽出済みテキストを取得
+
+        Args:
+            content_hash: ファイル内容のハッシュ
+            extractor: 抽出器名
+            version: 抽出器のバージョン
+            variant: 同じ内容でも抽出結果が変わる条件（MIMEタイプなど）
+        """
+        return self.get(f"{content_hash}:{variant}", self.namespace(extractor, version))
+
+    def put_text(self, content_hash: str, extractor: str, version: str, text: str, variant: str = "") -> None:
+        """抽出済みテキストを保存"""
+        self.put(f"{content_hash}:{variant}", self.namespace(extractor, version), text)
+
+    def purge_stale_versions(self, extractor: str, version: str) -> int:
+        """抽出器の旧バージョンのエントリを削除"""
+        return self.delete_namespace(f"{extractor}:", keep=self.namespace(extractor, version))
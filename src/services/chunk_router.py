@@ -0,0 +1,112 @@
+"""Route chunks to the fields they are likely to contain using a BM25 keyword index"""
+import logging
+import math
+import os
+from typing import Dict, Iterable, List, Optional
+from src.models.tender_fields import TENDER_FIELDS
+from src.models.tender_response import TenderResponse
+from src.models.text_record import TextChunk
+from src.services.result_merger import normalize_value
+
+logger = logging.getLogger(__name__)
+
+class KeywordIndex:
+    """
+    キーワード（TENDER_FIELDS の keywords）をタームとするインメモリの転置インデックス
+
+    日本語は分かち書きせず、キーワードの出現回数をそのまま頻度として BM25 でスコア付けする。
+    """
+    def __init__(self, terms: Iterable[str], k1: float = 1.2, b: float = 0.75):
+        self.terms = {term.lower() for term in terms}
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = {term: {} for term in self.terms}
+        self.lengths: Dict[int, int] = {}
+
+    def add(self, doc_id: int, text: str) -> None:
+        lowered = text.lower()
+        self.lengths[doc_id] = max(1, len(text))
+        for term in self.terms:
+            count = lowered.count(term)
+            if count:
+                self.postings[term][doc_id] = count
+
+    def score(self, terms: Iterable[str]) -> Dict[int, float]:
+        """terms に対する各文書のスコア（一致しない文書は含まない）"""
+        total = len(self.lengths)
+        if not total:
+            return {}
+        average_length = sum(self.lengths.values()) / total
+
+        scores: Dict[int, float] = {}
+        for term in {term.lower() for term in terms}:
+            postings = self.postings.get(term, {})
+            idf = math.log((total - len(postings) + 0.5) / (len(postings) + 0.5) + 1)
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+class ChunkRouter:
+    """
+    項目ごとにキーワードの関連度が高い上位 top_k 件のチャンクを選び、
+    チャンクごとに問い合わせる項目を決める
+
+    キーワードがどのチャンクにも無い項目は、全項目のキーワードによるスコアの上位 top_k 件
+    （それも無ければ全チャンク）に振り分け、fallback_fields に記録する。
+    """
+    def __init__(self, top_k: Optional[int] = None):
+        self.top_k = top_k or int(os.getenv('ROUTING_TOP_K', '3'))
+        self.fallback_fields: List[str] = []
+
+    def route(self, chunks: List[TextChunk], field_names: Optional[List[str]] = None) -> Dict[int, List[str]]:
+        """チャンク番号 → そのチャンクで抽出する項目名（field_names を指定した場合はその項目のみ振り分ける）"""
+        fields = [field for field in TENDER_FIELDS.values() if field_names is None or field.name in field_names]
+        index = KeywordIndex(keyword for field in fields for keyword in field.keywords)
+        for chunk in chunks:
+            index.add(chunk.index, chunk.text)
+
+        routes: Dict[int, List[str]] = {}
+        overall_scores = None
+        self.fallback_fields = []
+        for field in fields:
+            selected = self._top(index.score(field.keywords))
+            if not selected and chunks:
+                if overall_scores is None:
+                    overall_scores = index.score(index.terms)
+                selected = self._top(overall_scores) or [chunk.index for chunk in chunks]
+                self.fallback_fields.append(field.name)
+                logger.warning(
+                    f"項目「{field.name}」のキーワードを含むチャンクがないため、"
+                    f"{'全項目のキーワードで上位の' if overall_scores else '全'}{len(selected)}件のチャンクから探します"
+                )
+            for doc_id in selected:
+                routes.setdefault(doc_id, []).append(field.name)
+        return dict(sorted(routes.items()))
+
+    def _top(self, scores: Dict[int, float]) -> List[int]:
+        return sorted(scores, key=lambda doc_id: (-scores[doc_id], doc_id))[:self.top_k]
+
+    def recall_report(self, routes: Dict[int, List[str]], full_results: Dict[int, Optional[TenderResponse]],
+                      field_names: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+        """
+        全チャンクを分析した結果と比べた振り分けの再現率
+
+        値が得られたチャンクのうち、振り分けで選ばれていたチャンクの割合を項目ごとに集計する。
+        field_names を指定した場合は、振り分けの対象にした項目だけを集計する。
+        fallback はキーワードが見つからず、代わりのチャンクに振り分けた項目か。
+        """
+        report = {}
+        for name in field_names if field_names is not None else TENDER_FIELDS:
+            relevant = {
+                doc_id for doc_id, result in full_results.items()
+                if result and name in result.項目 and normalize_value(result.項目[name].内容)
+            }
+            selected = {doc_id for doc_id, routed_names in routes.items() if name in routed_names}
+            report[name] = {
+                "selected": len(selected),
+                "relevant": len(relevant),
+                "recall": round(len(relevant & selected) / len(relevant), 3) if relevant else 1.0,
+                "fallback": name in self.fallback_fields
+            }
+        return report
@@ -0,0 +1,97 @@
+"""Priority ordering and completeness tracking for early-exit incremental analysis"""
+import os
+import re
+from typing import Dict, List, Optional
+from src.models.tender_fields import TENDER_FIELDS
+from src.models.tender_response import TenderResponse
+from src.models.text_record import TextChunk
+from src.services.result_merger import agreed_value, group_values
+
+# 公告などの文書を最優先で分析する
+DEFAULT_NOTICE_PATTERN = r"公告|公示|入札説明書|募集要項"
+
+def prioritize_chunks(chunks: List[TextChunk], notice_pattern: Optional[str] = None) -> List[TextChunk]:
+    """
+    チャンクを優先度順に並べる
+
+    1. ファイル名が公告・公示等のチャンク
+    2. 各ファイルの表紙（1ページ目、またはページのない形式の先頭チャンク）を含むチャンク
+    3. 本文
+    同じ優先度の中では元の順序を保つ。
+    """
+    notice = re.compile(notice_pattern or os.getenv('INCREMENTAL_NOTICE_PATTERN', DEFAULT_NOTICE_PATTERN))
+    seen_files = set()
+
+    def priority(chunk: TextChunk) -> int:
+        is_cover = False
+        for source_file, page in chunk.sources:
+            if page == 1 or (page is None and source_file not in seen_files):
+                is_cover = True
+            seen_files.add(source_file)
+        if any(notice.search(source_file) for source_file, _ in chunk.sources):
+            return 0
+        return 1 if is_cover else 2
+
+    priorities = [priority(chunk) for chunk in chunks]
+    return [chunk for _, chunk in sorted(zip(priorities, chunks), key=lambda item: (item[0], item[1].index))]
+
+class CompletenessTracker:
+    """
+    分析済みの結果から、項目ごとに十分な情報が得られたかを判定する
+
+    - 構造化された項目: 空欄でない値が required_agreements 件以上あり、全て一致していれば完了
+    - 自由記述の項目（要件概要）: 空欄でない値が summary_chunks 件得られたら完了
+      （summary_chunks が 0 の場合は他の項目と同時に打ち切る）
+
+    構造化された項目が全て完了した後、自由記述の項目のためだけに分析するチャンクは
+    summary_budget 件までとする。
+    値はチャンク単位で保持するため、ストリーミング中に届いた項目（record_field）と
+    応答全体（record）を同じチャンクについて記録しても二重には数えない。
+    """
+    def __init__(self, field_names: List[str], required_agreements: Optional[int] = None,
+                 summary_chunks: Optional[int] = None, summary_budget: Optional[int] = None):
+        self.field_names = field_names
+        self.required_agreements = required_agreements or int(os.getenv('INCREMENTAL_REQUIRED_AGREEMENTS', '1'))
+        if summary_chunks is None:
+            summary_chunks = int(os.getenv('INCREMENTAL_SUMMARY_CHUNKS', '2'))
+        if summary_budget is None:
+            summary_budget = int(os.getenv('INCREMENTAL_SUMMARY_BUDGET', '4'))
+        self.summary_chunks = summary_chunks
+        self.summary_budget = summary_budget
+        self.summary_only_chunks = 0
+        self._values: Dict[str, Dict[int, str]] = {name: {} for name in field_names}
+
+    def record(self, result: Optional[TenderResponse], field_names: List[str], chunk_index: int) -> None:
+        """field_names を問い合わせたチャンクの分析結果を記録"""
+        if all(TENDER_FIELDS[name].free_text for name in field_names):
+            self.summary_only_chunks += 1
+        if not result:
+            return
+        for name, field in result.項目.items():
+            self.record_field(chunk_index, name, field.内容)
+
+    def record_field(self, chunk_index: int, name: str, value: str) -> None:
+        """チャンクの1項目の値を記録（ストリーミングで項目が確定した時点で呼び出す）"""
+        if name in self._values and group_values([value]):
+            self._values[name][chunk_index] = value
+
+    def is_field_complete(self, name: str) -> bool:
+        values = list(self._values[name].values())
+        if TENDER_FIELDS[name].free_text:
+            return len(values) >= self.summary_chunks
+        return len(values) >= self.required_agreements and agreed_value(group_values(values)) is not None
+
+    def incomplete_fields(self) -> List[str]:
+        return [name for name in self.field_names if not self.is_field_complete(name)]
+
+    def is_complete(self) -> bool:
+        return not self.incomplete_fields()
+
+    def is_summary_budget_exhausted(self) -> bool:
+        return self.summary_only_chunks >= self.summary_budget
+
+    def status(self) -> Dict[str, Dict[str, object]]:
+        return {
+            name: {"values": len(values), "complete": self.is_field_complete(name)}
+            for name, values in self._values.items()
+        }
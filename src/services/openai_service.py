@@ -1,79 +1,502 @@
 """OpenAI API service for tender analysis"""
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+from openai import AsyncOpenAI, OpenAI
+import asyncio
 import json
 import os
 import logging
-from typing import Optional, List
+import time
+from typing import Callable, Optional, List, Tuple
+from src.config.model_config import get_context_window
+from src.services.cache.response_cache import ResponseCache
 from src.services.prompt_builder import PromptBuilder
+from src.services.prompt_templates import PROMPT_TEMPLATE_VERSION
+from src.services.rate_limiter import RateLimiter
+from src.services.resilience import CircuitBreaker, ResilientCaller
+from src.services.result_merger import ResultMerger
 from src.services.response_validator import ResponseValidator
+from src.services.stream_parser import MalformedStreamError, StreamingResponseParser
+from src.services.usage_tracker import UsageTracker
+from src.models.tender_fields import TENDER_FIELDS
 from src.models.tender_response import TenderResponse
+from src.utils.token_counter import TokenCounter
 
 logger = logging.getLogger(__name__)
 
+# 応答の最大トークン数の見積もりに使う、1項目あたりの内容の上限
+FIELD_OUTPUT_TOKENS = 150
+FREE_TEXT_OUTPUT_TOKENS = 600
+# 応答が max_tokens で打ち切られた finish_reason
+TRUNCATED_FINISH_REASON = "length"
+
 class OpenAIService:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, response_cache: Optional[ResponseCache] = None):
         if not api_key:
             raise ValueError("OpenAI APIキーが設定されていません")
-        self.client = OpenAI(api_key=api_key)
-        self.model = os.getenv('GPT_MODEL', 'gpt-4')
+        # base_url は OPENAI_BASE_URL 環境変数から読まれる（ローカルの疑似サーバーでの検証用）
+        # 再試行は ResilientCaller で一元管理するため、クライアント側の再試行は無効にする
+        self.client = OpenAI(api_key=api_key, max_retries=0)
+        self.async_client = AsyncOpenAI(api_key=api_key, max_retries=0)
+        # 大量に発生するチャンクの抽出は高速・安価なモデル、統合と抽出失敗時の再分析は上位モデルで行う
+        strong_model = os.getenv('GPT_MODEL', 'gpt-4')
+        self.stage_models = {
+            "extraction": os.getenv('EXTRACTION_MODEL', 'gpt-4o-mini'),
+            "escalation": os.getenv('ESCALATION_MODEL', strong_model),
+            "consolidation": os.getenv('CONSOLIDATION_MODEL', strong_model)
+        }
+        # チャンクの大きさは、チャンクを送る可能性のあるモデルのうちコンテキスト長が短い方に合わせる
+        self.model = min(
+            (self.stage_models["extraction"], self.stage_models["escalation"]), key=get_context_window
+        )
+        self.request_timeout = float(os.getenv('OPENAI_REQUEST_TIMEOUT', '120'))
+        # 再分析は抽出で上限に達した応答も受けるため、抽出の上限にこの倍率を掛けた上限で行う
+        self.escalation_token_multiplier = float(os.getenv('ESCALATION_MAX_TOKENS_MULTIPLIER', '2'))
+        # 非同期のリクエストは応答をストリーミングで受け取り、確定した項目から順に利用する
+        self.streaming = os.getenv('OPENAI_STREAMING', 'false').lower() == 'true'
+        self.max_concurrency = int(os.getenv('OPENAI_MAX_CONCURRENCY', '4'))
+        self.consolidation_fan_in = max(2, int(os.getenv('CONSOLIDATION_FAN_IN', '8')))
+        self.rate_limiter = RateLimiter(
+            requests_per_minute=float(os.getenv('OPENAI_RPM_LIMIT', '500')),
+            tokens_per_minute=float(os.getenv('OPENAI_TPM_LIMIT', '30000'))
+        )
+        self.resilience = ResilientCaller(
+            max_retries=int(os.getenv('OPENAI_MAX_RETRIES', '5')),
+            base_delay=float(os.getenv('OPENAI_RETRY_BASE_DELAY', '1')),
+            max_delay=float(os.getenv('OPENAI_RETRY_MAX_DELAY', '60')),
+            circuit_breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv('OPENAI_CIRCUIT_FAILURE_THRESHOLD', '5')),
+                cooldown_seconds=float(os.getenv('OPENAI_CIRCUIT_COOLDOWN', '30'))
+            )
+        )
+        self.response_cache = response_cache or ResponseCache()
+        self.response_cache.purge_stale_versions(PROMPT_TEMPLATE_VERSION)
+        self.token_counter = TokenCounter(self.model)
+        self.usage = UsageTracker()
+        self._schema_tokens = {}
         self.prompt_builder = PromptBuilder()
         self.validator = ResponseValidator()
+        self.merger = ResultMerger()
     
-    def analyze_chunk(self, text: str) -> Optional[TenderResponse]:
-        """テキストチャンクを分析"""
+    def analyze_chunk(self, text: str, field_names: Optional[List[str]] = None,
+                      stage: str = "extraction") -> Optional[TenderResponse]:
+        """
+        テキストチャンクを分析
+
+        Args:
+            text: チャンクのテキスト
+            field_names: 抽出する項目（省略時は全項目）
+            stage: 使用する段階のモデル（extraction で不完全な応答が返った場合は escalation で再分析する）
+        """
         if not text.strip():
             logger.warning("Empty text chunk received")
             return None
         
         try:
-            response = self._make_openai_request(
-                system_content=self.prompt_builder.build_system_prompt(),
-                user_content=f"以下の文書を分析してください:\n\n{text}"
-            )
-            
-            # レスポンスのログ出力
-            logger.info(f"OpenAI Response:\n{response}")
-            
-            # レスポンスの検証と変換
-            validated_response = self.validator.validate_and_clean(json.loads(response))
-            if validated_response:
-                logger.info(f"Validated response: {validated_response.to_dict()}")
-            return validated_response
+            # システムプロンプトは項目の組み合わせごとに固定で、ユーザーメッセージは文書のみ
+            # （共通の先頭部分にプロバイダー側のプロンプトキャッシュが効く）
+            system_content = self.prompt_builder.build_system_prompt(field_names)
+            user_content = text
+            response, finish_reason = self._make_openai_request(system_content, user_content, stage, field_names)
+            reason = self.should_escalate(stage, response, field_names, finish_reason)
+            if reason:
+                logger.warning(f"{self.stage_models['escalation']} で再分析します（理由: {reason}）")
+                response, _ = self._make_openai_request(system_content, user_content, "escalation", field_names)
+            return self.parse_chunk_response(response, field_names)
             
         except Exception as e:
             logger.error(f"Error analyzing chunk: {str(e)}")
             return None
 
+    async def analyze_chunk_async(self, text: str, field_names: Optional[List[str]] = None,
+                                  stage: str = "extraction",
+                                  on_field: Optional[Callable[[str, str], None]] = None) -> Optional[TenderResponse]:
+        """
+        テキストチャンクを非同期に分析
+
+        on_field を指定すると、ストリーミング時は応答の完了を待たずに、確定した項目ごとに
+        (項目名, 内容) で呼び出す（キャッシュから応答した場合は呼び出さない）。
+        """
+        if not text.strip():
+            logger.warning("Empty text chunk received")
+            return None
+
+        try:
+            system_content = self.prompt_builder.build_system_prompt(field_names)
+            user_content = text
+            response, finish_reason = await self._make_openai_request_async(
+                system_content, user_content, stage, field_names, on_field
+            )
+            reason = self.should_escalate(stage, response, field_names, finish_reason)
+            if reason:
+                logger.warning(f"{self.stage_models['escalation']} で再分析します（理由: {reason}）")
+                response, _ = await self._make_openai_request_async(
+                    system_content, user_content, "escalation", field_names, on_field
+                )
+            return self.parse_chunk_response(response, field_names)
+
+        except Exception as e:
+            logger.error(f"Error analyzing chunk: {str(e)}")
+            return None
+
+    def parse_chunk_response(self, response: str,
+                              field_names: Optional[List[str]] = None) -> Optional[TenderResponse]:
+        """チャンク分析のレスポンスを検証して変換"""
+        # レスポンスのログ出力
+        logger.info(f"OpenAI Response:\n{response}")
+
+        # レスポンスの検証と変換
+        validated_response = self.validator.validate_and_clean(json.loads(response), field_names)
+        if validated_response:
+            logger.info(f"Validated response: {validated_response.to_dict()}")
+        return validated_response
+
+    def build_chunk_request(self, text: str, field_names: Optional[List[str]] = None) -> dict:
+        """チャンク分析のリクエスト（バッチ処理用）"""
+        return self._build_request(
+            self.prompt_builder.build_system_prompt(field_names),
+            text,
+            "extraction",
+            field_names
+        )
+
+    def build_consolidation_request(self, group: List[TenderResponse], field_names: List[str]) -> dict:
+        """未解決の項目を統合するリクエスト（バッチ処理用）"""
+        return self._build_request(
+            self.prompt_builder.build_consolidation_system_prompt(field_names),
+            self._build_unresolved_prompt(group, field_names),
+            "consolidation",
+            field_names
+        )
+
     def consolidate_results(self, results: List[TenderResponse]) -> Optional[TenderResponse]:
-        """複数の分析結果を統合"""
+        """複数の分析結果を統合（CONSOLIDATION_FAN_IN 件ずつ段階的に統合する）"""
+        if not results:
+            logger.warning("No results to consolidate")
+            return None
+
+        level = 1
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            while True:
+                groups = self.split_groups(results)
+                logger.info(f"統合 第{level}段: {len(results)}件 → {len(groups)}件")
+                results = list(executor.map(
+                    lambda group: self._consolidate_group(group) if self.needs_request(group, groups) else group[0],
+                    groups
+                ))
+                if len(results) == 1:
+                    return results[0]
+                level += 1
+
+    async def consolidate_results_async(self, results: List[TenderResponse]) -> Optional[TenderResponse]:
+        """複数の分析結果を非同期に統合（同じ段のグループは並行して統合する）"""
         if not results:
             logger.warning("No results to consolidate")
             return None
 
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def consolidate(group: List[TenderResponse], groups: List[List[TenderResponse]]) -> TenderResponse:
+            if not self.needs_request(group, groups):
+                return group[0]
+            async with semaphore:
+                return await self._consolidate_group_async(group)
+
+        level = 1
+        while True:
+            groups = self.split_groups(results)
+            logger.info(f"統合 第{level}段: {len(results)}件 → {len(groups)}件")
+            results = await asyncio.gather(*(consolidate(group, groups) for group in groups))
+            if len(results) == 1:
+                return results[0]
+            level += 1
+
+    def split_groups(self, results: List[TenderResponse]) -> List[List[TenderResponse]]:
+        """結果を fan-in 件ずつのグループに分割"""
+        return [results[i:i + self.consolidation_fan_in] for i in range(0, len(results), self.consolidation_fan_in)]
+
+    @staticmethod
+    def needs_request(group: List[TenderResponse], groups: List[List[TenderResponse]]) -> bool:
+        """端数で1件だけになったグループはそのまま次の段に送る（最終段は常に統合する）"""
+        return len(group) > 1 or len(groups) == 1
+
+    def _consolidate_group(self, group: List[TenderResponse]) -> TenderResponse:
+        """1グループ分の結果を統合（ローカルで決まらない項目のみLLMに問い合わせる）"""
+        outcome = self.merger.merge(group)
+        self.merger.record(outcome.unresolved)
+        if not outcome.unresolved:
+            return outcome.response
+
         try:
-            results_dict = [result.to_dict() for result in results]
-            response = self._make_openai_request(
-                system_content="あなたは入札案件の分析結果を統合する専門家です。",
-                user_content=self.prompt_builder.build_consolidation_prompt(results_dict)
+            response, _ = self._make_openai_request(
+                system_content=self.prompt_builder.build_consolidation_system_prompt(outcome.unresolved),
+                user_content=self._build_unresolved_prompt(group, outcome.unresolved),
+                stage="consolidation",
+                field_names=outcome.unresolved
             )
             
             # レスポンスの検証と変換
-            return self.validator.validate_and_clean(json.loads(response))
+            resolved = self.validator.validate_and_clean(json.loads(response), outcome.unresolved)
+            return self.apply_resolved(outcome.response, resolved)
             
         except Exception as e:
             logger.error(f"Error consolidating results: {str(e)}")
-            return results[0] if results else None
+            logger.warning("統合に失敗したため、各項目で最も長い内容を採用します")
+            return outcome.response
+
+    async def _consolidate_group_async(self, group: List[TenderResponse]) -> TenderResponse:
+        """1グループ分の結果を非同期に統合（ローカルで決まらない項目のみLLMに問い合わせる）"""
+        outcome = self.merger.merge(group)
+        self.merger.record(outcome.unresolved)
+        if not outcome.unresolved:
+            return outcome.response
 
-    def _make_openai_request(self, system_content: str, user_content: str) -> str:
-        """OpenAI APIリクエストを実行"""
-        response = self.client.chat.completions.create(
-            model=self.model,
+        try:
+            response, _ = await self._make_openai_request_async(
+                system_content=self.prompt_builder.build_consolidation_system_prompt(outcome.unresolved),
+                user_content=self._build_unresolved_prompt(group, outcome.unresolved),
+                stage="consolidation",
+                field_names=outcome.unresolved
+            )
+            resolved = self.validator.validate_and_clean(json.loads(response), outcome.unresolved)
+            return self.apply_resolved(outcome.response, resolved)
+
+        except Exception as e:
+            logger.error(f"Error consolidating results: {str(e)}")
+            logger.warning("統合に失敗したため、各項目で最も長い内容を採用します")
+            return outcome.response
+
+    def _build_unresolved_prompt(self, group: List[TenderResponse], field_names: List[str]) -> str:
+        """未解決の項目だけを、値のある結果から重複を除いて並べた統合プロンプトを構築"""
+        candidates = []
+        seen = set()
+        for result in group:
+            items = {
+                name: result.項目[name].to_dict() for name in field_names
+                if name in result.項目 and result.項目[name].内容
+            }
+            key = json.dumps(items, ensure_ascii=False, sort_keys=True)
+            if items and key not in seen:
+                seen.add(key)
+                candidates.append({"項目": items})
+        return self.prompt_builder.build_consolidation_prompt(candidates)
+
+    @staticmethod
+    def apply_resolved(merged: TenderResponse, resolved: TenderResponse) -> TenderResponse:
+        """LLMが統合した項目で置き換える（空欄で返ってきた項目はローカルの値を残す）"""
+        for name, field in resolved.項目.items():
+            if field.内容:
+                merged.項目[name] = field
+        return merged
+
+    def report(self) -> dict:
+        """
+        APIリクエストの統計（レート制限・再試行による待ち時間）
+
+        usage の所要時間はモデルの応答時間のみで、これらの待ち時間は含まない。
+        """
+        return {**self.rate_limiter.report(), **self.resilience.report()}
+
+    def max_output_tokens(self, stage: str, field_names: Optional[List[str]] = None) -> int:
+        """
+        応答の最大トークン数
+
+        {STAGE}_MAX_TOKENS が設定されていればその値、なければ応答スキーマのトークン数に
+        項目ごとの内容の上限を足した値。escalation は、未設定の場合は抽出の上限の
+        ESCALATION_MAX_TOKENS_MULTIPLIER 倍（抽出で打ち切られた応答を同じ上限で再分析しないため）。
+        """
+        configured = os.getenv(f"{stage.upper()}_MAX_TOKENS")
+        if configured:
+            return int(configured)
+        if stage == "escalation":
+            return int(self.max_output_tokens("extraction", field_names) * self.escalation_token_multiplier)
+
+        names = tuple(field_names or TENDER_FIELDS.keys())
+        if names not in self._schema_tokens:
+            schema = self.prompt_builder.build_response_format(list(names))
+            self._schema_tokens[names] = self.token_counter.count(schema) + sum(
+                FREE_TEXT_OUTPUT_TOKENS if TENDER_FIELDS[name].free_text else FIELD_OUTPUT_TOKENS
+                for name in names
+            )
+        return self._schema_tokens[names]
+
+    def should_escalate(self, stage: str, response: str, field_names: Optional[List[str]] = None,
+                        finish_reason: Optional[str] = None) -> Optional[str]:
+        """
+        抽出段階の応答を escalation 段階で再分析すべきであれば理由を返す
+
+        escalation のモデルが抽出と同じ場合も、max_tokens で打ち切られた応答は
+        上限を広げて再分析する。
+        """
+        if stage != "extraction":
+            return None
+        reason = self.escalation_reason(response, field_names, finish_reason)
+        if not reason:
+            return None
+        if finish_reason == TRUNCATED_FINISH_REASON or self.stage_models["escalation"] != self.stage_models["extraction"]:
+            return reason
+        return None
+
+    @staticmethod
+    def escalation_reason(response: str, field_names: Optional[List[str]] = None,
+                          finish_reason: Optional[str] = None) -> Optional[str]:
+        """上位モデルで再分析すべき応答であれば理由を返す"""
+        if finish_reason == TRUNCATED_FINISH_REASON:
+            return "応答が max_tokens で打ち切られた"
+        try:
+            data = json.loads(response)
+        except ValueError:
+            return "応答がJSONとして解釈できない"
+        items = data.get("項目") if isinstance(data, dict) else None
+        if not isinstance(items, dict):
+            return "応答に「項目」がない"
+        missing = [name for name in field_names or TENDER_FIELDS.keys() if name not in items]
+        if missing:
+            return f"応答に項目（{', '.join(missing)}）がない"
+        return None
+
+    def _make_openai_request(self, system_content: str, user_content: str, stage: str,
+                             field_names: Optional[List[str]] = None) -> Tuple[str, Optional[str]]:
+        """
+        OpenAI APIリクエストを段階（stage）ごとのモデルで実行（一時的なエラーは再試行）
+
+        Returns:
+            (応答本文, finish_reason)。キャッシュから応答した場合の finish_reason は None
+        """
+        request = self._build_request(system_content, user_content, stage, field_names)
+        cached = self.get_cached_response(request)
+        if cached is not None:
+            self.usage.record_cached(stage)
+            return cached, None
+        tokens = self._estimate_request_tokens(system_content, user_content, request["max_tokens"])
+
+        def send():
+            self.rate_limiter.acquire(tokens)
+            # 所要時間はモデルの応答時間のみ（レート制限の待ち時間は rate_limiter.report() に集計される）
+            started = time.monotonic()
+            response = self.client.chat.completions.create(**request)
+            return response, time.monotonic() - started
+
+        response, latency = self.resilience.call(send)
+        self.usage.record(stage, request["model"], latency, getattr(response, 'usage', None))
+        choice = response.choices[0]
+        content = choice.message.content.strip()
+        self.store_response(request, content)
+        return content, getattr(choice, 'finish_reason', None)
+
+    async def _make_openai_request_async(self, system_content: str, user_content: str, stage: str,
+                                         field_names: Optional[List[str]] = None,
+                                         on_field: Optional[Callable[[str, str], None]] = None) -> Tuple[str, Optional[str]]:
+        """
+        OpenAI APIリクエストを段階（stage）ごとのモデルで非同期に実行（一時的なエラーは再試行）
+
+        Returns:
+            (応答本文, finish_reason)。キャッシュから応答した場合の finish_reason は None
+        """
+        request = self._build_request(system_content, user_content, stage, field_names)
+        cached = self.get_cached_response(request)
+        if cached is not None:
+            self.usage.record_cached(stage)
+            return cached, None
+        tokens = self._estimate_request_tokens(system_content, user_content, request["max_tokens"])
+
+        async def send():
+            await self.rate_limiter.acquire_async(tokens)
+            # 所要時間はモデルの応答時間のみ（レート制限の待ち時間は rate_limiter.report() に集計される）
+            started = time.monotonic()
+            if self.streaming:
+                content, usage, finish_reason = await self._stream_completion(
+                    request, stage, field_names, on_field, tokens - request["max_tokens"]
+                )
+            else:
+                response = await self.async_client.chat.completions.create(**request)
+                choice = response.choices[0]
+                content, usage = choice.message.content.strip(), getattr(response, 'usage', None)
+                finish_reason = getattr(choice, 'finish_reason', None)
+            return content, usage, finish_reason, time.monotonic() - started
+
+        content, usage, finish_reason, latency = await self.resilience.call_async(send)
+        self.usage.record(stage, request["model"], latency, usage)
+        self.store_response(request, content)
+        return content, finish_reason
+
+    async def _stream_completion(self, request: dict, stage: str, field_names: Optional[List[str]],
+                                 on_field: Optional[Callable[[str, str], None]], prompt_tokens: int):
+        """
+        応答をストリーミングで受信し、確定した項目から on_field に渡す
+
+        応答の形が崩れた時点で受信を打ち切り、それまでの本文を返す
+        （escalation_reason で不完全と判定され、上位モデルでの再分析に回る）。
+        呼び出し元がタスクを取り消した場合も接続を閉じ、受信済みの分を使用量として記録する。
+
+        Returns:
+            (応答本文, usage, finish_reason)
+        """
+        parser = StreamingResponseParser(field_names)
+        usage = None
+        finish_reason = None
+        started = time.monotonic()
+        stream = await self.async_client.chat.completions.create(
+            **request, stream=True, stream_options={"include_usage": True}
+        )
+        try:
+            async for event in stream:
+                if getattr(event, 'usage', None):
+                    usage = event.usage
+                if event.choices and getattr(event.choices[0], 'finish_reason', None):
+                    finish_reason = event.choices[0].finish_reason
+                delta = event.choices[0].delta.content if event.choices else None
+                if not delta:
+                    continue
+                for name, content in parser.feed(delta):
+                    if on_field:
+                        on_field(name, content)
+        except MalformedStreamError as e:
+            await stream.close()
+            logger.warning(f"応答の受信を打ち切りました（{len(parser.text)}文字受信、理由: {e}）")
+            # 打ち切った応答には usage が付かないため、受信済みの本文から見積もる
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": self.token_counter.count(parser.text)}
+        except asyncio.CancelledError:
+            await stream.close()
+            self.usage.record(stage, request["model"], time.monotonic() - started, {
+                "prompt_tokens": prompt_tokens, "completion_tokens": self.token_counter.count(parser.text)
+            })
+            raise
+        return parser.text.strip(), usage, finish_reason
+
+    def get_cached_response(self, request: dict) -> Optional[str]:
+        return self.response_cache.get_response(self.request_body(request), PROMPT_TEMPLATE_VERSION)
+
+    def store_response(self, request: dict, content: str) -> None:
+        """JSONとして解釈できる応答のみ保存（壊れた応答を再利用しない）"""
+        try:
+            json.loads(content)
+        except ValueError:
+            return
+        self.response_cache.put_response(self.request_body(request), PROMPT_TEMPLATE_VERSION, content)
+
+    @staticmethod
+    def request_body(request: dict) -> dict:
+        """
+        APIに送る本文（timeout などクライアント側の設定を除く）
+
+        LLM応答キャッシュのキーとバッチのリクエストに使う。
+        """
+        return {key: value for key, value in request.items() if key != 'timeout'}
+
+    def _build_request(self, system_content: str, user_content: str, stage: str,
+                       field_names: Optional[List[str]] = None) -> dict:
+        return dict(
+            model=self.stage_models[stage],
             messages=[
                 {"role": "system", "content": system_content},
                 {"role": "user", "content": user_content}
             ],
             temperature=0.1,
-            max_tokens=2000,
-            response_format={"type": "json_object"}
+            max_tokens=self.max_output_tokens(stage, field_names),
+            response_format={"type": "json_object"},
+            timeout=self.request_timeout
         )
-        return response.choices[0].message.content.strip()
\ No newline at end of file
+
+    def _estimate_request_tokens(self, system_content: str, user_content: str, max_tokens: int) -> int:
+        """TPM制限の消費量（入力トークン + max_tokens）を見積もる"""
+        return self.token_counter.count(system_content) + self.token_counter.count(user_content) + max_tokens
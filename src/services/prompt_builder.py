@@ -1,47 +1,81 @@
 """OpenAI prompt builder for tender analysis"""
 import json
-from typing import Dict, Any, List
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
 from src.models.tender_fields import TENDER_FIELDS
-from src.services.prompt_templates import SYSTEM_PROMPT_TEMPLATE, CONSOLIDATION_PROMPT_TEMPLATE
+from src.services.prompt_templates import (
+    SYSTEM_PROMPT_TEMPLATE, CONSOLIDATION_SYSTEM_PROMPT_TEMPLATE, CONSOLIDATION_PROMPT_TEMPLATE
+)
 
 class PromptBuilder:
+    """
+    プロンプトの構築
+
+    システムプロンプトと応答フォーマットは項目の組み合わせごとにプロセス内で一度だけ生成し、
+    以降は同じ文字列を返す（項目は TENDER_FIELDS の順に並べ直すため、指定順が違っても同一になる）。
+    """
     def __init__(self):
-        self.response_format = self._create_response_format()
+        self.response_format = self.build_response_format()
     
-    def build_system_prompt(self) -> str:
-        """システムプロンプトを構築"""
-        field_instructions = self._build_field_instructions()
-        return SYSTEM_PROMPT_TEMPLATE.format(
-            field_instructions=field_instructions,
-            response_format=self.response_format
-        )
+    def build_system_prompt(self, field_names: Optional[List[str]] = None) -> str:
+        """システムプロンプトを構築（field_names を指定した場合はその項目のみ抽出させる）"""
+        return _compile_system_prompt(self._field_key(field_names))
+
+    def build_consolidation_system_prompt(self, field_names: Optional[List[str]] = None) -> str:
+        """結果統合用のシステムプロンプトを構築（field_names を指定した場合はその項目のみ統合させる）"""
+        return _compile_consolidation_system_prompt(self._field_key(field_names))
 
     def build_consolidation_prompt(self, results: List[Dict[str, Any]]) -> str:
-        """結果統合用のプロンプトを構築"""
-        results_json = json.dumps(results, ensure_ascii=False, indent=2)
-        return CONSOLIDATION_PROMPT_TEMPLATE.format(
-            results=results_json,
-            response_format=self.response_format
-        )
+        """
+        結果統合用のユーザーメッセージを構築
+
+        Args:
+            results: 統合する分析結果
+        """
+        # 件数に比例してプロンプトが伸びるため、インデントなしの最小表現にする
+        results_json = json.dumps(results, ensure_ascii=False, separators=(',', ':'))
+        return CONSOLIDATION_PROMPT_TEMPLATE.format(results=results_json)
+
+    def build_response_format(self, field_names: Optional[List[str]] = None) -> str:
+        """応答フォーマット（field_names を指定した場合はその項目のみ）"""
+        return _compile_response_format(self._field_key(field_names))
 
-    def _build_field_instructions(self) -> str:
-        """フィールドごとの抽出指示を構築"""
-        instructions = []
-        for field in TENDER_FIELDS.values():
-            instruction = (
-                f"【{field.name}】\n"
-                f"- 探すキーワード: {', '.join(field.keywords)}\n"
-                f"- 抽出ルール: {field.extraction_rules}\n"
-            )
-            instructions.append(instruction)
-        return ''.join(instructions)
-
-    def _create_response_format(self) -> str:
-        """応答フォーマットのテンプレートを作成"""
-        template = {
-            "項目": {
-                f.name: {"見出し": f.name, "内容": ""} 
-                for f in TENDER_FIELDS.values()
-            }
+    @staticmethod
+    def _field_key(field_names: Optional[List[str]] = None) -> Tuple[str, ...]:
+        """項目の組み合わせを TENDER_FIELDS の順に並べたキー（省略時は全項目）"""
+        return tuple(name for name in TENDER_FIELDS if not field_names or name in field_names)
+
+@lru_cache(maxsize=None)
+def _compile_system_prompt(field_names: Tuple[str, ...]) -> str:
+    return SYSTEM_PROMPT_TEMPLATE.format(
+        field_instructions=_build_field_instructions(field_names),
+        response_format=_compile_response_format(field_names)
+    )
+
+@lru_cache(maxsize=None)
+def _compile_consolidation_system_prompt(field_names: Tuple[str, ...]) -> str:
+    return CONSOLIDATION_SYSTEM_PROMPT_TEMPLATE.format(response_format=_compile_response_format(field_names))
+
+@lru_cache(maxsize=None)
+def _compile_response_format(field_names: Tuple[str, ...]) -> str:
+    """応答フォーマットのテンプレートを作成"""
+    template = {
+        "項目": {
+            name: {"見出し": name, "内容": ""}
+            for name in field_names
         }
-        return json.dumps(template, ensure_ascii=False, indent=2)
\ No newline at end of file
+    }
+    return json.dumps(template, ensure_ascii=False, indent=2)
+
+def _build_field_instructions(field_names: Tuple[str, ...]) -> str:
+    """フィールドごとの抽出指示を構築"""
+    instructions = []
+    for name in field_names:
+        field = TENDER_FIELDS[name]
+        instruction = (
+            f"【{field.name}】\n"
+            f"- 探すキーワード: {', '.join(field.keywords)}\n"
+            f"- 抽出ルール: {field.extraction_rules}\n"
+        )
+        instructions.append(instruction)
+    return ''.join(instructions)
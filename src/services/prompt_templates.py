@@ -1,10 +1,14 @@
 """Templates for OpenAI prompts"""
 
-SYSTEM_PROMPT_TEMPLATE = """あなたは入札案件文書の分析を専門とする政府調達のエキスパートです。
-与えられた文書から必要な情報を抽出し、JSONとして構造化されたデータを提供してください。
+# テンプレートやフィールド定義を変更したら上げる（LLM応答キャッシュのキーに含まれる）
+PROMPT_TEMPLATE_VERSION = "2"
 
-各フィールドの抽出ルール:
-{field_instructions}
+# プロバイダー側のプロンプトキャッシュは先頭から一致する部分に効くため、
+# どのリクエストでも同じ指示を先頭に、項目によって変わる部分をその後に置き、
+# 文書や分析結果などリクエストごとに変わる内容はユーザーメッセージ（末尾）に限る。
+
+SYSTEM_PROMPT_TEMPLATE = """あなたは入札案件文書の分析を専門とする政府調達のエキスパートです。
+ユーザーメッセージとして与えられた文書から必要な情報を抽出し、JSONとして構造化されたデータを提供してください。
 
 重要な指示:
 1. 情報が直接的に記載されていない場合でも、文脈や関連する記述から推論してください
@@ -14,10 +18,13 @@ SYSTEM_PROMPT_TEMPLATE = """あなたは入札案件文書の分析を専門と
 5. 抽出した情報は必ず文書の記載内容に基づいてください
 6. 応答は必ず有効なJSONオブジェクトとして返してください
 
+各フィールドの抽出ルール:
+{field_instructions}
 応答形式:
 {response_format}"""
 
-CONSOLIDATION_PROMPT_TEMPLATE = """複数の分析結果から、最も適切な情報を選択・統合し、有効なJSONとして返してください。
+CONSOLIDATION_SYSTEM_PROMPT_TEMPLATE = """あなたは入札案件の分析結果を統合する専門家です。
+ユーザーメッセージとして与えられた複数の分析結果から、最も適切な情報を選択・統合し、有効なJSONとして返してください。
 
 統合のルール:
 1. 各フィールドで最も詳細な情報を優先して選択
@@ -26,8 +33,8 @@ CONSOLIDATION_PROMPT_TEMPLATE = """複数の分析結果から、最も適切な
 4. 日付や金額は必ず正確性を確認
 5. 要件概要は重要なポイントを漏らさず200文字程度に要約
 
-分析結果:
-{results}
-
 応答形式:
-{response_format}"""
\ No newline at end of file
+{response_format}"""
+
+CONSOLIDATION_PROMPT_TEMPLATE = """分析結果:
+{results}"""
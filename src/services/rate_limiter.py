@@ -0,0 +1,70 @@
+"""Token-bucket rate limiting for API requests"""
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate_per_minute: 1分あたりに補充される量
+            capacity: バケットの容量（省略時は1分ぶん）
+        """
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self._available = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """
+        amount を予約し、実行まで待つべき秒数を返す
+
+        残量が足りない場合は残量を負にして予約だけ済ませるため、待機中の呼び出し元の
+        順序が保たれ、後から来た呼び出しが先に通ることはない。
+        """
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._available = min(self.capacity, self._available + (now - self._updated_at) * self.rate_per_second)
+            self._updated_at = now
+            self._available -= amount
+            if self._available >= 0:
+                return 0.0
+            return -self._available / self.rate_per_second
+
+class RateLimiter:
+    """リクエスト数/分（RPM）とトークン数/分（TPM）の両方を制限する"""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.waited_seconds = 0.0
+
+    def _reserve(self, tokens: int) -> float:
+        wait = max(self.request_bucket.reserve(1), self.token_bucket.reserve(tokens))
+        with self._lock:
+            self.requests += 1
+            self.waited_seconds += wait
+        return wait
+
+    def acquire(self, tokens: int) -> None:
+        """枠が空くまでブロックして待つ"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int) -> None:
+        """枠が空くまでイベントループをブロックせずに待つ"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def report(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "rate_limit_wait_seconds": round(self.waited_seconds, 2)
+        }
@@ -0,0 +1,169 @@
+"""Retry, backoff and circuit breaking for OpenAI API requests"""
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+import openai
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+def is_retryable(error: Exception) -> bool:
+    """一時的なエラー（レート制限・タイムアウト・接続断・5xx）かどうか"""
+    if isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        status = getattr(error, 'status_code', None) or 0
+        return status in RETRYABLE_STATUS_CODES or status >= 500
+    return False
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """レスポンスの retry-after-ms / retry-after ヘッダーから待機秒数を取得"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+
+    try:
+        retry_after_ms = headers.get('retry-after-ms')
+        if retry_after_ms:
+            return float(retry_after_ms) / 1000
+
+        retry_after = headers.get('retry-after')
+        if not retry_after:
+            return None
+        try:
+            return float(retry_after)
+        except ValueError:
+            retry_at = email.utils.parsedate_to_datetime(retry_after)
+            return max(0.0, retry_at.timestamp() - time.time())
+    except Exception:
+        return None
+
+class CircuitBreaker:
+    """
+    連続失敗が閾値を超えたら一定時間すべてのリクエストを止める
+
+    レート制限の Retry-After もここに反映し、全ワーカーが同じ時刻まで待つ。
+    """
+    def __init__(self, failure_threshold: int, cooldown_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.consecutive_failures = 0
+        self.opened = 0
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def remaining_pause(self) -> float:
+        with self._lock:
+            return max(0.0, self._paused_until - time.monotonic())
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.consecutive_failures < self.failure_threshold:
+                return
+            self.consecutive_failures = 0
+            self.opened += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + self.cooldown_seconds)
+        logger.warning(f"OpenAI APIの失敗が続いたため、{self.cooldown_seconds}秒間リクエストを停止します")
+
+class ResilientCaller:
+    def __init__(self, max_retries: int, base_delay: float, max_delay: float,
+                 circuit_breaker: CircuitBreaker):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.circuit_breaker = circuit_breaker
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.failures = 0
+        self.retry_wait_seconds = 0.0
+        self.circuit_wait_seconds = 0.0
+
+    def call(self, func: Callable[[], T]) -> T:
+        """func を実行し、一時的なエラーであればバックオフしながら再試行"""
+        attempt = 0
+        while True:
+            pause = self.circuit_breaker.remaining_pause()
+            if pause > 0:
+                self._add_wait(circuit=pause)
+                time.sleep(pause)
+            try:
+                result = func()
+                self.circuit_breaker.record_success()
+                return result
+            except Exception as e:
+                delay = self._on_error(e, attempt)
+                time.sleep(delay)
+                attempt += 1
+
+    async def call_async(self, func: Callable[[], Awaitable[T]]) -> T:
+        """call の非同期版（func はコルーチンを返す関数）"""
+        attempt = 0
+        while True:
+            pause = self.circuit_breaker.remaining_pause()
+            if pause > 0:
+                self._add_wait(circuit=pause)
+                await asyncio.sleep(pause)
+            try:
+                result = await func()
+                self.circuit_breaker.record_success()
+                return result
+            except Exception as e:
+                delay = self._on_error(e, attempt)
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    def _on_error(self, error: Exception, attempt: int) -> float:
+        """再試行までの待機秒数を返す（再試行しない場合は例外を送出）"""
+        if not is_retryable(error):
+            raise error
+
+        self.circuit_breaker.record_failure()
+        if attempt >= self.max_retries:
+            with self._lock:
+                self.failures += 1
+            logger.error(f"OpenAI APIリクエストが{attempt + 1}回失敗したため中止します: {str(error)}")
+            raise error
+
+        # Full jitter: 0〜指数バックオフ上限の一様乱数。Retry-After があればそれ以上待つ
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+            self.circuit_breaker.pause(retry_after)
+
+        self._add_wait(retry=delay)
+        logger.warning(f"OpenAI APIエラーのため{delay:.1f}秒後に再試行します（{attempt + 1}/{self.max_retries}）: {str(error)}")
+        return delay
+
+    def _add_wait(self, retry: float = 0.0, circuit: float = 0.0) -> None:
+        with self._lock:
+            if retry:
+                self.retries += 1
+                self.retry_wait_seconds += retry
+            self.circuit_wait_seconds += circuit
+
+    def report(self) -> Dict[str, float]:
+        return {
+            "retries": self.retries,
+            "failed_requests": self.failures,
+            "retry_wait_seconds": round(self.retry_wait_seconds, 2),
+            "circuit_wait_seconds": round(self.circuit_wait_seconds, 2),
+            "circuit_opened": self.circuit_breaker.opened
+        }
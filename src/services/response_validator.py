@@ -1,6 +1,6 @@
 """Validator for OpenAI API responses"""
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from src.models.tender_fields import TENDER_FIELDS
 from src.models.tender_response import TenderResponse, TenderFieldContent
 
@@ -8,27 +8,28 @@ logger = logging.getLogger(__name__)
 
 class ResponseValidator:
     @staticmethod
-    def validate_and_clean(response: Any) -> Optional[TenderResponse]:
-        """Validate and clean the OpenAI response"""
+    def validate_and_clean(response: Any, field_names: Optional[List[str]] = None) -> Optional[TenderResponse]:
+        """Validate and clean the OpenAI response (only field_names if given)"""
+        field_names = list(field_names or TENDER_FIELDS.keys())
         try:
             # Handle None response
             if response is None:
                 logger.error("Received None response")
-                return TenderResponse.create_empty(TENDER_FIELDS.keys())
+                return TenderResponse.create_empty(field_names)
 
             # Basic structure validation
             if not isinstance(response, dict):
                 logger.error(f"Response is not a dictionary: {type(response)}")
-                return TenderResponse.create_empty(TENDER_FIELDS.keys())
+                return TenderResponse.create_empty(field_names)
 
             items = response.get("項目")
             if not isinstance(items, dict):
                 logger.error(f"Invalid or missing '項目' in response: {response}")
-                return TenderResponse.create_empty(TENDER_FIELDS.keys())
+                return TenderResponse.create_empty(field_names)
 
             # Process each field
             cleaned_items = {}
-            for field_name in TENDER_FIELDS.keys():
+            for field_name in field_names:
                 field_data = items.get(field_name, {})
                 
                 # Handle various field data formats
@@ -52,4 +53,4 @@ class ResponseValidator:
         except Exception as e:
             logger.error(f"Error validating response: {str(e)}")
             logger.error(f"Original response: {response}")
-            return TenderResponse.create_empty(TENDER_FIELDS.keys())
\ No newline at end of file
+            return TenderResponse.create_empty(field_names)
\ No newline at end of file
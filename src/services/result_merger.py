@@ -0,0 +1,120 @@
+"""Local, deterministic consolidation of per-chunk analysis results"""
+import re
+import threading
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from src.models.tender_fields import TENDER_FIELDS
+from src.models.tender_response import TenderResponse, TenderFieldContent
+
+# 「情報なし」を意味する値は空欄として扱う
+EMPTY_VALUES = {"", "不明", "記載なし", "該当なし", "情報なし", "未記載", "-", "ー", "n/a", "none", "null"}
+_WHITESPACE = re.compile(r'\s+')
+_TRAILING_PUNCTUATION = re.compile(r'[。．.、,]+$')
+
+def normalize_value(value: str) -> str:
+    """比較用に値を正規化（全角半角・空白・末尾の句読点・大文字小文字の違いを無視）"""
+    value = unicodedata.normalize('NFKC', value)
+    value = _WHITESPACE.sub('', value)
+    value = _TRAILING_PUNCTUATION.sub('', value)
+    value = value.lower()
+    return "" if value in EMPTY_VALUES else value
+
+def group_values(values: List[str]) -> Dict[str, List[str]]:
+    """正規化後の値ごとにまとめる（空欄扱いの値は除く）"""
+    groups: Dict[str, List[str]] = {}
+    for value in values:
+        key = normalize_value(value)
+        if key:
+            groups.setdefault(key, []).append(value)
+    return groups
+
+def agreed_value(groups: Dict[str, List[str]]) -> Optional[str]:
+    """
+    全ての値が一致する場合の値（表記ゆれのうち最長のもの）
+
+    短い値が全て最長の値の一部であれば、最長の値が最も詳しいとみなして一致として扱う。
+    """
+    if not groups:
+        return None
+    longest_key = max(groups, key=len)
+    if all(key in longest_key for key in groups):
+        return max(groups[longest_key], key=len)
+    return None
+
+@dataclass
+class MergeOutcome:
+    response: TenderResponse
+    # ローカルで決められず、LLMでの統合が必要な項目
+    unresolved: List[str]
+
+@dataclass
+class MergeStats:
+    local: Counter = field(default_factory=Counter)
+    llm: Counter = field(default_factory=Counter)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, local: List[str], llm: List[str]) -> None:
+        with self._lock:
+            self.local.update(local)
+            self.llm.update(llm)
+
+    def to_dict(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {
+                name: {"local": self.local[name], "llm": self.llm[name]}
+                for name in TENDER_FIELDS
+            }
+
+class ResultMerger:
+    """
+    チャンクごとの分析結果を項目単位でローカルに統合する
+
+    - 空欄（「不明」等を含む）は無視する
+    - 正規化後の値が1種類、または全ての値が最長の値に含まれる場合は最長の値を採用
+    - 過半数の結果が同じ値であればその値を採用（表記ゆれのうち最長のもの）
+    - 上記で決まらない項目と、自由記述の項目で値が複数あるものは unresolved としてLLMに回す
+    """
+    def __init__(self):
+        self.stats = MergeStats()
+
+    def merge(self, results: List[TenderResponse]) -> MergeOutcome:
+        merged = {}
+        unresolved = []
+        for name in TENDER_FIELDS:
+            values = [
+                result.項目[name].内容 for result in results
+                if name in result.項目 and normalize_value(result.項目[name].内容)
+            ]
+            content = self._merge_values(values, TENDER_FIELDS[name].free_text)
+            if content is None:
+                unresolved.append(name)
+                content = self.longest(values)
+            merged[name] = TenderFieldContent(見出し=name, 内容=content)
+        return MergeOutcome(response=TenderResponse(項目=merged), unresolved=unresolved)
+
+    def record(self, unresolved: List[str]) -> None:
+        """LLMに回した項目とローカルで決まった項目を集計"""
+        self.stats.record([name for name in TENDER_FIELDS if name not in unresolved], unresolved)
+
+    @staticmethod
+    def longest(values: List[str]) -> str:
+        return max(values, key=len, default="")
+
+    def _merge_values(self, values: List[str], free_text: bool):
+        """ローカルで決まった値を返す（決まらない場合は None）"""
+        groups = group_values(values)
+        if len(groups) <= 1:
+            return self.longest(values)
+        if free_text:
+            return None
+
+        agreed = agreed_value(groups)
+        if agreed is not None:
+            return agreed
+
+        ranked = sorted(groups.values(), key=len, reverse=True)
+        if len(ranked[0]) * 2 > len(values):
+            return self.longest(ranked[0])
+        return None
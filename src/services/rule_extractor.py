@@ -0,0 +1,87 @@
+"""Rule-based extraction of structured fields before any LLM call"""
+import logging
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from src.models.tender_fields import TENDER_FIELDS
+from src.models.text_record import TextRecord
+from src.services.result_merger import agreed_value, group_values
+
+logger = logging.getLogger(__name__)
+
+# 1項目あたりに保持する一致の上限（定型文が大量に一致してもメモリを使い切らないように）
+MAX_MATCHES_PER_FIELD = 200
+
+class RuleExtractor:
+    """
+    TENDER_FIELDS の patterns による正規表現・辞書ベースの抽出
+
+    レコードのストリームを1回だけ走査し、一致した値がすべて同じ（表記ゆれと、
+    より詳しい値に含まれる短い値を除く）で、かつ min_matches 箇所以上で一致した項目だけを
+    確度の高い値として扱う。一致が min_matches 箇所に満たない値は候補（hint_values）に留め、
+    値が食い違う項目と合わせてLLMに任せる。
+    """
+    def __init__(self, enabled: Optional[bool] = None, min_matches: Optional[int] = None):
+        if enabled is None:
+            enabled = os.getenv('RULE_EXTRACTION_ENABLED', 'true').lower() == 'true'
+        self.enabled = enabled
+        self.min_matches = min_matches or int(os.getenv('RULE_MIN_MATCHES', '2'))
+        self._rules: Dict[str, List[Tuple[re.Pattern, Optional[str]]]] = {
+            name: [(re.compile(pattern), value) for pattern, value in field.patterns]
+            for name, field in TENDER_FIELDS.items()
+            if field.patterns
+        }
+        self._matches: Dict[str, List[str]] = {name: [] for name in self._rules}
+
+    def scan(self, records: Iterable[TextRecord]) -> Iterator[TextRecord]:
+        """レコードをそのまま流しながら、各レコードに抽出ルールを適用"""
+        for record in records:
+            if self.enabled:
+                self.feed(record.text)
+            yield record
+
+    def feed(self, text: str) -> None:
+        for name, rules in self._rules.items():
+            matches = self._matches[name]
+            # 先に書かれたルールを優先し、同じ箇所に一致した後続のルールは無視する
+            # （「CMSの導入は不要」を「無」と「有」の両方に数えないため）。
+            # 値が空文字のルールは、判断できない記述に一致した箇所を後続のルールから除くだけで、値には数えない
+            claimed: List[Tuple[int, int]] = []
+            for pattern, value in rules:
+                for match in pattern.finditer(text):
+                    if any(start <= match.start() < end for start, end in claimed):
+                        continue
+                    claimed.append(match.span())
+                    if len(matches) < MAX_MATCHES_PER_FIELD:
+                        matches.append(value if value is not None else match.group('value').strip())
+
+    def confident_values(self) -> Dict[str, str]:
+        """確度の高い値（min_matches 箇所以上で一致）が得られた項目とその値"""
+        return {name: value for name, (value, count) in self._agreed_values().items() if count >= self.min_matches}
+
+    def hint_values(self) -> Dict[str, str]:
+        """一致した値は揃っているが、一致が min_matches 箇所に満たない項目とその値"""
+        return {name: value for name, (value, count) in self._agreed_values().items() if count < self.min_matches}
+
+    def _agreed_values(self) -> Dict[str, Tuple[str, int]]:
+        """一致した値がすべて同じ項目の (値, 一致した箇所の数)"""
+        values = {}
+        for name, matches in self._matches.items():
+            groups = group_values(matches)
+            value = agreed_value(groups)
+            if value is not None:
+                values[name] = (value, sum(len(group) for group in groups.values()))
+        return values
+
+    def report(self) -> Dict[str, Dict[str, object]]:
+        confident = self.confident_values()
+        hints = self.hint_values()
+        return {
+            name: {
+                "matches": len(matches),
+                "distinct": len(group_values(matches)),
+                "value": confident.get(name),
+                "hint": hints.get(name)
+            }
+            for name, matches in self._matches.items()
+        }
@@ -4,35 +4,95 @@ from typing import List
 
 logger = logging.getLogger(__name__)
 
+HEADER_ROW = ['見出し', '内容']
+
 class ContentUpdater:
-    def __init__(self, service):
-        self.service = service
-
-    def update_content(self, spreadsheet_id: str, sheet_name: str, values: List[List[str]]) -> None:
-        """Update sheet content with new values"""
-        try:
-            if not values:
-                logger.warning("No values to update")
-                return
-
-            # Ensure all values are strings
-            sanitized_values = [
-                [str(cell).strip() for cell in row]
-                for row in values
+    def build_content_requests(self, sheet_id: int, values: List[List[str]], is_new_sheet: bool) -> List[dict]:
+        """
+        Build the request that writes the header row and the values
+
+        An existing sheet is overwritten with updateCells over an open-ended range,
+        which also clears whatever was left below the new rows. A new sheet is empty,
+        so the rows are simply appended.
+        """
+        rows = [self.to_row_data(row) for row in self.to_rows(values)]
+        if is_new_sheet:
+            return [{
+                'appendCells': {
+                    'sheetId': sheet_id,
+                    'rows': rows,
+                    'fields': 'userEnteredValue'
+                }
+            }]
+        return [{
+            'updateCells': {
+                'range': {
+                    'sheetId': sheet_id,
+                    'startRowIndex': 0
+                },
+                'rows': rows,
+                'fields': 'userEnteredValue'
+            }
+        }]
+
+    @staticmethod
+    def to_row_data(row: List[str]) -> dict:
+        """Convert a row of values to RowData (stored as entered, like valueInputOption RAW)"""
+        return {
+            'values': [
+                {'userEnteredValue': {'stringValue': str(cell).strip()}}
+                for cell in row
             ]
+        }
+
+    def build_diff_requests(self, sheet_id: int, previous_rows: List[List[str]], rows: List[List[str]]) -> List[dict]:
+        """
+        Build requests that turn previous_rows (as last written) into rows
+
+        Every run of changed cells in a row becomes one updateCells, and rows left
+        over from the previous write are cleared. Returns no requests when nothing changed.
+        """
+        requests = []
+        for row_index, row in enumerate(rows):
+            previous = previous_rows[row_index] if row_index < len(previous_rows) else []
+            width = max(len(row), len(previous))
+            new_cells = row + [''] * (width - len(row))
+            old_cells = previous + [''] * (width - len(previous))
+            column = 0
+            while column < width:
+                if new_cells[column] == old_cells[column]:
+                    column += 1
+                    continue
+                start = column
+                while column < width and new_cells[column] != old_cells[column]:
+                    column += 1
+                requests.append({
+                    'updateCells': {
+                        'range': {
+                            'sheetId': sheet_id,
+                            'startRowIndex': row_index,
+                            'endRowIndex': row_index + 1,
+                            'startColumnIndex': start,
+                            'endColumnIndex': column
+                        },
+                        'rows': [self.to_row_data(new_cells[start:column])],
+                        'fields': 'userEnteredValue'
+                    }
+                })
+        if len(previous_rows) > len(rows):
+            requests.append({
+                'updateCells': {
+                    'range': {
+                        'sheetId': sheet_id,
+                        'startRowIndex': len(rows),
+                        'endRowIndex': len(previous_rows)
+                    },
+                    'fields': 'userEnteredValue'
+                }
+            })
+        return requests
 
-            # Update the sheet
-            range_name = f'{sheet_name}!A2:B{len(sanitized_values) + 1}'
-            self.service.spreadsheets().values().update(
-                spreadsheetId=spreadsheet_id,
-                range=range_name,
-                valueInputOption='RAW',
-                body={'values': sanitized_values}
-            ).execute()
-            
-            logger.info(f"Successfully updated {len(sanitized_values)} rows in sheet {sheet_name}")
-            
-        except Exception as e:
-            logger.error(f"Error updating sheet content: {str(e)}")
-            logger.error(f"Sheet: {sheet_name}, Values: {values}")
-            raise
\ No newline at end of file
+    @staticmethod
+    def to_rows(values: List[List[str]]) -> List[List[str]]:
+        """Header row and values as they end up in the sheet"""
+        return [HEADER_ROW] + [[str(cell).strip() for cell in row] for row in values]
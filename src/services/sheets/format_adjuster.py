@@ -4,27 +4,15 @@ import logging
 logger = logging.getLogger(__name__)
 
 class FormatAdjuster:
-    def __init__(self, service):
-        self.service = service
-
-    def adjust_column_widths(self, spreadsheet_id: str, sheet_id: int) -> None:
-        """Adjust column widths to fit content"""
-        try:
-            self.service.spreadsheets().batchUpdate(
-                spreadsheetId=spreadsheet_id,
-                body={
-                    'requests': [{
-                        'autoResizeDimensions': {
-                            'dimensions': {
-                                'sheetId': sheet_id,
-                                'dimension': 'COLUMNS',
-                                'startIndex': 0,
-                                'endIndex': 2
-                            }
-                        }
-                    }]
+    def build_resize_request(self, sheet_id: int, column_count: int = 2) -> dict:
+        """Build the request that adjusts column widths to fit content"""
+        return {
+            'autoResizeDimensions': {
+                'dimensions': {
+                    'sheetId': sheet_id,
+                    'dimension': 'COLUMNS',
+                    'startIndex': 0,
+                    'endIndex': column_count
                 }
-            ).execute()
-        except Exception as e:
-            logger.error(f"Error adjusting column widths: {str(e)}")
-            raise
\ No newline at end of file
+            }
+        }
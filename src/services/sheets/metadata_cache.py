@@ -0,0 +1,58 @@
+"""Per-spreadsheet cache of sheet titles and ids"""
+import logging
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Sheets answers these when the cached metadata no longer matches the spreadsheet
+# (a sheet was added, renamed or deleted by someone else)
+CONFLICT_MESSAGES = ('already exists', 'No grid with id')
+
+def is_metadata_conflict(error: Exception) -> bool:
+    """Whether a Sheets API error means the cached sheet metadata is stale"""
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    if status == 409:
+        return True
+    return status == 400 and any(message in str(error) for message in CONFLICT_MESSAGES)
+
+class SheetMetadataCache:
+    """
+    title -> sheetId maps of the spreadsheets written in this process
+
+    Filled from one narrow metadata read per spreadsheet, kept up to date from
+    addSheet replies and dropped when a write reports a conflict.
+    """
+    def __init__(self):
+        self._sheet_ids: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, spreadsheet_id: str) -> Optional[Dict[str, int]]:
+        with self._lock:
+            sheet_ids = self._sheet_ids.get(spreadsheet_id)
+            if sheet_ids is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return dict(sheet_ids)
+
+    def put(self, spreadsheet_id: str, sheet_ids: Dict[str, int]) -> None:
+        with self._lock:
+            self._sheet_ids[spreadsheet_id] = dict(sheet_ids)
+
+    def record_added(self, spreadsheet_id: str, title: str, sheet_id: int) -> None:
+        """Add a sheet created by an addSheet reply (ignored if the spreadsheet is not cached)"""
+        with self._lock:
+            if spreadsheet_id in self._sheet_ids:
+                self._sheet_ids[spreadsheet_id][title] = sheet_id
+
+    def invalidate(self, spreadsheet_id: str) -> None:
+        with self._lock:
+            if self._sheet_ids.pop(spreadsheet_id, None) is not None:
+                logger.info(f"Dropped cached sheet metadata of spreadsheet {spreadsheet_id}")
+
+    def report(self) -> Dict[str, int]:
+        with self._lock:
+            return {"spreadsheets": len(self._sheet_ids), "hits": self.hits, "misses": self.misses}
@@ -1,90 +1,87 @@
 """Sheet preparation service for Google Sheets"""
 import logging
-from typing import Optional
+import zlib
+from typing import Dict, List, Optional, Tuple
+from src.services.rate_limiter import RateLimiter
+from src.services.sheets.metadata_cache import SheetMetadataCache
 
 logger = logging.getLogger(__name__)
 
+# Only the properties needed to resolve a sheet title to its sheetId
+SHEET_METADATA_FIELDS = 'sheets.properties(sheetId,title)'
+
 class SheetPreparer:
-    def __init__(self, service):
+    def __init__(self, service, metadata_cache: Optional[SheetMetadataCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None):
         self.service = service
+        self.metadata_cache = metadata_cache or SheetMetadataCache()
+        self.rate_limiter = rate_limiter
 
-    def prepare_sheet(self, spreadsheet_id: str, sheet_name: str) -> Optional[int]:
-        """Prepare sheet for data update"""
-        try:
-            sheet_id = self._get_or_create_sheet(spreadsheet_id, sheet_name)
-            if sheet_id:
-                self._clear_existing_content(spreadsheet_id, sheet_id)
-                self._setup_headers(spreadsheet_id, sheet_name)
-            return sheet_id
-        except Exception as e:
-            logger.error(f"Error preparing sheet: {str(e)}")
-            return None
+    def get_sheet_ids(self, spreadsheet_id: str) -> Dict[str, int]:
+        """Title -> sheetId map of a spreadsheet (read once, then served from the metadata cache)"""
+        sheet_ids = self.metadata_cache.get(spreadsheet_id)
+        if sheet_ids is None:
+            sheet_ids = self._read_sheet_ids(spreadsheet_id)
+            self.metadata_cache.put(spreadsheet_id, sheet_ids)
+        return sheet_ids
 
-    def _get_or_create_sheet(self, spreadsheet_id: str, sheet_name: str) -> Optional[int]:
-        """Get existing sheet or create new one"""
+    def record_replies(self, spreadsheet_id: str, replies: List[dict]) -> None:
+        """Keep the metadata cache in step with the sheets added by a batchUpdate"""
+        for reply in replies:
+            properties = reply.get('addSheet', {}).get('properties')
+            if properties:
+                self.metadata_cache.record_added(spreadsheet_id, properties['title'], properties['sheetId'])
+
+    def _read_sheet_ids(self, spreadsheet_id: str) -> Dict[str, int]:
+        """Read the title -> sheetId map of a spreadsheet (one narrow metadata read)"""
         try:
+            if self.rate_limiter:
+                self.rate_limiter.acquire(0)
             sheet_metadata = self.service.spreadsheets().get(
-                spreadsheetId=spreadsheet_id).execute()
-            
-            existing_sheet = next(
-                (sheet for sheet in sheet_metadata['sheets'] 
-                 if sheet['properties']['title'] == sheet_name),
-                None
-            )
-            
-            if existing_sheet:
-                return existing_sheet['properties']['sheetId']
-            
-            result = self.service.spreadsheets().batchUpdate(
                 spreadsheetId=spreadsheet_id,
-                body={
-                    'requests': [{
-                        'addSheet': {
-                            'properties': {
-                                'title': sheet_name,
-                                'gridProperties': {
-                                    'frozenRowCount': 1
-                                }
-                            }
-                        }
-                    }]
-                }
+                fields=SHEET_METADATA_FIELDS
             ).execute()
+            return {
+                sheet['properties']['title']: sheet['properties']['sheetId']
+                for sheet in sheet_metadata.get('sheets', [])
+            }
+        except Exception as e:
+            logger.error(f"Error reading sheet metadata: {str(e)}")
+            raise
             
-            return result['replies'][0]['addSheet']['properties']['sheetId']
+    def build_prepare_requests(self, sheet_name: str, sheet_ids: Dict[str, int]) -> Tuple[int, bool, List[dict]]:
+        """
+        Resolve the sheet to write to, adding it if it does not exist yet
             
-        except Exception as e:
-            logger.error(f"Error getting/creating sheet: {str(e)}")
-            return None
+        A new sheet gets a client-chosen sheetId so that later requests in the
+        same batchUpdate can refer to it.
+            
+        Returns:
+            (sheet_id, whether the sheet is new, requests)
+        """
+        if sheet_name in sheet_ids:
+            return sheet_ids[sheet_name], False, []
 
-    def _clear_existing_content(self, spreadsheet_id: str, sheet_id: int) -> None:
-        """Clear existing content from sheet"""
-        try:
-            self.service.spreadsheets().batchUpdate(
-                spreadsheetId=spreadsheet_id,
-                body={
-                    'requests': [{
-                        'updateCells': {
-                            'range': {
-                                'sheetId': sheet_id,
-                                'startRowIndex': 1
-                            },
-                            'fields': 'userEnteredValue'
-                        }
-                    }]
+        sheet_id = self.choose_sheet_id(sheet_name, sheet_ids.values())
+        request = {
+            'addSheet': {
+                'properties': {
+                    'sheetId': sheet_id,
+                    'title': sheet_name,
+                    'gridProperties': {
+                        'frozenRowCount': 1
+                    }
                 }
-            ).execute()
-        except Exception as e:
-            logger.error(f"Error clearing sheet content: {str(e)}")
-
-    def _setup_headers(self, spreadsheet_id: str, sheet_name: str) -> None:
-        """Set up header row"""
-        try:
-            self.service.spreadsheets().values().update(
-                spreadsheetId=spreadsheet_id,
-                range=f'{sheet_name}!A1:B1',
-                valueInputOption='RAW',
-                body={'values': [['見出し', '内容']]}
-            ).execute()
-        except Exception as e:
-            logger.error(f"Error setting up headers: {str(e)}")
\ No newline at end of file
+            }
+        }
+        return sheet_id, True, [request]
+            
+    @staticmethod
+    def choose_sheet_id(sheet_name: str, used_ids) -> int:
+        """Pick a sheetId derived from the title that is not used in the spreadsheet"""
+        used = set(used_ids)
+        sheet_id = zlib.crc32(sheet_name.encode('utf-8')) & 0x7fffffff or 1
+        while sheet_id in used:
+            sheet_id = sheet_id % 0x7fffffff + 1
+        return sheet_id
+            
\ No newline at end of file
@@ -0,0 +1,118 @@
+"""Background writer that coalesces tender writes into few Sheets requests"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Union
+from src.models.tender_response import TenderResponse
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class SheetWriter:
+    """
+    Queue tender writes and apply them from a background thread
+
+    Queued writes are collected until max_batch_writes are waiting or
+    flush_interval seconds have passed since the first one, then each
+    spreadsheet gets one batchUpdate for the whole batch. Requests are
+    throttled by the rate limiter of the SheetsHandler. close() (also run at
+    interpreter exit) writes everything still queued before returning.
+    """
+    def __init__(self, sheets_handler, max_batch_writes: Optional[int] = None,
+                 flush_interval: Optional[float] = None):
+        self.sheets_handler = sheets_handler
+        self.max_batch_writes = max_batch_writes or int(os.getenv('SHEETS_BATCH_MAX_WRITES', '20'))
+        self.flush_interval = flush_interval or float(os.getenv('SHEETS_FLUSH_INTERVAL', '5'))
+        self.stats = {"queued": 0, "written": 0, "failed": 0, "batches": 0}
+        self._queue = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="sheet-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def enqueue(self, spreadsheet_id: str, tender_info: Union[Dict[str, Any], TenderResponse],
+                default_sheet_name: str, source_id: Optional[str] = None) -> None:
+        """Queue a tender write (returns immediately; the processed-at time is taken now)"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("SheetWriter is already closed")
+            self.stats["queued"] += 1
+        self._queue.put((spreadsheet_id, tender_info, default_sheet_name, source_id, datetime.now()))
+
+    def close(self) -> None:
+        """Write everything still queued and stop the background thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        logger.info(f"Sheet writer stats: {self.report()}")
+
+    def report(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch_writes:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+
+    def _flush(self, batch: List[tuple]) -> None:
+        """Apply a batch of queued writes, one batchUpdate per spreadsheet"""
+        handler = self.sheets_handler
+        by_spreadsheet: Dict[str, list] = OrderedDict()
+        for spreadsheet_id, tender_info, default_sheet_name, source_id, processed_at in batch:
+            try:
+                write = handler.prepare_write(tender_info, default_sheet_name, source_id, processed_at)
+            except Exception as e:
+                logger.error(f"Error converting tender data: {str(e)}")
+                self._count("failed")
+                continue
+            if write:
+                by_spreadsheet.setdefault(spreadsheet_id, []).append(write)
+
+        for spreadsheet_id, writes in by_spreadsheet.items():
+            try:
+                handler.apply_writes(spreadsheet_id, writes)
+                self._count("batches")
+                self._count("written", len(writes))
+            except Exception as e:
+                logger.error(f"Error writing {len(writes)} tenders at once, retrying one by one: {str(e)}")
+                self._write_individually(spreadsheet_id, writes)
+
+    def _write_individually(self, spreadsheet_id: str, writes: List[tuple]) -> None:
+        """One failing request fails its whole batchUpdate, so isolate it"""
+        for write in writes:
+            try:
+                self.sheets_handler.apply_writes(spreadsheet_id, [write])
+                self._count("batches")
+                self._count("written")
+            except Exception as e:
+                logger.error(f"Error writing tender {write[0]}: {str(e)}")
+                self._count("failed")
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += amount
@@ -0,0 +1,194 @@
+"""Summary sheet with one row per tender"""
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from src.models.tender_fields import TENDER_FIELDS
+from src.services.cache.sheet_snapshot_cache import SheetSnapshotCache
+from src.services.rate_limiter import RateLimiter
+from src.services.sheets.content_updater import ContentUpdater
+from src.services.sheets.sheet_preparer import SheetPreparer
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_HEADER = ['フォルダID'] + list(TENDER_FIELDS) + ['処理日時']
+
+# First row of the range reported by values().append, e.g. "'案件一覧'!A12:L14"
+_UPDATED_RANGE_START = re.compile(r'![A-Z]+(\d+)')
+
+class SummaryTable:
+    """
+    Write tenders as rows of one summary sheet, keyed by the source folder id
+
+    The key column is read once per spreadsheet and kept as a key -> row number
+    index. A batch of rows then costs at most one values().batchUpdate for the
+    tenders already in the table and one values().append for the new ones.
+    Rows may be sorted, inserted or deleted by hand between writes, so before
+    rows are updated through a cached index their key cells are read back
+    (one values().batchGet); if any key moved, the index is read again.
+    With a snapshot cache, rows whose tender result (everything but the
+    processed-at column) is the same as last written are not written again.
+    """
+    def __init__(self, service, sheet_preparer: SheetPreparer, sheet_name: str,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 snapshot_cache: Optional[SheetSnapshotCache] = None):
+        self.service = service
+        self.sheet_preparer = sheet_preparer
+        self.sheet_name = sheet_name
+        self.rate_limiter = rate_limiter
+        self.snapshot_cache = snapshot_cache
+        self._row_index: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def write_rows(self, spreadsheet_id: str, rows: List[Tuple[str, List[str]]]) -> None:
+        """
+        Update or append (key, row) pairs (the last row of a key wins)
+
+        On failure the cached index of the spreadsheet is dropped, so the next
+        write starts again from a fresh read.
+        """
+        latest = OrderedDict((key, row) for key, row in rows)
+        try:
+            index, cached = self._get_row_index(spreadsheet_id)
+            updates = self._changed_rows(spreadsheet_id, latest, index)
+            if updates and cached and not self._rows_match(spreadsheet_id, {key: index[key] for key in updates}):
+                logger.info(f"Rows of sheet {self.sheet_name} moved since the index was read, reloading it")
+                self.invalidate(spreadsheet_id)
+                index, _ = self._get_row_index(spreadsheet_id)
+                updates = self._changed_rows(spreadsheet_id, latest, index)
+            appends = [(key, row) for key, row in latest.items() if key not in index]
+            if updates:
+                self._update_rows(spreadsheet_id, {index[key]: row for key, row in updates.items()})
+            if appends:
+                first_row = self._append_rows(spreadsheet_id, [row for _, row in appends])
+                with self._lock:
+                    for offset, (key, _) in enumerate(appends):
+                        index[key] = first_row + offset
+            if self.snapshot_cache:
+                for key, row in list(updates.items()) + appends:
+                    self.snapshot_cache.put_rows(spreadsheet_id, self._snapshot_key(key), [row[:-1]])
+            skipped = len(latest) - len(updates) - len(appends)
+            logger.info(f"Updated {len(updates)}, appended {len(appends)} and skipped {skipped} unchanged rows "
+                        f"in sheet {self.sheet_name}")
+        except Exception:
+            self.invalidate(spreadsheet_id)
+            raise
+
+    def invalidate(self, spreadsheet_id: str) -> None:
+        with self._lock:
+            self._row_index.pop(spreadsheet_id, None)
+
+    def _changed_rows(self, spreadsheet_id: str, rows: Dict[str, List[str]],
+                      index: Dict[str, int]) -> Dict[str, List[str]]:
+        """Rows of keys already in the table that differ from what was last written"""
+        return {
+            key: row for key, row in rows.items()
+            if key in index and not self._is_unchanged(spreadsheet_id, key, row)
+        }
+
+    def _is_unchanged(self, spreadsheet_id: str, key: str, row: List[str]) -> bool:
+        if not self.snapshot_cache:
+            return False
+        return self.snapshot_cache.get_rows(spreadsheet_id, self._snapshot_key(key)) == [row[:-1]]
+
+    def _snapshot_key(self, key: str) -> str:
+        return f"summary:{self.sheet_name}:{key}"
+
+    def _get_row_index(self, spreadsheet_id: str) -> Tuple[Dict[str, int], bool]:
+        """
+        key -> row number (1-based) of the summary sheet, created with its header if missing
+
+        The flag tells whether the index was already cached (rather than just read).
+        """
+        with self._lock:
+            index = self._row_index.get(spreadsheet_id)
+        if index is not None:
+            return index, True
+
+        sheet_ids = self.sheet_preparer.get_sheet_ids(spreadsheet_id)
+        if self.sheet_name in sheet_ids:
+            index = self._read_row_index(spreadsheet_id)
+        else:
+            self._create_sheet(spreadsheet_id, sheet_ids)
+            index = {}
+        with self._lock:
+            return self._row_index.setdefault(spreadsheet_id, index), False
+
+    def _rows_match(self, spreadsheet_id: str, rows: Dict[str, int]) -> bool:
+        """Check that each key is still in the key cell of its indexed row"""
+        self._acquire()
+        result = self.service.spreadsheets().values().batchGet(
+            spreadsheetId=spreadsheet_id,
+            ranges=[f"{self._quoted_name()}!A{row_number}" for row_number in rows.values()]
+        ).execute()
+        cells = []
+        for value_range in result.get('valueRanges', []):
+            values = value_range.get('values') or [[]]
+            cells.append(values[0][0] if values[0] else '')
+        return cells == list(rows)
+
+    def _read_row_index(self, spreadsheet_id: str) -> Dict[str, int]:
+        """Read the key column once (the header row is skipped)"""
+        self._acquire()
+        result = self.service.spreadsheets().values().get(
+            spreadsheetId=spreadsheet_id,
+            range=f"{self._quoted_name()}!A:A",
+            majorDimension='COLUMNS'
+        ).execute()
+        keys = (result.get('values') or [[]])[0]
+        return {key: row for row, key in enumerate(keys, start=1) if row > 1 and key}
+
+    def _create_sheet(self, spreadsheet_id: str, sheet_ids: Dict[str, int]) -> None:
+        """Add the summary sheet with its header row in one batchUpdate"""
+        sheet_id, _, requests = self.sheet_preparer.build_prepare_requests(self.sheet_name, sheet_ids)
+        requests.append({
+            'appendCells': {
+                'sheetId': sheet_id,
+                'rows': [ContentUpdater.to_row_data(SUMMARY_HEADER)],
+                'fields': 'userEnteredValue'
+            }
+        })
+        self._acquire()
+        result = self.service.spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={'requests': requests}
+        ).execute()
+        self.sheet_preparer.record_replies(spreadsheet_id, result.get('replies', []))
+        logger.info(f"Created summary sheet {self.sheet_name}")
+
+    def _update_rows(self, spreadsheet_id: str, rows: Dict[int, List[str]]) -> None:
+        self._acquire()
+        self.service.spreadsheets().values().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={
+                'valueInputOption': 'RAW',
+                'data': [
+                    {'range': f"{self._quoted_name()}!A{row_number}", 'values': [row]}
+                    for row_number, row in rows.items()
+                ]
+            }
+        ).execute()
+
+    def _append_rows(self, spreadsheet_id: str, rows: List[List[str]]) -> int:
+        """Append rows below the table and return the row number of the first one"""
+        self._acquire()
+        result = self.service.spreadsheets().values().append(
+            spreadsheetId=spreadsheet_id,
+            range=f"{self._quoted_name()}!A1",
+            valueInputOption='RAW',
+            insertDataOption='INSERT_ROWS',
+            body={'values': rows}
+        ).execute()
+        updated_range = result.get('updates', {}).get('updatedRange', '')
+        match = _UPDATED_RANGE_START.search(updated_range)
+        if not match:
+            raise ValueError(f"Unexpected append range: {updated_range}")
+        return int(match.group(1))
+
+    def _quoted_name(self) -> str:
+        return "'" + self.sheet_name.replace("'", "''") + "'"
+
+    def _acquire(self) -> None:
+        if self.rate_limiter:
+            self.rate_limiter.acquire(0)
@@ -1,6 +1,7 @@
 """Converter for tender information to spreadsheet format"""
 import logging
 from typing import Dict, Any, Optional, List, Union
+from src.models.tender_fields import TENDER_FIELDS
 from src.models.tender_response import TenderResponse
 
 logger = logging.getLogger(__name__)
@@ -61,4 +62,18 @@ class TenderConverter:
         except Exception as e:
             logger.error(f"Error converting tender data: {str(e)}")
             logger.error(f"Tender info: {tender_info}")
-            return [["見出し", "内容"]]  # Return headers on error
\ No newline at end of file
+            return [["見出し", "内容"]]  # Return headers on error
+
+    def convert_to_row(self, tender_info: Union[Dict[str, Any], TenderResponse],
+                       source_id: str, processed_at: str) -> List[str]:
+        """Convert tender info to one summary row (source id, TENDER_FIELDS in order, processed-at)"""
+        contents = {}
+        if isinstance(tender_info, TenderResponse):
+            contents = {name: field.内容 for name, field in tender_info.項目.items()}
+        elif isinstance(tender_info, dict) and "項目" in tender_info:
+            contents = {
+                name: field.get("内容", "") if isinstance(field, dict) else field
+                for name, field in tender_info["項目"].items()
+            }
+        row = [str(contents.get(name) or "").strip() for name in TENDER_FIELDS]
+        return [source_id] + row + [processed_at]
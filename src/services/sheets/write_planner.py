@@ -0,0 +1,81 @@
+"""Plan a tender sheet write as a single batchUpdate"""
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from src.services.sheets.content_updater import ContentUpdater
+from src.services.sheets.format_adjuster import FormatAdjuster
+from src.services.sheets.sheet_preparer import SheetPreparer
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class WritePlan:
+    sheet_name: str
+    sheet_id: int
+    is_new_sheet: bool
+    row_count: int
+    requests: List[dict]
+    # Header and values as written, recorded to diff the next write against
+    rows: List[List[str]]
+
+    @property
+    def unchanged(self) -> bool:
+        return not self.requests
+
+class SheetWritePlanner:
+    """
+    Compose adding the sheet, writing header and values and resizing the
+    columns into the requests of one batchUpdate
+    """
+    def __init__(self, sheet_preparer: SheetPreparer, content_updater: ContentUpdater,
+                 format_adjuster: FormatAdjuster):
+        self.sheet_preparer = sheet_preparer
+        self.content_updater = content_updater
+        self.format_adjuster = format_adjuster
+
+    def plan(self, sheet_name: str, values: List[List[str]], sheet_ids: Dict[str, int],
+             previous_rows: Optional[List[List[str]]] = None) -> WritePlan:
+        """
+        Args:
+            sheet_name: title of the sheet to write
+            values: rows below the header
+            sheet_ids: title -> sheetId of the sheets that already exist
+            previous_rows: rows last written to the existing sheet, if known. Only the
+                changed cells are written then, and nothing at all if none changed.
+        """
+        sheet_id, is_new_sheet, requests = self.sheet_preparer.build_prepare_requests(sheet_name, sheet_ids)
+        rows = self.content_updater.to_rows(values)
+        if is_new_sheet or previous_rows is None:
+            content_requests = self.content_updater.build_content_requests(sheet_id, values, is_new_sheet)
+        else:
+            content_requests = self.content_updater.build_diff_requests(sheet_id, previous_rows, rows)
+        requests += content_requests
+        if content_requests:
+            requests.append(self.format_adjuster.build_resize_request(sheet_id))
+        return WritePlan(
+            sheet_name=sheet_name,
+            sheet_id=sheet_id,
+            is_new_sheet=is_new_sheet,
+            row_count=len(values),
+            requests=requests,
+            rows=rows
+        )
+
+    def plan_many(self, writes: List[Tuple[str, List[List[str]]]], sheet_ids: Dict[str, int],
+                  previous_rows: Optional[Dict[str, List[List[str]]]] = None) -> List[WritePlan]:
+        """
+        Plan several writes for the same spreadsheet to go into one batchUpdate
+
+        When a sheet is written more than once, only the last write is kept. Sheets
+        added by earlier plans are visible to later ones, so their sheetIds never collide.
+        previous_rows maps sheet titles to the rows last written to them (see plan).
+        """
+        latest = {sheet_name: values for sheet_name, values in writes}
+        sheet_ids = dict(sheet_ids)
+        previous_rows = previous_rows or {}
+        plans = []
+        for sheet_name, values in latest.items():
+            plan = self.plan(sheet_name, values, sheet_ids, previous_rows.get(sheet_name))
+            sheet_ids[sheet_name] = plan.sheet_id
+            plans.append(plan)
+        return plans
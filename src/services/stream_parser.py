@@ -0,0 +1,157 @@
+"""Incremental parsing of streamed {"項目": {...}} responses"""
+import json
+import os
+from typing import Any, List, Optional, Tuple
+from src.models.tender_fields import TENDER_FIELDS
+
+_WHITESPACE = " \t\r\n"
+_SCALAR_START = "-0123456789tfn"
+
+class MalformedStreamError(ValueError):
+    """ストリーミング中の応答が期待する JSON の形になっていない"""
+
+class StreamingResponseParser:
+    """
+    ストリーミングで届く応答を1文字ずつ解析し、「項目」内の各項目を閉じた時点で取り出す
+
+    JSON の構文（括弧の対応・キーと値の並び）を追い、次の場合は MalformedStreamError を送出して
+    残りのトークンを待たずに打ち切れるようにする。
+    - 先頭が「{」でない、トップレベルのキーが「項目」でない、「項目」がオブジェクトでない
+    - 構文が崩れている、JSON の終了後に空白以外が続く
+    - 空白だけが max_whitespace 文字以上続く（json_object モードで起きる空白の垂れ流し）
+    """
+    def __init__(self, field_names: Optional[List[str]] = None, max_whitespace: Optional[int] = None):
+        self.field_names = list(field_names or TENDER_FIELDS.keys())
+        self.max_whitespace = max_whitespace or int(os.getenv('STREAM_MAX_WHITESPACE', '200'))
+        self.text = ""
+        self.fields = {}
+        self.done = False
+        # 開いているオブジェクト・配列: [種類, 状態, 直前のキー, 「項目」のオブジェクトか]
+        self._stack: List[list] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._scalar_start: Optional[int] = None
+        self._item_start: Optional[int] = None
+        self._whitespace = 0
+
+    def feed(self, delta: str) -> List[Tuple[str, str]]:
+        """受信した差分を解析し、新たに確定した (項目名, 内容) を返す"""
+        start = len(self.text)
+        self.text += delta
+        completed = []
+        for offset, char in enumerate(delta):
+            self._consume(start + offset, char, completed)
+        return completed
+
+    def _consume(self, i: int, char: str, completed: List[Tuple[str, str]]) -> None:
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == '\\':
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                self._end_string(i, completed)
+            return
+
+        if self._scalar_start is not None:
+            if char not in _WHITESPACE and char not in ',}]':
+                return
+            self._end_value(i, completed)
+            self._scalar_start = None
+
+        if char in _WHITESPACE:
+            self._whitespace += 1
+            if self._whitespace >= self.max_whitespace:
+                raise MalformedStreamError(f"空白が{self._whitespace}文字続いています")
+            return
+        self._whitespace = 0
+
+        if self.done:
+            raise MalformedStreamError("JSONの終了後に余分な出力があります")
+        if not self._stack:
+            if char != '{':
+                raise MalformedStreamError("応答がJSONオブジェクトで始まっていません")
+            self._stack.append(['object', 'key_or_end', None, False])
+            return
+
+        top = self._stack[-1]
+        kind, state = top[0], top[1]
+        if char == '"':
+            if kind == 'object' and state in ('key', 'key_or_end'):
+                self._in_string = True
+                self._string_start = i
+                return
+            self._start_value(i, char)
+            self._in_string = True
+            self._string_start = i
+        elif char == ':' and kind == 'object' and state == 'colon':
+            top[1] = 'value'
+        elif char == ',' and state == 'comma_or_end':
+            top[1] = 'key' if kind == 'object' else 'value'
+        elif char == '}' and kind == 'object' and state in ('key_or_end', 'comma_or_end'):
+            self._close(i, completed)
+        elif char == ']' and kind == 'array' and state in ('value_or_end', 'comma_or_end'):
+            self._close(i, completed)
+        elif char == '{':
+            self._start_value(i, char)
+            self._stack.append(['object', 'key_or_end', None, len(self._stack) == 1])
+        elif char == '[':
+            self._start_value(i, char)
+            self._stack.append(['array', 'value_or_end', None, False])
+        elif char in _SCALAR_START:
+            self._start_value(i, char)
+            self._scalar_start = i
+        else:
+            raise MalformedStreamError(f"想定外の文字「{char}」があります（{i}文字目）")
+
+    def _start_value(self, i: int, char: str) -> None:
+        top = self._stack[-1]
+        if top[1] not in ('value', 'value_or_end'):
+            raise MalformedStreamError(f"値を置けない位置に値があります（{i}文字目）")
+        # トップレベルのキーは「項目」に限っているため、その値はオブジェクトでなければならない
+        if len(self._stack) == 1 and char != '{':
+            raise MalformedStreamError("「項目」がオブジェクトではありません")
+        top[1] = 'comma_or_end'
+        if top[3]:
+            self._item_start = i
+
+    def _end_string(self, i: int, completed: List[Tuple[str, str]]) -> None:
+        top = self._stack[-1]
+        if top[0] == 'object' and top[1] in ('key', 'key_or_end'):
+            top[2] = json.loads(self.text[self._string_start:i + 1])
+            top[1] = 'colon'
+            if len(self._stack) == 1 and top[2] != "項目":
+                raise MalformedStreamError(f"想定外のキー「{top[2]}」があります")
+            return
+        self._end_value(i + 1, completed)
+
+    def _close(self, i: int, completed: List[Tuple[str, str]]) -> None:
+        self._stack.pop()
+        if not self._stack:
+            self.done = True
+            return
+        self._end_value(i + 1, completed)
+
+    def _end_value(self, end: int, completed: List[Tuple[str, str]]) -> None:
+        """値が閉じた時点で、それが「項目」直下の値であれば内容を取り出す"""
+        top = self._stack[-1]
+        if not top[3] or self._item_start is None:
+            return
+        name = top[2]
+        try:
+            value = json.loads(self.text[self._item_start:end])
+        except ValueError:
+            raise MalformedStreamError(f"項目「{name}」の値が不正です")
+        self._item_start = None
+        if name in self.field_names and name not in self.fields:
+            self.fields[name] = self.field_content(value)
+            completed.append((name, self.fields[name]))
+
+    @staticmethod
+    def field_content(value: Any) -> str:
+        """項目の値から内容を取り出す（ResponseValidator と同じ解釈）"""
+        if isinstance(value, dict):
+            value = value.get("内容", value.get("content", ""))
+        return str(value if value is not None else "").strip()
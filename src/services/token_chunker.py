@@ -0,0 +1,166 @@
+"""Token-budget-aware chunking of streamed text records"""
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple
+from src.config.model_config import get_context_window
+from src.models.text_record import TextChunk, TextRecord
+from src.utils.token_counter import TokenCounter
+
+logger = logging.getLogger(__name__)
+
+SENTENCE_END = re.compile(r'(?<=[。！？!?])')
+HEADING = re.compile(
+    r'^(?:第[0-9０-９一二三四五六七八九十]+[章節条項]'
+    r'|[0-9０-９]+[\.．、]'
+    r'|[（(][0-9０-９一二三四五六七八九十]+[)）]'
+    r'|[■□◆◇●○【])'
+)
+SAFETY_MARGIN_TOKENS = 200
+MIN_CHUNK_TOKENS = 500
+# チャンクがこの割合まで埋まっていれば、次の見出しの手前で区切る
+HEADING_BREAK_RATIO = 0.8
+
+@dataclass
+class _Unit:
+    text: str
+    separator: str
+    tokens: int
+    source: Tuple[str, Optional[int]]
+    is_heading: bool = False
+
+@dataclass
+class ChunkStats:
+    chunks: int = 0
+    total_tokens: int = 0
+    overlap_tokens: int = 0
+    min_tokens: Optional[int] = None
+    max_tokens: int = 0
+
+    def record(self, tokens: int, overlap: int) -> None:
+        self.chunks += 1
+        self.total_tokens += tokens
+        self.overlap_tokens += overlap
+        self.min_tokens = tokens if self.min_tokens is None else min(self.min_tokens, tokens)
+        self.max_tokens = max(self.max_tokens, tokens)
+
+    def to_dict(self):
+        return {
+            "chunks": self.chunks,
+            "total_tokens": self.total_tokens,
+            "overlap_tokens": self.overlap_tokens,
+            "min_tokens": self.min_tokens or 0,
+            "max_tokens": self.max_tokens,
+            "mean_tokens": round(self.total_tokens / self.chunks) if self.chunks else 0
+        }
+
+class TokenChunker:
+    def __init__(self, token_counter: TokenCounter, max_tokens: int, overlap_tokens: int = 0):
+        """
+        Args:
+            token_counter: トークン数の計算に使うカウンター
+            max_tokens: 1チャンクあたりのトークン上限
+            overlap_tokens: 前のチャンクの末尾から引き継ぐトークン数の上限
+        """
+        self.token_counter = token_counter
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 4)
+        self.stats = ChunkStats()
+
+    @classmethod
+    def for_model(cls, model: str, prompt_tokens: int, output_tokens: int,
+                  token_counter: Optional[TokenCounter] = None) -> 'TokenChunker':
+        """
+        モデルのコンテキスト長からチャンクのトークン上限を決めて生成
+
+        Args:
+            model: 使用するモデル名
+            prompt_tokens: チャンク以外に送るプロンプトのトークン数
+            output_tokens: 応答用に確保するトークン数
+            token_counter: トークン数の計算に使うカウンター（省略時はモデルに合わせて生成）
+        """
+        available = get_context_window(model) - prompt_tokens - output_tokens - SAFETY_MARGIN_TOKENS
+        cap = int(os.getenv('CHUNK_MAX_TOKENS', '8000'))
+        max_tokens = max(MIN_CHUNK_TOKENS, min(cap, available))
+        overlap_tokens = int(os.getenv('CHUNK_OVERLAP_TOKENS', '200'))
+        logger.info(f"チャンクのトークン上限: {max_tokens}（モデル: {model}、重複: {overlap_tokens}）")
+        return cls(token_counter or TokenCounter(model), max_tokens, overlap_tokens)
+
+    def chunk_records(self, records: Iterable[TextRecord]) -> Iterator[TextChunk]:
+        """
+        レコードをトークン上限まで詰めたチャンクに分割
+
+        文（。！？）と見出しの境界でのみ区切り、前のチャンクの末尾の文を
+        overlap_tokens まで次のチャンクの先頭に重複させる。
+        """
+        index = 0
+        units: List[_Unit] = []
+        tokens = 0
+        overlap = 0
+
+        for unit in self._iter_units(records):
+            full = tokens + unit.tokens > self.max_tokens
+            at_section_break = unit.is_heading and tokens >= self.max_tokens * HEADING_BREAK_RATIO
+            if units and tokens > overlap and (full or at_section_break):
+                yield self._build_chunk(index, units, tokens, overlap)
+                index += 1
+                units = self._overlap_units(units, self.max_tokens - unit.tokens)
+                tokens = overlap = sum(u.tokens for u in units)
+            units.append(unit)
+            tokens += unit.tokens
+
+        if units and tokens > overlap:
+            yield self._build_chunk(index, units, tokens, overlap)
+
+    def _build_chunk(self, index: int, units: List[_Unit], tokens: int, overlap: int) -> TextChunk:
+        parts = [units[0].text]
+        for unit in units[1:]:
+            parts.append(unit.separator)
+            parts.append(unit.text)
+        chunk = TextChunk(index=index, text=''.join(parts), token_count=tokens)
+        for unit in units:
+            chunk.add_source(*unit.source)
+        self.stats.record(tokens, overlap)
+        return chunk
+
+    def _overlap_units(self, units: List[_Unit], room: int) -> List[_Unit]:
+        """前のチャンクの末尾から、重複させる文を選ぶ"""
+        budget = min(self.overlap_tokens, room)
+        selected = []
+        total = 0
+        for unit in reversed(units):
+            if total + unit.tokens > budget:
+                break
+            selected.append(unit)
+            total += unit.tokens
+        selected.reverse()
+        return selected
+
+    def _iter_units(self, records: Iterable[TextRecord]) -> Iterator[_Unit]:
+        """レコードを文単位に分割（上限を超える文は強制的に分割）"""
+        for record in records:
+            source = (record.source_file, record.page)
+            separator = '\n\n'
+            for paragraph in record.text.split('\n\n'):
+                for line in paragraph.split('\n'):
+                    is_heading = bool(HEADING.match(line))
+                    for sentence in SENTENCE_END.split(line):
+                        if not sentence:
+                            continue
+                        for piece in self._split_oversized(sentence):
+                            yield _Unit(piece, separator, self.token_counter.count(piece), source, is_heading)
+                            separator = ''
+                            is_heading = False
+                    separator = '\n'
+                separator = '\n\n'
+
+    def _split_oversized(self, text: str) -> Iterator[str]:
+        while self.token_counter.count(text) > self.max_tokens:
+            head = self.token_counter.truncate(text, self.max_tokens)
+            if not head:
+                break
+            yield head
+            text = text[len(head):]
+        if text:
+            yield text
@@ -0,0 +1,82 @@
+"""Per-stage latency, token usage and cost accounting for OpenAI requests"""
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+from src.config.model_config import estimate_cost
+
+@dataclass
+class StageUsage:
+    requests: int = 0
+    cached: int = 0
+    latency_seconds: float = 0.0
+    prompt_tokens: int = 0
+    cached_prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        sent = self.requests - self.cached
+        return {
+            "requests": self.requests,
+            "cached": self.cached,
+            "latency_seconds": round(self.latency_seconds, 2),
+            "mean_latency_seconds": round(self.latency_seconds / sent, 2) if sent else 0.0,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_prompt_tokens": self.cached_prompt_tokens,
+            "uncached_prompt_tokens": self.prompt_tokens - self.cached_prompt_tokens,
+            "prompt_cache_ratio": round(self.cached_prompt_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": round(self.cost_usd, 4)
+        }
+
+class UsageTracker:
+    """処理段階（抽出・再分析・統合）ごとにリクエスト数・所要時間・トークン数・料金を集計する"""
+
+    def __init__(self):
+        self._stages: Dict[str, StageUsage] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, model: str, latency_seconds: float, usage: Optional[Any],
+               price_ratio: float = 1.0) -> None:
+        """
+        APIに送信したリクエストを記録
+
+        Args:
+            usage: レスポンスの usage（オブジェクトまたは dict）。プロンプトキャッシュが効いたトークン数は
+                prompt_tokens_details.cached_tokens から読む
+            price_ratio: 通常料金に対する割合（Batch API の割引など）
+        """
+        prompt_tokens = _usage_value(usage, 'prompt_tokens')
+        completion_tokens = _usage_value(usage, 'completion_tokens')
+        cached_prompt_tokens = _usage_value(_usage_value(usage, 'prompt_tokens_details', None), 'cached_tokens')
+        with self._lock:
+            stats = self._stages.setdefault(stage, StageUsage())
+            stats.requests += 1
+            stats.latency_seconds += latency_seconds
+            stats.prompt_tokens += prompt_tokens
+            stats.cached_prompt_tokens += cached_prompt_tokens
+            stats.completion_tokens += completion_tokens
+            stats.cost_usd += estimate_cost(model, prompt_tokens, completion_tokens, cached_prompt_tokens) * price_ratio
+
+    def record_cached(self, stage: str) -> None:
+        """キャッシュから応答したリクエストを記録"""
+        with self._lock:
+            stats = self._stages.setdefault(stage, StageUsage())
+            stats.requests += 1
+            stats.cached += 1
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            report = {stage: stats.to_dict() for stage, stats in self._stages.items()}
+        stages = list(report.values())
+        report["total_cost_usd"] = round(sum(stats["cost_usd"] for stats in stages), 4)
+        report["total_cached_prompt_tokens"] = sum(stats["cached_prompt_tokens"] for stats in stages)
+        report["total_uncached_prompt_tokens"] = sum(stats["uncached_prompt_tokens"] for stats in stages)
+        return report
+
+def _usage_value(usage: Any, key: str, default: Any = 0) -> Any:
+    """usage（オブジェクトまたは dict）から値を取り出す"""
+    if usage is None:
+        return default
+    value = usage.get(key) if isinstance(usage, dict) else getattr(usage, key, None)
+    return value if value is not None else default
@@ -1,53 +1,148 @@
 """Google Sheets handler for tender analysis results"""
 from googleapiclient.discovery import build
 import logging
+import os
+from datetime import datetime
 from typing import Dict, Any, Optional, List, Union
 from src.models.tender_response import TenderResponse
+from src.services.cache.sheet_snapshot_cache import SheetSnapshotCache
+from src.services.rate_limiter import RateLimiter
 from src.services.sheets.sheet_preparer import SheetPreparer
 from src.services.sheets.content_updater import ContentUpdater
 from src.services.sheets.format_adjuster import FormatAdjuster
+from src.services.sheets.metadata_cache import is_metadata_conflict
+from src.services.sheets.summary_table import SummaryTable
 from src.services.sheets.tender_converter import TenderConverter
+from src.services.sheets.write_planner import SheetWritePlanner, WritePlan
 
 logger = logging.getLogger(__name__)
 
+# per_tender: one sheet per tender (見出し/内容 rows), summary: one row per tender in a shared sheet
+SHEET_LAYOUTS = ("per_tender", "summary")
+
 class SheetsHandler:
-    def __init__(self, credentials):
+    def __init__(self, credentials, snapshot_cache: Optional[SheetSnapshotCache] = None):
         """Initialize the sheets handler with Google credentials"""
         self.service = build('sheets', 'v4', credentials=credentials)
-        self.sheet_preparer = SheetPreparer(self.service)
-        self.content_updater = ContentUpdater(self.service)
-        self.format_adjuster = FormatAdjuster(self.service)
+        # Values last written to each sheet, so that reruns only send the cells that changed
+        self.snapshot_cache = snapshot_cache or SheetSnapshotCache()
+        # Every read and write counts against the per-minute Sheets quota
+        # (Sheets has no token quota, so requests acquire 0 tokens)
+        requests_per_minute = float(os.getenv('SHEETS_REQUESTS_PER_MINUTE', '60'))
+        self.rate_limiter = RateLimiter(requests_per_minute=requests_per_minute, tokens_per_minute=requests_per_minute)
+        self.sheet_preparer = SheetPreparer(self.service, rate_limiter=self.rate_limiter)
+        self.content_updater = ContentUpdater()
+        self.format_adjuster = FormatAdjuster()
+        self.write_planner = SheetWritePlanner(self.sheet_preparer, self.content_updater, self.format_adjuster)
         self.tender_converter = TenderConverter()
+        self.layout = os.getenv('SHEETS_LAYOUT', 'per_tender')
+        if self.layout not in SHEET_LAYOUTS:
+            raise ValueError(f"Unknown SHEETS_LAYOUT: {self.layout} (expected one of {', '.join(SHEET_LAYOUTS)})")
+        self.summary_table = None
+        if self.layout == 'summary':
+            self.summary_table = SummaryTable(
+                self.service,
+                self.sheet_preparer,
+                os.getenv('SUMMARY_SHEET_NAME', '案件一覧'),
+                rate_limiter=self.rate_limiter,
+                snapshot_cache=self.snapshot_cache
+            )
     
-    def create_or_append_sheet(self, spreadsheet_id: str, tender_info: Union[Dict[str, Any], TenderResponse], default_sheet_name: str) -> None:
-        """Create or update a sheet with tender information"""
+    def create_or_append_sheet(self, spreadsheet_id: str, tender_info: Union[Dict[str, Any], TenderResponse], default_sheet_name: str,
+                               source_id: Optional[str] = None) -> None:
+        """
+        Create or update a sheet with tender information
+
+        Costs one batchUpdate that adds the sheet if needed, writes header and values
+        and resizes the columns, plus one narrow metadata read the first time a
+        spreadsheet is written in this process. In the summary layout the tender
+        is a row of the summary sheet instead (see SummaryTable).
+        """
         try:
-            # Get project name for sheet title
-            sheet_name = self.tender_converter.get_project_name(tender_info)
-            if not sheet_name:
-                logger.warning(f"Using default sheet name: {default_sheet_name}")
-                sheet_name = default_sheet_name
-            
-            logger.info(f"Using sheet name: {sheet_name}")
-            
-            # Convert tender info to spreadsheet values
-            values = self.tender_converter.convert_to_values(tender_info)
-            if not values:
-                logger.warning("No data to update in spreadsheet")
-                return
-            
-            # Prepare sheet
-            sheet_id = self.sheet_preparer.prepare_sheet(spreadsheet_id, sheet_name)
-            if sheet_id is None:
-                logger.error("Failed to prepare sheet")
-                return
-            
-            # Update sheet content
-            self.content_updater.update_content(spreadsheet_id, sheet_name, values)
-            
-            # Adjust column widths
-            self.format_adjuster.adjust_column_widths(spreadsheet_id, sheet_id)
+            write = self.prepare_write(tender_info, default_sheet_name, source_id)
+            if write:
+                self.apply_writes(spreadsheet_id, [write])
             
         except Exception as e:
             logger.error(f"Error updating spreadsheet: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+    def prepare_write(self, tender_info: Union[Dict[str, Any], TenderResponse], default_sheet_name: str,
+                      source_id: Optional[str] = None, processed_at: Optional[datetime] = None) -> Optional[tuple]:
+        """
+        Convert tender information to a write for apply_writes (None if there is nothing to write)
+
+        Per-tender layout: (sheet name, rows). Summary layout: (tender key, row), where
+        the key is the source folder id (the sheet name when it is not given).
+        """
+        if self.summary_table:
+            processed_at = processed_at or datetime.now()
+            key = source_id or default_sheet_name
+            row = self.tender_converter.convert_to_row(tender_info, key, processed_at.strftime('%Y-%m-%d %H:%M:%S'))
+            return key, row
+
+        # Get project name for sheet title
+        sheet_name = self.tender_converter.get_project_name(tender_info)
+        if not sheet_name:
+            logger.warning(f"Using default sheet name: {default_sheet_name}")
+            sheet_name = default_sheet_name
+        
+        logger.info(f"Using sheet name: {sheet_name}")
+        
+        # Convert tender info to spreadsheet values
+        values = self.tender_converter.convert_to_values(tender_info)
+        if not values:
+            logger.warning("No data to update in spreadsheet")
+            return None
+        return sheet_name, values
+
+    def apply_writes(self, spreadsheet_id: str, writes: List[tuple]) -> Optional[List[WritePlan]]:
+        """
+        Plan and apply writes from prepare_write to one spreadsheet in one batchUpdate
+
+        Existing sheets are diffed against the values last written to them, so
+        only changed cells are sent and an unchanged sheet costs no request. If the
+        cached sheet metadata turns out to be stale, it is dropped and the writes
+        are planned again from a fresh read once. Summary rows are handed to the
+        SummaryTable instead.
+        """
+        if self.summary_table:
+            self.summary_table.write_rows(spreadsheet_id, writes)
+            return None
+
+        for attempt in range(2):
+            sheet_ids = self.sheet_preparer.get_sheet_ids(spreadsheet_id)
+            previous_rows = {
+                sheet_name: self.snapshot_cache.get_rows(spreadsheet_id, self._snapshot_key(sheet_ids[sheet_name], sheet_name))
+                for sheet_name, _ in writes if sheet_name in sheet_ids
+            }
+            plans = self.write_planner.plan_many(writes, sheet_ids, previous_rows)
+            changed = [plan for plan in plans if not plan.unchanged]
+            for plan in plans:
+                if plan.unchanged:
+                    logger.info(f"Sheet {plan.sheet_name} is unchanged, skipped")
+            if not changed:
+                return plans
+            try:
+                self.rate_limiter.acquire(0)
+                result = self.service.spreadsheets().batchUpdate(
+                    spreadsheetId=spreadsheet_id,
+                    body={'requests': [request for plan in changed for request in plan.requests]}
+                ).execute()
+            except Exception as e:
+                if attempt or not is_metadata_conflict(e):
+                    raise
+                logger.warning(f"Sheet metadata of {spreadsheet_id} is stale, retrying: {str(e)}")
+                self.sheet_preparer.metadata_cache.invalidate(spreadsheet_id)
+                continue
+            self.sheet_preparer.record_replies(spreadsheet_id, result.get('replies', []))
+            for plan in changed:
+                self.snapshot_cache.put_rows(spreadsheet_id, self._snapshot_key(plan.sheet_id, plan.sheet_name), plan.rows)
+                action = "Created" if plan.is_new_sheet else "Updated"
+                logger.info(f"{action} sheet {plan.sheet_name} with {plan.row_count} rows")
+            return plans
+
+    @staticmethod
+    def _snapshot_key(sheet_id: int, sheet_name: str) -> str:
+        # The sheetId is part of the key, so a sheet deleted and added again is written in full
+        return f"{sheet_id}:{sheet_name}"
@@ -1,3 +1,17 @@
+import re
+from dataclasses import replace
+
+MAX_LINE_LENGTH = 1000
+
+# Each step below is a single C-level pass (str.replace or a precompiled regex),
+# so cleaning stays linear in the input size
+_SPACE_LIKE_CHARS = ('\t', '\u3000', '\u00a0')  # tab, full-width space, no-break space
+_CONTROL_CHARS = re.compile('[\x00-\x08\x0b\x0e-\x1f\x7f\u200b\ufeff]')
+_BLANK_LINES = re.compile(r'\n *\n[ \n]*')
+_SPACES_AROUND_NEWLINE = re.compile(r' +\n *|\n +')
+_SPACE_RUN = re.compile(r'  +')
+_LONG_LINE = re.compile(r'(?m)^([^\n]{%d})[^\n]+' % MAX_LINE_LENGTH)
+
 class TextProcessor:
     @staticmethod
     def chunk_text(text, max_chunk_size=2000):  # Reduced from 4000 to 2000
@@ -21,16 +35,29 @@ class TextProcessor:
             
         return chunks
 
+    @staticmethod
+    def clean_records(records):
+        """Clean streamed records lazily, dropping the ones that end up empty"""
+        for record in records:
+            text = TextProcessor.clean_text(record.text)
+            if text.strip():
+                yield replace(record, text=text)
+
     @staticmethod
     def clean_text(text):
-        """Clean and normalize text"""
-        # Remove excessive whitespace
-        text = ' '.join(text.split())
-        # Normalize newlines
-        text = text.replace('\r\n', '\n')
+        """Clean and normalize text in linear time, keeping line and paragraph breaks"""
+        # Normalize newlines; a form feed (page break) becomes a paragraph break
+        text = text.replace('\r\n', '\n').replace('\r', '\n').replace('\f', '\n\n')
+        # Normalize full-width and other space-like characters to a plain space
+        for char in _SPACE_LIKE_CHARS:
+            text = text.replace(char, ' ')
         # Remove control characters
-        text = ''.join(char for char in text if ord(char) >= 32 or char == '\n')
+        text = _CONTROL_CHARS.sub('', text)
+        # Collapse blank-line runs into one paragraph break, then trim spaces around newlines
+        text = _BLANK_LINES.sub('\n\n', text)
+        text = _SPACES_AROUND_NEWLINE.sub('\n', text)
+        # Remove excessive whitespace
+        text = _SPACE_RUN.sub(' ', text)
         # Truncate extremely long lines
-        lines = text.split('\n')
-        truncated_lines = [line[:1000] if len(line) > 1000 else line for line in lines]
-        return '\n'.join(truncated_lines)
\ No newline at end of file
+        text = _LONG_LINE.sub(r'\1', text)
+        return text.strip()
\ No newline at end of file
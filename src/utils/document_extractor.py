@@ -1,11 +1,18 @@
 """Document text extraction utility"""
 import logging
+import re
 import docx
 import pandas as pd
+from typing import Iterator
 
 logger = logging.getLogger(__name__)
 
+BLOCK_SEPARATOR = re.compile(r'\n[ \t\u3000]*\n')
+
 class DocumentExtractor:
+    NAME = "document"
+    VERSION = "2"  # TextCache のキーの一部
+
     def extract_text(self, file_handle, mime_type: str) -> str:
         """
         各種ドキュメントからテキストを抽出
@@ -32,6 +39,24 @@ class DocumentExtractor:
             logger.error(f"ドキュメント処理中にエラー: {str(e)}")
             return ""
 
+    def iter_pages(self, file_handle, mime_type: str) -> Iterator[str]:
+        """
+        ドキュメントのテキストを段落ブロック単位で返す
+
+        ページの概念がない形式のため、空行で区切られたブロックをページの代わりとする。
+
+        Args:
+            file_handle: ファイルオブジェクト
+            mime_type: MIMEタイプ
+
+        Yields:
+            str: 段落ブロックのテキスト
+        """
+        text = self.extract_text(file_handle, mime_type)
+        for block in BLOCK_SEPARATOR.split(text.replace('\r\n', '\n')):
+            if block.strip():
+                yield block
+
     def _extract_google_doc(self, content: str) -> str:
         """Google Documentのテキストを抽出"""
         try:
@@ -50,7 +75,7 @@ class DocumentExtractor:
             for para in doc.paragraphs:
                 if para.text.strip():
                     text.append(para.text)
-            return "\n".join(text)
+            return "\n\n".join(text)
         except Exception as e:
             logger.error(f"Word文書処理中にエラー: {str(e)}")
             return ""
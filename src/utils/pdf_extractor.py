@@ -2,13 +2,68 @@
 from PyPDF2 import PdfReader
 import io
 import logging
-from typing import Optional
+import math
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Iterator, List, Optional
 
 logger = logging.getLogger(__name__)
 
+class PageTimeoutError(BaseException):
+    """ページ抽出が時間予算を超えた（_extract_page_text の except Exception で握りつぶされないよう BaseException を継承）"""
+
+def _raise_page_timeout(signum, frame):
+    raise PageTimeoutError()
+
+def _extract_page_range(pdf_path: str, start: int, end: int, page_timeout: float) -> List[str]:
+    """
+    ワーカープロセスで指定範囲のページを抽出
+
+    PDFは共有の一時ファイルから各ワーカーが直接開く。ページごとの時間予算は
+    SIGALRM で強制する（SIGALRM がない環境では時間予算なし）。
+    """
+    use_alarm = page_timeout > 0 and hasattr(signal, 'setitimer')
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _raise_page_timeout)
+
+    pdf = PdfReader(pdf_path)
+    texts = []
+    for page_num in range(start, end):
+        try:
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, page_timeout)
+            texts.append(PDFExtractor._extract_page_text(pdf.pages[page_num], page_num))
+        except PageTimeoutError:
+            logger.error(f"ページ {page_num + 1} の抽出が {page_timeout} 秒を超えたためスキップしました")
+            texts.append("")
+        finally:
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    return texts
+
 class PDFExtractor:
-    def __init__(self):
+    NAME = "pdf"
+    VERSION = "2"  # 抽出結果が変わる修正を入れたら上げる（テキストキャッシュが無効化される）
+
+    def __init__(self, max_workers: Optional[int] = None, page_timeout: Optional[float] = None,
+                 min_parallel_pages: Optional[int] = None):
+        """
+        Args:
+            max_workers: ページ並列抽出のプロセス数（0または1で逐次処理、省略時は PDF_WORKERS）
+            page_timeout: 並列抽出時の1ページあたりの時間予算（秒）
+            min_parallel_pages: 並列抽出に切り替えるページ数の下限
+        """
         self.supported_versions = range(1, 3)  # PDF version 1.x ~ 2.x をサポート
+        self.max_workers = max_workers if max_workers is not None else int(os.getenv('PDF_WORKERS', '0'))
+        self.page_timeout = page_timeout if page_timeout is not None else float(os.getenv('PDF_PAGE_TIMEOUT', '30'))
+        self.min_parallel_pages = min_parallel_pages or int(os.getenv('PDF_PARALLEL_MIN_PAGES', '20'))
+        self._executor = None
+        self._executor_lock = threading.Lock()
     
     def extract_text(self, file_handle) -> str:
         """
@@ -20,24 +75,119 @@ class PDFExtractor:
         Returns:
             str: 抽出されたテキスト
         """
+        return "\n\n".join(page_text for page_text in self.iter_pages(file_handle) if page_text)
+
+    def iter_pages(self, file_handle) -> Iterator[str]:
+        """
+        PDFのページごとのテキストをページ順に返す
+
+        Args:
+            file_handle: PDF file object (BytesIO)
+
+        Yields:
+            str: ページのテキスト（抽出できなかったページは空文字列）
+        """
         if not self._is_valid_pdf(file_handle):
-            return ""
+            return
             
-        text = []
         try:
             file_handle.seek(0)
             pdf = PdfReader(file_handle)
+            page_count = len(pdf.pages)
+            if self.max_workers > 1 and page_count >= self.min_parallel_pages:
+                yield from self._extract_pages_parallel(file_handle, page_count)
+                return
             
             for page_num, page in enumerate(pdf.pages):
-                page_text = self._extract_page_text(page, page_num)
-                if page_text:
-                    text.append(page_text)
-            
-            return "\n\n".join(text)
+                yield self._extract_page_text(page, page_num)
             
         except Exception as e:
             logger.error(f"PDF処理中にエラーが発生: {str(e)}")
-            return ""
+    
+    def close(self) -> None:
+        """ワーカープロセスを終了"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+    def _discard_executor(self) -> None:
+        """
+        応答しないワーカーを強制終了してプールを手放す（次回の並列抽出で作り直す）
+
+        shutdown(wait=False) だけでは止まったワーカープロセスが残り続けるため、プールが
+        保持するプロセスを terminate（応じなければ kill）する。同じプールで処理中だった
+        他の文書の範囲は失敗し、空のページとして扱われる。
+        """
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        processes = list((getattr(executor, '_processes', None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.kill()
+                process.join(timeout=5)
+        logger.warning(f"応答しないPDF抽出ワーカーを終了しました（{len(processes)} プロセス）")
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                # スレッドを使う親プロセスからの fork を避けるため spawn で起動する
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def _extract_pages_parallel(self, file_handle, page_count: int) -> List[str]:
+        """ページ範囲をプロセスプールに分配して抽出し、ページ順に並べて返す"""
+        # ワーカー数の数倍に分割し、重いページが特定のワーカーに偏らないようにする
+        range_size = max(1, math.ceil(page_count / (self.max_workers * 4)))
+        ranges = [(start, min(start + range_size, page_count)) for start in range(0, page_count, range_size)]
+
+        fd, pdf_path = tempfile.mkstemp(suffix='.pdf')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(file_handle.getvalue() if hasattr(file_handle, 'getvalue') else file_handle.read())
+
+            executor = self._get_executor()
+            futures = [
+                executor.submit(_extract_page_range, pdf_path, start, end, self.page_timeout)
+                for start, end in ranges
+            ]
+
+            # ページ単位の時間予算が効かなかった場合に備えた文書全体の期限。範囲は並列に
+            # 処理されるため、範囲ごとに待ち時間を積み上げず全範囲で1つの期限を共有する
+            deadline = None
+            if self.page_timeout > 0:
+                rounds = math.ceil(len(ranges) / self.max_workers)
+                deadline = time.monotonic() + self.page_timeout * range_size * rounds + 30
+
+            page_texts = []
+            timed_out = False
+            for (start, end), future in zip(ranges, futures):
+                try:
+                    timeout = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+                    page_texts.extend(future.result(timeout=timeout))
+                except FutureTimeoutError:
+                    timed_out = True
+                    logger.error(f"ページ {start + 1}-{end} の抽出がタイムアウトしました")
+                    page_texts.extend([""] * (end - start))
+                except Exception as e:
+                    logger.error(f"ページ {start + 1}-{end} の処理中にエラー: {str(e)}")
+                    page_texts.extend([""] * (end - start))
+            if timed_out:
+                # 止まったワーカーが残り続けたり close() が待ち続けたりしないよう、プールごと終了させる
+                self._discard_executor()
+            return page_texts
+        finally:
+            os.remove(pdf_path)
     
     def _is_valid_pdf(self, file_handle) -> bool:
         """PDFファイルが有効かチェック"""
@@ -70,7 +220,8 @@ class PDFExtractor:
             pass
         return None
     
-    def _extract_page_text(self, page, page_num: int) -> str:
+    @staticmethod
+    def _extract_page_text(page, page_num: int) -> str:
         """ページからテキストを抽出"""
         try:
             page_text = page.extract_text()
@@ -0,0 +1,87 @@
+"""Token counting for chunk sizing"""
+import logging
+import math
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken は任意依存。なければ推定値を使う
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+_notice_logged = False
+
+class TokenCounter:
+    # tiktoken がない場合の推定係数（日本語は1文字あたり1トークン強、英数字は約4文字で1トークン）
+    TOKENS_PER_NON_ASCII_CHAR = 1.1
+    TOKENS_PER_ASCII_CHAR = 0.25
+
+    def __init__(self, model: str):
+        self.model = model
+        self._encoding = self._load_encoding(model)
+
+    @staticmethod
+    def _load_encoding(model: str):
+        """
+        tiktoken のエンコーディングを取得（使えない場合は None を返し、推定値を使う）
+
+        tiktoken は初回にBPEファイルをダウンロードするため、オフライン環境では読み込みに失敗する。
+        事前に取得したファイルを TIKTOKEN_CACHE_DIR に置いておけばオフラインでも正確に数えられる。
+        """
+        global _notice_logged
+        encoding, reason = None, None
+        if tiktoken is None:
+            reason = "tiktoken が見つからない"
+        else:
+            try:
+                try:
+                    encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                reason = (f"tiktoken のエンコーディングを読み込めない（{str(e)}。"
+                          "オフライン環境では TIKTOKEN_CACHE_DIR に取得済みのファイルを置いてください）")
+        if not _notice_logged:
+            _notice_logged = True
+            if encoding is not None:
+                logger.info(f"トークン数は tiktoken（{encoding.name}）で数えます")
+            else:
+                logger.warning(f"{reason}ため、トークン数は推定値を使用します")
+        return encoding
+
+    @property
+    def is_exact(self) -> bool:
+        return self._encoding is not None
+
+    def count(self, text: str) -> int:
+        """テキストのトークン数を取得"""
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        ascii_chars = len(text.encode('ascii', 'ignore'))
+        non_ascii_chars = len(text) - ascii_chars
+        return math.ceil(
+            non_ascii_chars * self.TOKENS_PER_NON_ASCII_CHAR + ascii_chars * self.TOKENS_PER_ASCII_CHAR
+        )
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """先頭から max_tokens 以内に収まる部分を取得"""
+        if self._encoding is not None:
+            # トークン境界が多バイト文字の途中にあると、既定の errors='replace' では末尾が U+FFFD に
+            # 置き換わり元のテキストの先頭と一致しなくなる。途中の文字は落として次の部分に回す
+            tokens = self._encoding.encode(text, disallowed_special=())
+            count = min(max_tokens, len(tokens))
+            head = self._encoding.decode(tokens[:count], errors='ignore')
+            while head and not text.startswith(head):
+                count -= 1
+                head = self._encoding.decode(tokens[:count], errors='ignore')
+            return head
+
+        low, high = 0, len(text)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.count(text[:mid]) <= max_tokens:
+                low = mid
+            else:
+                high = mid - 1
+        return text[:low]
@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+import pytest
+
+openai = pytest.importorskip("openai")
+
+from src.services.batch_runner import BatchRunner
+
+
+def _status_error(status, headers=None):
+    response = SimpleNamespace(status_code=status, headers=headers or {}, request=None)
+    return openai.APIStatusError("error", response=response, body=None)
+
+
+class FakeBatches:
+    def __init__(self, replies):
+        self.replies = list(replies)
+
+    def retrieve(self, batch_id):
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return SimpleNamespace(id=batch_id, status=reply, request_counts=None)
+
+
+def _runner(replies, tmp_path):
+    service = SimpleNamespace(client=SimpleNamespace(batches=FakeBatches(replies)))
+    return BatchRunner(service, state_dir=str(tmp_path), poll_interval=1)
+
+
+def test_polling_survives_transient_errors(tmp_path, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("src.services.batch_runner.time.sleep", sleeps.append)
+    runner = _runner([
+        _status_error(503),
+        openai.APIConnectionError(request=None),
+        _status_error(429, {"retry-after": "30"}),
+        "in_progress",
+        "completed",
+    ], tmp_path)
+
+    batch = runner._wait(SimpleNamespace(id="b1", status="validating", request_counts=None))
+
+    assert batch.status == "completed"
+    # Retry-After はポーリング間隔より長ければそれに従う
+    assert sleeps == [1, 1, 1, 30, 1]
+
+
+def test_polling_raises_permanent_errors(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.services.batch_runner.time.sleep", lambda seconds: None)
+    runner = _runner([_status_error(404)], tmp_path)
+
+    with pytest.raises(openai.APIStatusError):
+        runner._wait(SimpleNamespace(id="b1", status="in_progress", request_counts=None))
@@ -0,0 +1,49 @@
+from src.models.tender_response import TenderFieldContent, TenderResponse
+from src.models.text_record import TextChunk
+from src.services.chunk_router import ChunkRouter
+
+
+def _chunks(*texts):
+    return [TextChunk(index=i, text=text) for i, text in enumerate(texts)]
+
+
+def _result(**fields):
+    return TenderResponse(項目={name: TenderFieldContent(見出し=name, 内容=value) for name, value in fields.items()})
+
+
+def test_routes_each_field_to_chunks_with_its_keywords():
+    chunks = _chunks("表紙", "案件名：サイト改修", "発注機関：デジタル庁", "入札方式：一般競争入札")
+    routes = ChunkRouter(top_k=1).route(chunks, ["案件名", "発注機関", "入札の種類"])
+    assert routes == {1: ["案件名"], 2: ["発注機関"], 3: ["入札の種類"]}
+
+
+def test_field_without_keyword_hits_falls_back_to_top_chunks_by_overall_score(caplog):
+    chunks = _chunks("表紙", "件名：サイト改修。件名の補足", "発注機関：デジタル庁")
+    router = ChunkRouter(top_k=2)
+    routes = router.route(chunks, ["案件名", "発注機関", "CMSの有無"])
+    assert router.fallback_fields == ["CMSの有無"]
+    cms_chunks = sorted(index for index, names in routes.items() if "CMSの有無" in names)
+    assert cms_chunks == [1, 2]
+    assert "CMSの有無" in caplog.text
+
+
+def test_field_falls_back_to_all_chunks_when_no_keyword_matches_anywhere():
+    chunks = _chunks("あ", "い", "う")
+    router = ChunkRouter(top_k=1)
+    routes = router.route(chunks, ["CMSの有無"])
+    assert routes == {0: ["CMSの有無"], 1: ["CMSの有無"], 2: ["CMSの有無"]}
+
+
+def test_recall_report_counts_relevant_chunks_and_marks_fallbacks():
+    chunks = _chunks("表紙", "件名：サイト改修", "仕様")
+    router = ChunkRouter(top_k=1)
+    routes = router.route(chunks, ["案件名", "CMSの有無"])
+    full_results = {
+        0: _result(案件名="サイト改修"),
+        1: _result(案件名="サイト改修"),
+        2: _result(CMSの有無="有"),
+    }
+    report = router.recall_report(routes, full_results, ["案件名", "CMSの有無"])
+    assert report["案件名"] == {"selected": 1, "relevant": 2, "recall": 0.5, "fallback": False}
+    assert report["CMSの有無"]["fallback"] is True
+    assert report["CMSの有無"]["recall"] == 0.0
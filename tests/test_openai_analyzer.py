@@ -0,0 +1,16 @@
+import pytest
+
+pytest.importorskip("openai")
+
+from src.models.tender_response import TenderFieldContent, TenderResponse
+from src.openai_analyzer import TenderAnalyzer
+
+
+def test_rule_values_only_fill_fields_the_llm_left_empty():
+    response = TenderResponse(項目={
+        "CMSの有無": TenderFieldContent(見出し="CMSの有無", 内容="無"),
+        "発注機関": TenderFieldContent(見出し="発注機関", 内容="不明"),
+    })
+    applied = TenderAnalyzer._apply_rule_values(response, {"CMSの有無": "有", "発注機関": "デジタル庁"})
+    assert applied.項目["CMSの有無"].内容 == "無"
+    assert applied.項目["発注機関"].内容 == "デジタル庁"
@@ -0,0 +1,36 @@
+import pytest
+
+pytest.importorskip("openai")
+
+from src.services.cache.response_cache import ResponseCache
+from src.services.openai_service import OpenAIService
+
+
+@pytest.fixture
+def service(monkeypatch):
+    for name in ("EXTRACTION_MAX_TOKENS", "ESCALATION_MAX_TOKENS", "ESCALATION_MAX_TOKENS_MULTIPLIER"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("EXTRACTION_MODEL", "gpt-4o-mini")
+    monkeypatch.setenv("ESCALATION_MODEL", "gpt-4o-mini")
+    return OpenAIService("test-key", response_cache=ResponseCache(enabled=False))
+
+
+def test_truncated_response_is_escalated_even_with_the_same_model(service):
+    truncated = '{"項目": {"案件名": {"見出し": "案件名", "内容": "'
+    assert service.should_escalate("extraction", truncated, None, "length")
+    # 打ち切られていない不完全な応答は、同じモデルで再分析しても改善しない
+    assert service.should_escalate("extraction", truncated, None, "stop") is None
+    assert service.should_escalate("escalation", truncated, None, "length") is None
+
+
+def test_escalation_gets_a_larger_output_budget(service, monkeypatch):
+    extraction = service.max_output_tokens("extraction")
+    assert service.max_output_tokens("escalation") == extraction * 2
+    monkeypatch.setenv("ESCALATION_MAX_TOKENS", "5000")
+    assert service.max_output_tokens("escalation") == 5000
+
+
+def test_escalation_reason_checks_finish_reason_first():
+    complete = '{"項目": {"案件名": {"見出し": "案件名", "内容": "サイト改修"}}}'
+    assert OpenAIService.escalation_reason(complete, ["案件名"], "length")
+    assert OpenAIService.escalation_reason(complete, ["案件名"], "stop") is None
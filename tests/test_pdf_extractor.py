@@ -0,0 +1,67 @@
+import io
+import time
+from concurrent.futures import Future
+
+import pytest
+
+pytest.importorskip("PyPDF2")
+
+from src.utils.pdf_extractor import PDFExtractor
+
+
+class StalledExecutor:
+    """投入された処理が終わらないプール"""
+    def __init__(self):
+        self.shutdown_calls = []
+
+    def submit(self, fn, *args):
+        return Future()
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shutdown_calls.append(wait)
+
+
+def test_ranges_share_one_deadline(monkeypatch):
+    extractor = PDFExtractor(max_workers=2, page_timeout=0.01)
+    executor = StalledExecutor()
+    extractor._executor = executor
+    # 期限の計算後は時計が期限を過ぎた状態にする
+    ticks = iter([0.0])
+    monkeypatch.setattr("src.utils.pdf_extractor.time.monotonic", lambda: next(ticks, 1000.0))
+
+    started = time.perf_counter()
+    # 範囲ごとに (時間予算 + 30 秒) を待つと数分かかる。期限は全範囲で共有する
+    texts = extractor._extract_pages_parallel(io.BytesIO(b"%PDF-1.4"), 8)
+
+    assert texts == [""] * 8
+    assert time.perf_counter() - started < 5
+    # 応答しないワーカーを待たずにプールを手放す
+    assert executor.shutdown_calls == [False]
+    assert extractor._executor is None
+
+
+def test_close_without_executor_is_noop():
+    extractor = PDFExtractor(max_workers=2)
+    extractor.close()
+    extractor.close()
+
+
+
+def test_discarding_the_pool_terminates_hanging_workers():
+    extractor = PDFExtractor(max_workers=2)
+    executor = extractor._get_executor()
+    hanging = executor.submit(time.sleep, 600)
+    # ワーカーが起動して処理を受け取るまで待つ
+    deadline = time.monotonic() + 30
+    while not hanging.running() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    processes = list(executor._processes.values())
+    assert processes
+
+    started = time.perf_counter()
+    extractor._discard_executor()
+
+    assert time.perf_counter() - started < 15
+    assert not any(process.is_alive() for process in processes)
+    assert extractor._executor is None
+    extractor.close()
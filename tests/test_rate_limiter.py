@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from src.services import rate_limiter
+from src.services.rate_limiter import RateLimiter, TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(rate_limiter.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_bucket_reserves_in_arrival_order(clock):
+    bucket = TokenBucket(60, capacity=2)  # 1秒に1つ補充
+    assert bucket.reserve(1) == 0.0
+    assert bucket.reserve(1) == 0.0
+    # 残量を負にして予約するため、後から来た呼び出しほど長く待つ
+    assert bucket.reserve(1) == pytest.approx(1.0)
+    assert bucket.reserve(1) == pytest.approx(2.0)
+    clock.now += 2
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+
+def test_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(60, capacity=2)
+    bucket.reserve(2)
+    clock.now += 100
+    assert bucket.reserve(2) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+
+def test_oversized_reservation_is_capped_at_capacity(clock):
+    bucket = TokenBucket(60, capacity=10)
+    # 容量を超える要求でも永久に待たない
+    assert bucket.reserve(1000) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+
+def test_limiter_waits_for_the_slower_of_rpm_and_tpm(clock):
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=60)
+    limiter.acquire(60)
+    limiter.acquire(30)
+    assert clock.sleeps == [pytest.approx(30.0)]
+    assert limiter.report() == {"requests": 2, "rate_limit_wait_seconds": 30.0}
+
+
+def test_async_acquire_sleeps_without_blocking(clock, monkeypatch):
+    waits = []
+
+    async def fake_sleep(seconds):
+        waits.append(seconds)
+
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", fake_sleep)
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=10_000)
+    limiter.request_bucket = TokenBucket(60, capacity=1)
+
+    async def run():
+        await limiter.acquire_async(1)
+        await limiter.acquire_async(1)
+
+    asyncio.run(run())
+    assert waits == [pytest.approx(1.0)]
+    assert clock.sleeps == []
@@ -0,0 +1,127 @@
+import email.utils
+from types import SimpleNamespace
+
+import pytest
+
+openai = pytest.importorskip("openai")
+
+from src.services import resilience
+from src.services.resilience import CircuitBreaker, ResilientCaller, get_retry_after, is_retryable
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, "time", clock.time)
+    monkeypatch.setattr(resilience.time, "monotonic", clock.time)
+    monkeypatch.setattr(resilience.time, "sleep", clock.sleep)
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: high)
+    return clock
+
+
+def _status_error(status, headers=None):
+    response = SimpleNamespace(status_code=status, headers=headers or {}, request=None)
+    return openai.APIStatusError("error", response=response, body=None)
+
+
+def test_retryable_errors():
+    assert is_retryable(_status_error(429))
+    assert is_retryable(_status_error(503))
+    assert is_retryable(openai.APIConnectionError(request=None))
+    assert not is_retryable(_status_error(400))
+    assert not is_retryable(ValueError("bad"))
+
+
+def test_retry_after_headers(clock):
+    assert get_retry_after(_status_error(429, {"retry-after-ms": "1500", "retry-after": "9"})) == 1.5
+    assert get_retry_after(_status_error(429, {"retry-after": "7"})) == 7.0
+    http_date = email.utils.formatdate(clock.now + 30, usegmt=True)
+    assert get_retry_after(_status_error(429, {"retry-after": http_date})) == pytest.approx(30.0)
+    # 過去の日時は待たない
+    past = email.utils.formatdate(clock.now - 30, usegmt=True)
+    assert get_retry_after(_status_error(429, {"retry-after": past})) == 0.0
+    assert get_retry_after(_status_error(429, {"retry-after": "soon"})) is None
+    assert get_retry_after(_status_error(429)) is None
+    assert get_retry_after(ValueError("no response")) is None
+
+
+def test_circuit_opens_after_threshold_and_cools_down(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown_seconds=20)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.remaining_pause() == 0.0
+    breaker.record_failure()
+    assert breaker.opened == 1
+    assert breaker.remaining_pause() == pytest.approx(20.0)
+    clock.now += 15
+    assert breaker.remaining_pause() == pytest.approx(5.0)
+    clock.now += 5
+    assert breaker.remaining_pause() == 0.0
+
+
+def test_success_resets_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=2, cooldown_seconds=20)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.opened == 0
+
+
+def _caller(max_retries=3, threshold=10):
+    return ResilientCaller(max_retries, base_delay=1, max_delay=8,
+                           circuit_breaker=CircuitBreaker(threshold, cooldown_seconds=60))
+
+
+def _flaky(errors, result="ok"):
+    errors = list(errors)
+
+    def call():
+        if errors:
+            raise errors.pop(0)
+        return result
+    return call
+
+
+def test_caller_backs_off_exponentially_and_honours_retry_after(clock):
+    caller = _caller()
+    result = caller.call(_flaky([_status_error(500), _status_error(500), _status_error(429, {"retry-after": "5"})]))
+    assert result == "ok"
+    # 1, 2, 4 秒が上限の full jitter。3回目は Retry-After の 5 秒を優先する
+    assert clock.sleeps == [1, 2, 5]
+    assert caller.report()["retries"] == 3
+
+
+def test_caller_raises_permanent_errors_immediately(clock):
+    caller = _caller()
+    with pytest.raises(openai.APIStatusError):
+        caller.call(_flaky([_status_error(400)]))
+    assert clock.sleeps == []
+
+
+def test_caller_gives_up_after_max_retries(clock):
+    caller = _caller(max_retries=2)
+    with pytest.raises(openai.APIStatusError):
+        caller.call(_flaky([_status_error(503)] * 5))
+    assert len(clock.sleeps) == 2
+    assert caller.report()["failed_requests"] == 1
+
+
+def test_open_circuit_pauses_the_next_call(clock):
+    caller = _caller(max_retries=5, threshold=2)
+    assert caller.call(_flaky([_status_error(503), _status_error(503)])) == "ok"
+    # 2回目の失敗で回路が開き、バックオフの後も残りの停止時間を待つ
+    assert clock.sleeps == [1, 2, 58]
+    assert caller.report()["circuit_opened"] == 1
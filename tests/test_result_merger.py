@@ -0,0 +1,36 @@
+from src.models.tender_response import TenderFieldContent, TenderResponse
+from src.services.result_merger import ResultMerger, normalize_value
+
+
+def _result(**fields):
+    return TenderResponse(項目={name: TenderFieldContent(見出し=name, 内容=value) for name, value in fields.items()})
+
+
+def test_normalize_value_ignores_width_spacing_and_empty_markers():
+    assert normalize_value("ＣＭＳ 有。") == normalize_value("cms有")
+    assert normalize_value("不明") == ""
+
+
+def test_identical_values_and_contained_values_merge_locally():
+    outcome = ResultMerger().merge([_result(発注機関="デジタル庁"), _result(発注機関="デジタル庁 総務課"), _result(発注機関="不明")])
+    assert outcome.response.項目["発注機関"].内容 == "デジタル庁 総務課"
+    assert "発注機関" not in outcome.unresolved
+
+
+def test_majority_vote_wins():
+    outcome = ResultMerger().merge([_result(CMSの有無="有"), _result(CMSの有無="有"), _result(CMSの有無="無")])
+    assert outcome.response.項目["CMSの有無"].内容 == "有"
+    assert "CMSの有無" not in outcome.unresolved
+
+
+def test_tie_is_left_to_the_llm():
+    outcome = ResultMerger().merge([_result(CMSの有無="有"), _result(CMSの有無="無")])
+    assert "CMSの有無" in outcome.unresolved
+
+
+def test_differing_free_text_is_left_to_the_llm():
+    outcome = ResultMerger().merge([_result(要件概要="サイト改修"), _result(要件概要="保守運用")])
+    assert "要件概要" in outcome.unresolved
+    merger = ResultMerger()
+    merger.record(outcome.unresolved)
+    assert merger.stats.to_dict()["要件概要"] == {"local": 0, "llm": 1}
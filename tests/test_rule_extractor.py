@@ -0,0 +1,51 @@
+from src.services.rule_extractor import RuleExtractor
+
+
+def _extract(*texts, min_matches=2):
+    extractor = RuleExtractor(enabled=True, min_matches=min_matches)
+    for text in texts:
+        extractor.feed(text)
+    return extractor
+
+
+def test_labelled_lines_are_extracted():
+    extractor = _extract("件名：ウェブサイト改修業務\n発注機関：デジタル庁", "件名：ウェブサイト改修業務")
+    assert extractor.confident_values()["案件名"] == "ウェブサイト改修業務"
+    assert extractor.hint_values()["発注機関"] == "デジタル庁"
+
+
+def test_single_match_is_only_a_hint():
+    extractor = _extract("本業務ではCMSを導入する。")
+    assert "CMSの有無" not in extractor.confident_values()
+    assert extractor.hint_values() == {"CMSの有無": "有"}
+
+
+def test_two_agreeing_matches_are_confident():
+    extractor = _extract("本業務ではCMSを導入する。", "CMSの更新作業を含む。")
+    assert extractor.confident_values()["CMSの有無"] == "有"
+
+
+def test_negative_wording_is_not_counted_as_yes():
+    extractor = _extract("CMSの導入は不要とする。", "CMSは使用しない。")
+    assert extractor.confident_values()["CMSの有無"] == "無"
+
+
+def test_undecided_wording_is_not_counted():
+    extractor = _extract(
+        "CMSの導入の有無は提案によるものとする。",
+        "CMSを導入するかどうかは受注者の提案に委ねる。",
+        "CMSの採用可否を検討すること。",
+    )
+    assert "CMSの有無" not in extractor.confident_values()
+    assert "CMSの有無" not in extractor.hint_values()
+
+
+def test_conflicting_matches_are_left_to_the_llm():
+    extractor = _extract("CMSを導入する。", "CMSの導入は不要。", "CMSを利用する。")
+    assert "CMSの有無" not in extractor.confident_values()
+    assert "CMSの有無" not in extractor.hint_values()
+
+
+def test_bid_type_from_notice_sentence():
+    extractor = _extract("一般競争入札（総合評価落札方式）に付します。", "入札方式：一般競争入札（総合評価落札方式）")
+    assert extractor.confident_values()["入札の種類"] == "一般競争入札（総合評価落札方式）"
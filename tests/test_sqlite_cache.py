@@ -0,0 +1,74 @@
+from src.services.cache import sqlite_cache
+from src.services.cache.sheet_snapshot_cache import SheetSnapshotCache
+from src.services.cache.sqlite_cache import SQLiteCache
+from src.services.cache.text_cache import TextCache
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+def _clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sqlite_cache.time, "time", clock.time)
+    return clock
+
+
+def test_entries_expire_from_last_access(tmp_path, monkeypatch):
+    clock = _clock(monkeypatch)
+    cache = SQLiteCache(str(tmp_path / "c.sqlite3"), max_bytes=1 << 20, max_age_seconds=100)
+    cache.put("k", "ns", "v")
+
+    clock.now += 90
+    assert cache.get("k", "ns") == "v"
+    # 読み込みで期限が延びる
+    clock.now += 90
+    assert cache.get("k", "ns") == "v"
+    clock.now += 101
+    assert cache.get("k", "ns") is None
+
+
+def test_created_at_expiry_is_not_extended_by_reads(tmp_path, monkeypatch):
+    clock = _clock(monkeypatch)
+    cache = SheetSnapshotCache(str(tmp_path / "s.sqlite3"), max_age_seconds=100, enabled=True)
+    cache.put_rows("sid", "sheet", [["a"]])
+
+    clock.now += 90
+    assert cache.get_rows("sid", "sheet") == [["a"]]
+    clock.now += 20
+    assert cache.get_rows("sid", "sheet") is None
+
+
+def test_evict_drops_expired_and_least_recently_used_entries(tmp_path, monkeypatch):
+    clock = _clock(monkeypatch)
+    cache = SQLiteCache(str(tmp_path / "c.sqlite3"), max_bytes=10, max_age_seconds=100)
+    cache.put("old", "ns", "x")
+    clock.now += 200
+    cache.put("a", "ns", "12345")
+    clock.now += 1
+    cache.put("b", "ns", "12345")
+    clock.now += 1
+    cache.put("c", "ns", "12345")
+
+    cache.evict()
+
+    assert cache.report()["entries"] == 2
+    assert cache.get("old", "ns") is None
+    assert cache.get("a", "ns") is None
+    assert cache.get("c", "ns") == "12345"
+
+
+def test_purge_stale_versions_keeps_only_the_current_namespace(tmp_path):
+    cache = TextCache(str(tmp_path / "t.sqlite3"), enabled=True)
+    cache.put_text("h", "pdf", "1", "old")
+    cache.put_text("h", "pdf", "2", "new")
+    cache.put_text("h", "docx", "1", "other")
+
+    assert cache.purge_stale_versions("pdf", "2") == 1
+    assert cache.get_text("h", "pdf", "1") is None
+    assert cache.get_text("h", "pdf", "2") == "new"
+    assert cache.get_text("h", "docx", "1") == "other"
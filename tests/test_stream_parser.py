@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from src.services.stream_parser import MalformedStreamError, StreamingResponseParser
+
+
+def _feed(parser, text, step=3):
+    completed = []
+    for start in range(0, len(text), step):
+        completed += parser.feed(text[start:start + step])
+    return completed
+
+
+def test_fields_are_emitted_as_soon_as_they_close():
+    parser = StreamingResponseParser(["案件名", "発注機関"])
+    completed = parser.feed('{"項目": {"案件名": {"見出し": "案件名", "内容": "サイト改修"}')
+    assert completed == [("案件名", "サイト改修")]
+    completed = parser.feed(', "発注機関": "○○市"}}')
+    assert completed == [("発注機関", "○○市")]
+    assert parser.done
+
+
+def test_split_deltas_and_escapes_parse_like_json():
+    fields = {"案件名": {"見出し": "案件名", "内容": '「A"B」 {x}\\'}, "入札日": None, "予算": 100}
+    text = json.dumps({"項目": fields}, ensure_ascii=False)
+    parser = StreamingResponseParser(["案件名", "入札日", "予算"])
+    assert dict(_feed(parser, text, step=1)) == {"案件名": '「A"B」 {x}\\', "入札日": "", "予算": "100"}
+
+
+def test_unrequested_fields_are_skipped():
+    parser = StreamingResponseParser(["案件名"])
+    text = '{"項目": {"その他": {"内容": "x"}, "案件名": {"内容": "y"}}}'
+    assert _feed(parser, text) == [("案件名", "y")]
+
+
+def test_whitespace_run_aborts_the_stream():
+    parser = StreamingResponseParser(["案件名"], max_whitespace=10)
+    parser.feed('{"項目": {')
+    # 文字列の中の空白は数えない
+    parser.feed('"案件名": {"内容": "' + " " * 50 + '"}')
+    with pytest.raises(MalformedStreamError):
+        parser.feed("\n" * 10)
+
+
+def test_whitespace_counter_resets_on_output():
+    parser = StreamingResponseParser(["案件名"], max_whitespace=10)
+    text = '{' + " " * 9 + '"項目":' + " " * 9 + '{"案件名":' + " " * 9 + '"x"}}'
+    assert _feed(parser, text) == [("案件名", "x")]
+
+
+@pytest.mark.parametrize("text", [
+    'Sure! {"項目": {}}',
+    '{"fields": {}}',
+    '{"項目": []}',
+    '{"項目": {"案件名" "x"}}',
+    '{"項目": {}} extra',
+])
+def test_malformed_streams_are_rejected_early(text):
+    parser = StreamingResponseParser(["案件名"])
+    with pytest.raises(MalformedStreamError):
+        _feed(parser, text, step=1)
@@ -0,0 +1,107 @@
+import re
+
+from src.services.sheets.summary_table import SummaryTable
+
+
+class Request:
+    def __init__(self, run):
+        self._run = run
+
+    def execute(self):
+        return self._run()
+
+
+class FakeValues:
+    """列Aをキーとする表を保持する values() の代わり"""
+    def __init__(self, grid, calls):
+        self.grid = grid
+        self.calls = calls
+
+    def get(self, **kwargs):
+        self.calls.append("get")
+        keys = [self.grid[row][0] if row in self.grid else "" for row in range(1, max(self.grid) + 1)]
+        return Request(lambda: {"values": [keys]})
+
+    def batchGet(self, ranges, **kwargs):
+        self.calls.append("batchGet")
+        cells = [self.grid.get(_row_number(cell_range), [""])[:1] for cell_range in ranges]
+        return Request(lambda: {"valueRanges": [{"values": [cell]} if cell[0] else {} for cell in cells]})
+
+    def batchUpdate(self, body, **kwargs):
+        self.calls.append("batchUpdate")
+        for data in body["data"]:
+            self.grid[_row_number(data["range"])] = data["values"][0]
+        return Request(dict)
+
+    def append(self, body, **kwargs):
+        self.calls.append("append")
+        start = max(self.grid) + 1
+        for offset, row in enumerate(body["values"]):
+            self.grid[start + offset] = row
+        return Request(lambda: {"updates": {"updatedRange": f"'案件一覧'!A{start}:C{start + len(body['values']) - 1}"}})
+
+
+class FakeService:
+    def __init__(self, grid):
+        self.calls = []
+        self._values = FakeValues(grid, self.calls)
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self._values
+
+
+class FakePreparer:
+    def get_sheet_ids(self, spreadsheet_id):
+        return {"案件一覧": 1}
+
+
+def _row_number(cell_range):
+    return int(re.search(r"A(\d+)$", cell_range).group(1))
+
+
+def _table(grid):
+    service = FakeService(grid)
+    return SummaryTable(service, FakePreparer(), "案件一覧"), service
+
+
+def test_cached_index_is_used_while_rows_stay_in_place():
+    grid = {1: ["フォルダID"], 2: ["f1", "old"], 3: ["f2", "old"]}
+    table, service = _table(grid)
+    table.write_rows("sid", [("f1", ["f1", "a"])])
+    table.write_rows("sid", [("f2", ["f2", "b"])])
+
+    assert service.calls == ["get", "batchUpdate", "batchGet", "batchUpdate"]
+    assert grid[2] == ["f1", "a"] and grid[3] == ["f2", "b"]
+
+
+def test_moved_rows_reload_the_index_before_writing():
+    grid = {1: ["フォルダID"], 2: ["f1", "old"], 3: ["f2", "old"]}
+    table, service = _table(grid)
+    table.write_rows("sid", [("f1", ["f1", "a"])])
+    # シート上で行が並べ替えられた
+    grid[2], grid[3] = grid[3], grid[2]
+    service.calls.clear()
+
+    table.write_rows("sid", [("f1", ["f1", "b"])])
+
+    assert service.calls == ["batchGet", "get", "batchUpdate"]
+    assert grid[3] == ["f1", "b"]
+    assert grid[2] == ["f2", "old"]
+
+
+def test_deleted_row_is_appended_after_reload():
+    grid = {1: ["フォルダID"], 2: ["f1", "old"], 3: ["f2", "old"]}
+    table, service = _table(grid)
+    table.write_rows("sid", [("f2", ["f2", "a"])])
+    # f2 の行が削除された
+    del grid[3]
+    service.calls.clear()
+
+    table.write_rows("sid", [("f2", ["f2", "b"])])
+
+    assert service.calls == ["batchGet", "get", "append"]
+    assert grid[2] == ["f1", "old"]
+    assert grid[3] == ["f2", "b"]
@@ -0,0 +1,52 @@
+from src.models.text_record import TextRecord
+from src.services.token_chunker import TokenChunker
+
+
+class CharCounter:
+    """1文字 = 1トークンとして数える"""
+    def count(self, text):
+        return len(text)
+
+    def truncate(self, text, max_tokens):
+        return text[:max_tokens]
+
+
+def _chunk(text, max_tokens, overlap_tokens=0):
+    chunker = TokenChunker(CharCounter(), max_tokens, overlap_tokens)
+    return list(chunker.chunk_records([TextRecord("a.pdf", 1, 0, text)])), chunker
+
+
+def test_chunks_break_at_sentence_ends_within_budget():
+    text = "一二三四。" * 10
+    chunks, _ = _chunk(text, 12)
+    assert all(chunk.token_count <= 12 for chunk in chunks)
+    assert all(chunk.text.endswith("。") for chunk in chunks)
+    assert "".join(chunk.text for chunk in chunks) == text
+
+
+def test_overlap_repeats_trailing_sentences():
+    text = "".join(f"文{i}です。" for i in range(10))
+    chunks, chunker = _chunk(text, 20, overlap_tokens=5)
+    assert len(chunks) > 1
+    for previous, chunk in zip(chunks, chunks[1:]):
+        last_sentence = previous.text.split("。")[-2] + "。"
+        assert chunk.text.startswith(last_sentence)
+    assert chunker.stats.overlap_tokens > 0
+
+
+def test_oversized_sentence_is_split():
+    chunks, _ = _chunk("あ" * 25, 10)
+    assert [chunk.token_count for chunk in chunks] == [10, 10, 5]
+
+
+def test_heading_starts_a_new_chunk_when_nearly_full():
+    text = "あいうえおかきくけ。\n第2章 仕様\nさしすせそ。"
+    chunks, _ = _chunk(text, 12)
+    assert chunks[1].text.startswith("第2章")
+
+
+def test_sources_follow_records():
+    chunker = TokenChunker(CharCounter(), 100)
+    records = [TextRecord("a.pdf", 1, 0, "一。"), TextRecord("a.pdf", 2, 0, "二。")]
+    chunk, = chunker.chunk_records(records)
+    assert chunk.describe_sources() == "a.pdf p.1-2"
@@ -0,0 +1,73 @@
+import pytest
+
+from src.services.token_chunker import TokenChunker
+from src.utils import token_counter
+from src.utils.token_counter import TokenCounter
+
+
+class _OfflineTiktoken:
+    """tiktoken that cannot download its BPE file"""
+    def encoding_for_model(self, model):
+        raise ConnectionError("offline")
+
+    def get_encoding(self, name):
+        raise ConnectionError("offline")
+
+
+def test_falls_back_to_estimator_when_encoding_cannot_load(monkeypatch):
+    monkeypatch.setattr(token_counter, "tiktoken", _OfflineTiktoken())
+    counter = TokenCounter("gpt-4o-mini")
+    assert not counter.is_exact
+    assert counter.count("入札案件") == 5
+    assert counter.count("abcd") == 1
+
+
+def test_estimator_without_tiktoken(monkeypatch):
+    monkeypatch.setattr(token_counter, "tiktoken", None)
+    counter = TokenCounter("gpt-4o-mini")
+    assert counter.count("") == 0
+    text = "仕様書" * 100
+    truncated = counter.truncate(text, 50)
+    assert counter.count(truncated) <= 50
+    assert text.startswith(truncated)
+    assert counter.count(text[:len(truncated) + 1]) > 50
+
+
+def _byte_level_encoding():
+    """1バイト = 1トークンの tiktoken エンコーディング（BPEファイルのダウンロード不要）"""
+    tiktoken = pytest.importorskip("tiktoken")
+    return tiktoken.Encoding(
+        name="bytes",
+        pat_str=r"[\s\S]+",
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={}
+    )
+
+
+class _LocalTiktoken:
+    def __init__(self, encoding):
+        self.encoding = encoding
+
+    def encoding_for_model(self, model):
+        return self.encoding
+
+
+def test_tiktoken_truncate_never_splits_a_character(monkeypatch):
+    monkeypatch.setattr(token_counter, "tiktoken", _LocalTiktoken(_byte_level_encoding()))
+    counter = TokenCounter("gpt-4o-mini")
+    assert counter.is_exact
+    text = "仕様書🙂" * 10
+    # 4トークン目は「様」（3バイト）の途中
+    head = counter.truncate(text, 4)
+    assert head == "仕"
+    for max_tokens in range(1, 40):
+        head = counter.truncate(text, max_tokens)
+        assert text.startswith(head)
+        assert counter.count(head) <= max_tokens
+
+
+def test_oversized_sentence_keeps_every_character(monkeypatch):
+    monkeypatch.setattr(token_counter, "tiktoken", _LocalTiktoken(_byte_level_encoding()))
+    chunker = TokenChunker(TokenCounter("gpt-4o-mini"), 10)
+    text = "区分表🙂" * 20
+    assert "".join(chunker._split_oversized(text)) == text
@@ -0,0 +1,74 @@
+from src.services.sheets.content_updater import HEADER_ROW, ContentUpdater
+from src.services.sheets.format_adjuster import FormatAdjuster
+from src.services.sheets.sheet_preparer import SheetPreparer
+from src.services.sheets.write_planner import SheetWritePlanner
+
+
+def _planner():
+    return SheetWritePlanner(SheetPreparer(None), ContentUpdater(), FormatAdjuster())
+
+
+def _kinds(requests):
+    return [next(iter(request)) for request in requests]
+
+
+def test_new_sheet_is_added_and_appended_in_one_batch():
+    plan = _planner().plan("案件A", [["案件名", "A"]], {"Sheet1": 0})
+
+    assert plan.is_new_sheet
+    assert _kinds(plan.requests) == ["addSheet", "appendCells", "autoResizeDimensions"]
+    assert plan.requests[0]["addSheet"]["properties"]["sheetId"] == plan.sheet_id
+    assert plan.rows == [HEADER_ROW, ["案件名", "A"]]
+
+
+def test_existing_sheet_without_snapshot_is_overwritten():
+    plan = _planner().plan("案件A", [["案件名", "A"]], {"案件A": 7})
+
+    assert not plan.is_new_sheet
+    assert _kinds(plan.requests) == ["updateCells", "autoResizeDimensions"]
+    assert "endRowIndex" not in plan.requests[0]["updateCells"]["range"]
+
+
+def test_unchanged_sheet_needs_no_requests():
+    values = [["案件名", "A"], ["入札日", "2024-04-01"]]
+    previous = ContentUpdater.to_rows(values)
+    plan = _planner().plan("案件A", values, {"案件A": 7}, previous)
+
+    assert plan.unchanged
+    assert plan.requests == []
+
+
+def test_plan_many_keeps_the_last_write_and_distinct_sheet_ids():
+    plans = _planner().plan_many(
+        [("案件A", [["案件名", "1"]]), ("案件B", [["案件名", "B"]]), ("案件A", [["案件名", "2"]])],
+        {"Sheet1": 0}
+    )
+
+    assert [plan.sheet_name for plan in plans] == ["案件A", "案件B"]
+    assert plans[0].rows[1] == ["案件名", "2"]
+    assert len({plan.sheet_id for plan in plans}) == 2
+
+
+def test_diff_updates_only_changed_runs_of_cells():
+    previous = [["a", "b", "c", "d"], ["e", "f"]]
+    rows = [["a", "X", "Y", "d"], ["e", "f"]]
+    requests = ContentUpdater().build_diff_requests(3, previous, rows)
+
+    assert len(requests) == 1
+    update = requests[0]["updateCells"]
+    assert update["range"] == {
+        "sheetId": 3, "startRowIndex": 0, "endRowIndex": 1, "startColumnIndex": 1, "endColumnIndex": 3
+    }
+    assert [cell["userEnteredValue"]["stringValue"] for cell in update["rows"][0]["values"]] == ["X", "Y"]
+
+
+def test_diff_clears_shortened_cells_and_leftover_rows():
+    previous = [["a", "b", "c"], ["d", "e"], ["f", "g"]]
+    rows = [["a"], ["d", "e"]]
+    requests = ContentUpdater().build_diff_requests(3, previous, rows)
+
+    cleared_cells, cleared_rows = (request["updateCells"] for request in requests)
+    assert (cleared_cells["range"]["startColumnIndex"], cleared_cells["range"]["endColumnIndex"]) == (1, 3)
+    assert [cell["userEnteredValue"]["stringValue"] for cell in cleared_cells["rows"][0]["values"]] == ["", ""]
+    assert cleared_rows["range"] == {"sheetId": 3, "startRowIndex": 2, "endRowIndex": 3}
+    assert "rows" not in cleared_rows
@@ -0,0 +1,337 @@
+"""Local stand-in for the OpenAI chat completions, files and batches endpoints
+
+Lets the analysis pipeline run end to end without calling OpenAI:
+
+    python -m tools.fake_openai_server --port 8765 --latency 0.5
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=dummy python main.py
+
+Every chat completion answers with the response schema from TENDER_FIELDS,
+filling a field when one of its keywords appears in the user message; requests
+with "stream": true are answered as server-sent events, spread over --latency
+seconds, and --malformed-ratio of them degrade into endless whitespace. Uploaded
+batch input files are answered line by line the same way once --batch-latency
+seconds have passed. Prompt caching is emulated: usage reports as cached the
+longest previously seen prompt prefix (in 128-character steps, from 1024
+characters). GET /stats returns request counters.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.models.tender_fields import TENDER_FIELDS
+
+# プロンプトキャッシュの模擬（OpenAI は 1024 トークン以上、128 トークン単位）
+PROMPT_CACHE_MIN_CHARS = 1024
+PROMPT_CACHE_STEP_CHARS = 128
+
+class FakeOpenAIState:
+    def __init__(self, latency: float, rate_limit_ratio: float, error_ratio: float, batch_latency: float = 0.0,
+                 malformed_ratio: float = 0.0):
+        self.latency = latency
+        self.malformed_ratio = malformed_ratio
+        self.batch_latency = batch_latency
+        self.rate_limit_ratio = rate_limit_ratio
+        self.error_ratio = error_ratio
+        self.lock = threading.Lock()
+        self.counters = {
+            "requests": 0, "rate_limited": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0,
+            "batches": 0, "batch_requests": 0, "streams": 0, "malformed_streams": 0, "aborted_streams": 0
+        }
+        self.files = {}
+        self.batches = {}
+        self.prompt_prefixes = set()
+
+    def cached_prompt_chars(self, messages) -> int:
+        """以前のリクエストと先頭から一致する文字数（プロバイダー側のプロンプトキャッシュの模擬）"""
+        prompt = "".join(f"{message.get('role')}:{message.get('content', '')}" for message in messages)
+        lengths = range(PROMPT_CACHE_MIN_CHARS, len(prompt) + 1, PROMPT_CACHE_STEP_CHARS)
+        with self.lock:
+            cached = max((n for n in lengths if prompt[:n] in self.prompt_prefixes), default=0)
+            self.prompt_prefixes.update(prompt[:n] for n in lengths)
+        return cached
+
+    def count(self, key: str, delta: int = 1) -> None:
+        with self.lock:
+            self.counters[key] += delta
+            if key == "in_flight":
+                self.counters["max_in_flight"] = max(self.counters["max_in_flight"], self.counters["in_flight"])
+
+def build_completion_content(messages) -> str:
+    """リクエスト本文に含まれるキーワードから疑似的な抽出結果を作る"""
+    text = "\n".join(str(message.get("content", "")) for message in messages if message.get("role") == "user")
+    items = {}
+    for field in TENDER_FIELDS.values():
+        hit = next((keyword for keyword in field.keywords if keyword in text), None)
+        items[field.name] = {"見出し": field.name, "内容": f"{hit}に関する記載あり" if hit else ""}
+    return json.dumps({"項目": items}, ensure_ascii=False)
+
+def build_completion(body: dict, cached_tokens: int = 0) -> dict:
+    content = build_completion_content(body.get("messages", []))
+    prompt_chars = sum(len(str(message.get("content", ""))) for message in body.get("messages", []))
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake-model"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": {
+            "prompt_tokens": prompt_chars,
+            "completion_tokens": len(content),
+            "total_tokens": prompt_chars + len(content),
+            "prompt_tokens_details": {"cached_tokens": min(cached_tokens, prompt_chars)}
+        }
+    }
+
+# ストリーミングで1イベントに含める文字数
+STREAM_PIECE_CHARS = 16
+
+def build_stream_events(body: dict, malformed: bool = False, cached_tokens: int = 0):
+    """chat.completion.chunk のイベントを順に返す（malformed の場合は途中から空白を出し続ける）"""
+    completion = build_completion(body, cached_tokens)
+    content = completion["choices"][0]["message"]["content"]
+    if malformed:
+        content = content[:len(content) // 2] + " " * 4000
+    base = {"id": completion["id"], "object": "chat.completion.chunk",
+            "created": completion["created"], "model": completion["model"]}
+    for start in range(0, len(content), STREAM_PIECE_CHARS):
+        piece = content[start:start + STREAM_PIECE_CHARS]
+        yield dict(base, choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+    yield dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+    if (body.get("stream_options") or {}).get("include_usage"):
+        yield dict(base, choices=[], usage=completion["usage"])
+
+def parse_multipart(body: bytes, content_type: str) -> dict:
+    """multipart/form-data のパート名 → 内容（ファイルのパートは (ファイル名, バイト列)）"""
+    boundary = content_type.split('boundary=', 1)[1].strip('"').encode()
+    parts = {}
+    for part in body.split(b'--' + boundary):
+        head, sep, content = part.partition(b'\r\n\r\n')
+        if not sep:
+            continue
+        disposition = head.decode('utf-8', 'replace')
+        name = disposition.split('name="', 1)[1].split('"', 1)[0]
+        content = content[:-2] if content.endswith(b'\r\n') else content
+        if 'filename="' in disposition:
+            parts[name] = (disposition.split('filename="', 1)[1].split('"', 1)[0], content)
+        else:
+            parts[name] = content.decode('utf-8')
+    return parts
+
+def build_batch_output(state: FakeOpenAIState, input_data: bytes) -> bytes:
+    """バッチの入力 JSONL の各行に応答し、出力 JSONL を作る"""
+    lines = []
+    for line in input_data.decode('utf-8').splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        state.count("batch_requests")
+        if random.random() < state.error_ratio:
+            state.count("errors")
+            response = {"status_code": 500, "request_id": uuid.uuid4().hex,
+                        "body": {"error": {"message": "internal error", "type": "server_error"}}}
+        else:
+            response = {"status_code": 200, "request_id": uuid.uuid4().hex, "body": build_completion(item["body"])}
+        lines.append(json.dumps({
+            "id": f"batch_req_{uuid.uuid4().hex}",
+            "custom_id": item["custom_id"],
+            "response": response,
+            "error": None
+        }, ensure_ascii=False))
+    return ("\n".join(lines) + "\n").encode('utf-8')
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    state: FakeOpenAIState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.rstrip('/')
+        parts = path.split('/')
+        if path == '/stats':
+            self._send_json(200, self.state.counters)
+        elif path.endswith('/content') and parts[-3] == 'files' and parts[-2] in self.state.files:
+            self._send_bytes(200, self.state.files[parts[-2]]["data"], 'application/octet-stream')
+        elif parts[-2:-1] == ['batches'] and parts[-1] in self.state.batches:
+            self._send_json(200, self.state.batches[parts[-1]])
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        path = self.path.rstrip('/')
+        if path.endswith('/chat/completions'):
+            self._chat_completions(self._read_json())
+        elif path.endswith('/files'):
+            self._create_file()
+        elif path.endswith('/batches'):
+            self._create_batch(self._read_json())
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def _chat_completions(self, body: dict):
+        state = self.state
+        state.count("requests")
+        state.count("in_flight")
+        try:
+            if not body.get("stream"):
+                time.sleep(state.latency)
+            roll = random.random()
+            if roll < state.rate_limit_ratio:
+                state.count("rate_limited")
+                self._send_json(429, {"error": {"message": "rate limited", "type": "rate_limit_error"}},
+                                headers={"retry-after": "1"})
+                return
+            if roll < state.rate_limit_ratio + state.error_ratio:
+                state.count("errors")
+                self._send_json(500, {"error": {"message": "internal error", "type": "server_error"}})
+                return
+            if body.get("stream"):
+                self._send_stream(body)
+            else:
+                self._send_json(200, build_completion(body, state.cached_prompt_chars(body.get("messages", []))))
+        finally:
+            state.count("in_flight", -1)
+
+    def _send_stream(self, body: dict):
+        state = self.state
+        state.count("streams")
+        malformed = random.random() < state.malformed_ratio
+        if malformed:
+            state.count("malformed_streams")
+        events = list(build_stream_events(body, malformed, state.cached_prompt_chars(body.get("messages", []))))
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        try:
+            for event in events:
+                self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+                time.sleep(state.latency / len(events))
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # クライアントが受信を打ち切った
+            state.count("aborted_streams")
+
+    def _create_file(self):
+        parts = parse_multipart(self._read_body(), self.headers.get('Content-Type', ''))
+        filename, data = parts.get("file", ("upload.jsonl", b""))
+        file_object = self._store_file(data, filename, parts.get("purpose", "batch"))
+        self._send_json(200, file_object)
+
+    def _store_file(self, data: bytes, filename: str, purpose: str) -> dict:
+        file_object = {
+            "id": f"file-{uuid.uuid4().hex}",
+            "object": "file",
+            "bytes": len(data),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed"
+        }
+        with self.state.lock:
+            self.state.files[file_object["id"]] = dict(file_object, data=data)
+        return file_object
+
+    def _create_batch(self, body: dict):
+        state = self.state
+        input_file = state.files.get(body.get("input_file_id"))
+        if input_file is None:
+            self._send_json(400, {"error": {"message": "input file not found", "type": "invalid_request_error"}})
+            return
+        total = sum(1 for line in input_file["data"].splitlines() if line.strip())
+        batch = {
+            "id": f"batch_{uuid.uuid4().hex}",
+            "object": "batch",
+            "endpoint": body.get("endpoint"),
+            "input_file_id": input_file["id"],
+            "completion_window": body.get("completion_window", "24h"),
+            "status": "in_progress",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": int(time.time()),
+            "completed_at": None,
+            "metadata": body.get("metadata"),
+            "request_counts": {"total": total, "completed": 0, "failed": 0}
+        }
+        state.batches[batch["id"]] = batch
+        state.count("batches")
+        threading.Thread(target=self._complete_batch, args=(batch, input_file["data"]), daemon=True).start()
+        self._send_json(200, batch)
+
+    def _complete_batch(self, batch: dict, input_data: bytes):
+        time.sleep(self.state.batch_latency)
+        output = build_batch_output(self.state, input_data)
+        failed = sum(1 for line in output.splitlines() if json.loads(line)["response"]["status_code"] != 200)
+        output_file = self._store_file(output, f"{batch['id']}_output.jsonl", "batch_output")
+        batch.update({
+            "status": "completed",
+            "output_file_id": output_file["id"],
+            "completed_at": int(time.time()),
+            "request_counts": {
+                "total": batch["request_counts"]["total"],
+                "completed": batch["request_counts"]["total"] - failed,
+                "failed": failed
+            }
+        })
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _read_json(self) -> dict:
+        raw = self._read_body()
+        return json.loads(raw) if raw else {}
+
+    def _send_json(self, status: int, payload, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self._send_bytes(status, data, 'application/json', headers)
+
+    def _send_bytes(self, status: int, data: bytes, content_type: str, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+def create_server(host: str = '127.0.0.1', port: int = 8765, latency: float = 0.0,
+                  rate_limit_ratio: float = 0.0, error_ratio: float = 0.0,
+                  batch_latency: float = 0.0, malformed_ratio: float = 0.0) -> ThreadingHTTPServer:
+    """疑似サーバーを生成（serve_forever はスレッドで呼び出す想定）"""
+    handler = type('Handler', (FakeOpenAIHandler,), {
+        'state': FakeOpenAIState(latency, rate_limit_ratio, error_ratio, batch_latency, malformed_ratio)
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI API server for local testing")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.5, help='seconds to wait before answering')
+    parser.add_argument('--rate-limit-ratio', type=float, default=0.0, help='share of requests answered with 429')
+    parser.add_argument('--error-ratio', type=float, default=0.0, help='share of requests answered with 500')
+    parser.add_argument('--batch-latency', type=float, default=5.0, help='seconds until a batch completes')
+    parser.add_argument('--malformed-ratio', type=float, default=0.0,
+                        help='share of streamed responses that degrade into whitespace')
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.latency, args.rate_limit_ratio, args.error_ratio,
+                           args.batch_latency, args.malformed_ratio)
+    print(f"Fake OpenAI server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()